@@ -0,0 +1,173 @@
+"""
+Compares the per-bar cost of running a strategy with the BacktestEngine against the Backtrader loop the
+test_options scripts use.
+
+A synthetic Parquet dataset with one 0DTE and one 1DTE expiration per day is written to a temporary folder.
+The same strategy runs on each path: on every expiration day at 10:00 the option chain is loaded and the first
+call at or above the spot price is bought and held to settlement.
+
+    engine       BacktestEngine with its int64 clock
+    manual loop  the loop the Backtrader scripts run each bar, without Backtrader: a timestamp parsed with
+                 pd.to_datetime from the date and time strings, then portfolio.next
+    backtrader   the same strategy as a bt.Strategy fed by a PandasData feed of the spot prices,
+                 only run if backtrader is installed
+
+    python benchmarks/bench_engine.py --days 5 --strikes 40
+"""
+import argparse
+import datetime
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from options_framework.config import settings
+from options_framework.engine import BacktestEngine, Strategy
+from options_framework.option_types import OptionPositionType, OptionType, SelectFilter
+from options_framework.spreads.single import Single
+from options_framework.test_manager import OptionTestManager
+
+START = datetime.datetime(2016, 3, 1, 9, 31)
+ENTRY_TIME = datetime.time(10, 0)
+
+
+def write_dataset(dataset_root: str, days: int, strikes: int) -> pd.DataFrame:
+    """
+    Writes the option quotes and returns the spot prices, one row per minute
+    """
+    from options_framework.data.parquet_data_loader import write_parquet_dataset
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(START.date(), periods=days)
+    quote_datetimes = pd.DatetimeIndex(np.concatenate(
+        [pd.date_range(datetime.datetime.combine(d, datetime.time(9, 31)), periods=405, freq='min') for d in dates]))
+    spot_prices = 2000 + np.cumsum(rng.normal(0, 0.5, len(quote_datetimes)))
+    expirations = list(dates) + [dates[-1] + pd.offsets.BDay(1)]
+    strike_offsets = (np.arange(strikes) - strikes // 2) * 5
+
+    frames = []
+    for day, date in enumerate(dates):
+        mask = quote_datetimes.normalize() == date
+        for expiration in expirations[day:day + 2]:
+            for option_type in [OptionType.CALL, OptionType.PUT]:
+                strike_values = np.round(spot_prices[mask][0] / 5) * 5 + strike_offsets
+                spot = np.repeat(spot_prices[mask], strikes)
+                strike = np.tile(strike_values, mask.sum())
+                intrinsic = np.maximum(spot - strike, 0) if option_type == OptionType.CALL \
+                    else np.maximum(strike - spot, 0)
+                price = np.round(intrinsic + 2 + np.abs(spot - strike) * 0.01, 2)
+                base_id = (expirations.index(expiration) * 2 + option_type.value) * 10_000
+                frames.append(pd.DataFrame({
+                    'quote_datetime': np.repeat(quote_datetimes[mask], strikes),
+                    'option_id': base_id + ((strike - 1500) / 5).astype(int), 'symbol': 'SPXW',
+                    'expiration': expiration, 'strike': strike, 'option_type': option_type.value,
+                    'spot_price': spot, 'bid': price - 0.05, 'ask': price + 0.05, 'price': price}))
+    write_parquet_dataset(pd.concat(frames, ignore_index=True), dataset_root)
+    return pd.DataFrame({'open': spot_prices, 'high': spot_prices, 'low': spot_prices, 'close': spot_prices,
+                         'volume': 0, 'openinterest': 0}, index=quote_datetimes)
+
+
+def create_test_manager(dataset_root: str, prices: pd.DataFrame) -> OptionTestManager:
+    from options_framework.data.parquet_data_loader import ParquetDataLoader
+
+    start, end = prices.index[0].to_pydatetime(), prices.index[-1].to_pydatetime()
+    select_filter = SelectFilter(symbol='SPXW')
+    data_loader = ParquetDataLoader(start=start, end=end, select_filter=select_filter, dataset_root=dataset_root)
+    return OptionTestManager(start_datetime=start, end_datetime=end, select_filter=select_filter,
+                             starting_cash=1_000_000.0, data_loader=data_loader)
+
+
+def buy_call(test_manager: OptionTestManager, expiration: datetime.date, spot_price: float) -> None:
+    single = Single.get_single(option_chain=test_manager.option_chain, expiration=expiration,
+                               option_type=OptionType.CALL, option_position_type=OptionPositionType.LONG,
+                               strike=spot_price)
+    test_manager.portfolio.open_position(single, quantity=1)
+
+
+class EngineStrategy(Strategy):
+    def on_bar(self, bar):
+        quote_datetime = bar.quote_datetime
+        if quote_datetime.time() == ENTRY_TIME and self.engine.is_expiration(quote_datetime.date()):
+            self.engine.load_option_chain()
+            buy_call(self.engine.test_manager, quote_datetime.date(), bar.close)
+
+
+def run_engine(dataset_root: str, prices: pd.DataFrame) -> OptionTestManager:
+    test_manager = create_test_manager(dataset_root, prices)
+    BacktestEngine(test_manager=test_manager, strategy=EngineStrategy(), price_data=prices).run()
+    return test_manager
+
+
+def run_manual_loop(dataset_root: str, prices: pd.DataFrame) -> OptionTestManager:
+    test_manager = create_test_manager(dataset_root, prices)
+    expirations = test_manager.expirations
+    closes = prices['close'].to_numpy()
+    for i, timestamp in enumerate(prices.index):
+        quote_datetime = pd.to_datetime(f'{timestamp.date()} {timestamp.time()}')
+        test_manager.portfolio.next(quote_datetime)
+        if quote_datetime.time() == ENTRY_TIME and quote_datetime.date() in expirations:
+            test_manager.get_current_option_chain(quote_datetime.to_pydatetime())
+            buy_call(test_manager, quote_datetime.date(), closes[i])
+    return test_manager
+
+
+def run_backtrader(dataset_root: str, prices: pd.DataFrame) -> OptionTestManager | None:
+    try:
+        import backtrader as bt
+    except ImportError:
+        return None
+
+    class BacktraderStrategy(bt.Strategy):
+        params = (('test_manager', None),)
+
+        def next(self):
+            test_manager = self.p.test_manager
+            dt = pd.to_datetime(f'{self.data.datetime.date(0)} {self.data.datetime.time(0)}')
+            test_manager.portfolio.next(dt)
+            if dt.time() == ENTRY_TIME and dt.date() in test_manager.expirations:
+                test_manager.get_current_option_chain(dt.to_pydatetime())
+                buy_call(test_manager, dt.date(), self.data.close[0])
+
+    test_manager = create_test_manager(dataset_root, prices)
+    cerebro = bt.Cerebro(stdstats=False)
+    cerebro.addstrategy(BacktraderStrategy, test_manager=test_manager)
+    cerebro.adddata(bt.feeds.PandasData(dataname=prices, name='SPX'))
+    cerebro.run()
+    return test_manager
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--strikes', type=int, default=40, help='strikes per expiration and option type')
+    args = parser.parse_args(argv)
+
+    settings.INCUR_FEES = False
+    settings.APPLY_SLIPPAGE_ENTRY = False
+    settings.APPLY_SLIPPAGE_EXIT = False
+    settings.DATA_FORMAT_SETTINGS = 'parquet_settings.toml'
+    settings.PARQUET_DATA_LOADER_SETTINGS = {'buffer_days': 5, 'prefetch': False}
+
+    with tempfile.TemporaryDirectory() as dataset_root:
+        prices = write_dataset(dataset_root, args.days, args.strikes)
+        print(f'{len(prices)} bars, {args.days} days, {args.strikes} strikes per expiration and option type')
+        print(f'{"path":>12} {"seconds":>10} {"bars/s":>12} {"ending value":>14}')
+        results = {}
+        for name, run in [('engine', run_engine), ('manual loop', run_manual_loop), ('backtrader', run_backtrader)]:
+            start = time.perf_counter()
+            test_manager = run(dataset_root, prices)
+            seconds = time.perf_counter() - start
+            if test_manager is None:
+                print(f'{name:>12} {"backtrader is not installed":>38}')
+                continue
+            results[name] = test_manager.portfolio.portfolio_value
+            print(f'{name:>12} {seconds:>10.3f} {len(prices) / seconds:>12.0f} {results[name]:>14.2f}')
+
+    # every path must end with the same portfolio value
+    return 0 if len(set(results.values())) == 1 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
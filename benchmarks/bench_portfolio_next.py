@@ -0,0 +1,92 @@
+"""
+Measures the cost of OptionPortfolio.next as the number of open legs grows.
+
+Each position is a single option with a one day minute bar update cache. The positions are opened one at a time,
+the same way a strategy opens them, and then the portfolio is moved through the bars of the day.
+The time per bar should grow linearly with the number of open legs, so the time per leg should stay about the same.
+
+    python benchmarks/bench_portfolio_next.py --legs 1 10 50 100 250 500 --bars 300
+"""
+import argparse
+import datetime
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from options_framework.config import settings
+from options_framework.option import Option
+from options_framework.option_portfolio import OptionPortfolio
+from options_framework.option_types import OptionCombinationType, OptionPositionType, OptionType
+from options_framework.spreads.single import Single
+
+START = datetime.datetime(2016, 3, 1, 9, 31)
+EXPIRATION = datetime.date(2016, 3, 18)
+
+
+def create_option(option_id: int, quote_datetimes: pd.DatetimeIndex, rng: np.random.Generator) -> Option:
+    strike = 1900 + option_id
+    spot_prices = 1950 + np.cumsum(rng.normal(0, 0.5, len(quote_datetimes)))
+    prices = np.maximum(spot_prices - strike, 0) + 5 + rng.random(len(quote_datetimes))
+    update_cache = pd.DataFrame({'option_id': option_id, 'spot_price': spot_prices, 'bid': prices - 0.05,
+                                 'ask': prices + 0.05, 'price': prices, 'delta': rng.random(len(quote_datetimes))},
+                                index=pd.Index(quote_datetimes, name='quote_datetime'))
+    option = Option(option_id=option_id, symbol='SPXW', strike=strike, expiration=EXPIRATION,
+                    option_type=OptionType.CALL, quote_datetime=quote_datetimes[0], spot_price=spot_prices[0],
+                    bid=prices[0] - 0.05, ask=prices[0] + 0.05, price=prices[0], delta=0.5)
+    option.update_cache = update_cache
+    return option
+
+
+def run(legs: int, bars: int) -> tuple[float, float]:
+    """
+    Returns the seconds to open the positions, and the average seconds per bar
+    """
+    rng = np.random.default_rng(legs)
+    quote_datetimes = pd.date_range(START, periods=bars + 1, freq='min')
+    options = [create_option(option_id, quote_datetimes, rng) for option_id in range(legs)]
+    portfolio = OptionPortfolio(10_000_000.0)
+
+    start = time.perf_counter()
+    for option in options:
+        portfolio.open_position(Single([option], OptionCombinationType.SINGLE, OptionPositionType.LONG), quantity=1)
+    open_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for quote_datetime in quote_datetimes[1:]:
+        portfolio.next(quote_datetime.to_pydatetime())
+    bar_seconds = (time.perf_counter() - start) / bars
+    return open_seconds, bar_seconds
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--legs', type=int, nargs='+', default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument('--bars', type=int, default=300)
+    parser.add_argument('--max-ratio', type=float, default=3.0,
+                        help='fail if the time per leg of the largest book is more than this multiple '
+                             'of the time per leg of the smallest book with at least 50 legs')
+    args = parser.parse_args(argv)
+
+    settings.INCUR_FEES = False
+    settings.APPLY_SLIPPAGE_ENTRY = False
+    settings.APPLY_SLIPPAGE_EXIT = False
+
+    print(f'{"legs":>6} {"open ms":>10} {"bar us":>10} {"us/leg/bar":>12}')
+    per_leg = {}
+    for legs in args.legs:
+        open_seconds, bar_seconds = run(legs, args.bars)
+        per_leg[legs] = bar_seconds / legs
+        print(f'{legs:>6} {open_seconds * 1e3:>10.2f} {bar_seconds * 1e6:>10.1f} {per_leg[legs] * 1e6:>12.2f}')
+
+    baseline = [legs for legs in args.legs if legs >= 50]
+    if len(baseline) < 2:
+        return 0
+    ratio = per_leg[baseline[-1]] / per_leg[baseline[0]]
+    print(f'time per leg at {baseline[-1]} legs is {ratio:.2f}x the time per leg at {baseline[0]} legs')
+    return 0 if ratio <= args.max_ratio else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,458 @@
+"""
+Times the hot paths of the framework on synthetic markets of increasing size, and compares the results with a
+stored baseline.
+
+The quotes come from the SyntheticDataLoader, so no database or dataset is needed. Each tier is a market of
+daily expiring SPXW style options:
+
+    smoke         2 days, 40 contracts a minute, to check the suite runs
+    day           1 day, 500 contracts a minute
+    week          5 days, 500 contracts a minute
+    month         21 days, 2000 contracts a minute
+    year_narrow   252 days, 4000 contracts a minute, a year of a chain narrower than the full SPXW chain
+
+and the benchmarks are
+
+    cache_load              generating and filtering a day of quotes into the data loader cache
+    chain_construction      building the option chain from the cached quotes, one chain per minute
+    spread_selection.*      the Single, Vertical, IronCondor and Butterfly constructors on one chain
+    portfolio_next.*        OptionPortfolio.next with each --legs count of open legs, one call per minute of a day
+    expiry_settlement       the bar where the largest --legs count of expiring legs are settled
+    end_to_end.*            sample strategies run over the whole tier with the BacktestEngine
+
+The legs are opened in the first day of a market with enough strikes for the largest --legs count, kept close
+to the money so the options expiring that day are quoted above zero. A benchmark that cannot open every leg it
+was asked for fails, rather than timing fewer legs.
+
+Every result has the bars and options it worked on, its throughput in bars and options per second, and the
+peak resident memory of the process after it ran. The benchmarks run from the smallest to the largest, so the
+peak memory grows with the largest structure built so far. With --trace-memory, the peak memory traced by
+tracemalloc during each benchmark is also reported, and the times include the tracing overhead.
+
+The results are written to --output as JSON. When a baseline is given, or a baseline is stored for the tier in
+benchmarks/baselines, any benchmark whose bars per second dropped by more than --threshold is reported as a
+regression, and the exit code is 1. The times depend on the machine, so the baselines are not kept in git: the
+first run of a tier stores its results as the baseline, and --save-baseline replaces it.
+
+    python benchmarks/bench_suite.py --tier day --output day.json
+    python benchmarks/bench_suite.py --tier day --save-baseline
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import pandas as pd
+
+from options_framework.config import settings
+from options_framework.data.synthetic_data_loader import SyntheticDataLoader, SyntheticMarket
+from options_framework.engine import BacktestEngine, Strategy
+from options_framework.expiration_calendar import get_settlement_datetime
+from options_framework.memory_report import get_peak_rss
+from options_framework.option_chain import OptionChain
+from options_framework.option import Option
+from options_framework.option_types import OptionCombinationType, OptionPositionType, OptionType, SelectFilter
+from options_framework.spreads.butterfly import Butterfly
+from options_framework.spreads.iron_condor import IronCondor
+from options_framework.spreads.single import Single
+from options_framework.spreads.vertical import Vertical
+from options_framework.test_manager import OptionTestManager
+
+START = datetime.date(2016, 3, 1)
+ENTRY_TIME = datetime.time(10, 0)
+EXTENDED_ATTRIBUTES = ['delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest', 'implied_volatility']
+BASELINE_DIR = Path(__file__).parent / 'baselines'
+# The strikes of the market the legs are opened in are kept this close to the money, so the options expiring on
+# the first day are quoted above zero at the first minute and can all be opened
+LEGS_STRIKE_RANGE = 100.0
+
+
+@dataclass(frozen=True)
+class Tier:
+    days: int
+    expirations: int
+    strikes_per_expiration: int
+
+    @property
+    def contracts(self) -> int:
+        return self.expirations * 2 * self.strikes_per_expiration
+
+
+TIERS = {'smoke': Tier(days=2, expirations=2, strikes_per_expiration=10),
+         'day': Tier(days=1, expirations=5, strikes_per_expiration=50),
+         'week': Tier(days=5, expirations=5, strikes_per_expiration=50),
+         'month': Tier(days=21, expirations=10, strikes_per_expiration=100),
+         'year_narrow': Tier(days=252, expirations=10, strikes_per_expiration=200)}
+BENCHMARK_SETTINGS = {'INCUR_FEES': False, 'APPLY_SLIPPAGE_ENTRY': False, 'APPLY_SLIPPAGE_EXIT': False,
+                      'DATA_FORMAT_SETTINGS': 'synthetic_settings.toml'}
+
+
+@dataclass
+class BenchmarkResult:
+    """
+    The bars and options a benchmark worked on. Benchmarks that do not step through bars count each call as a bar:
+    a chain built, a spread selected or a settlement.
+    """
+    name: str
+    seconds: float
+    bars: int
+    options: int
+    peak_rss_bytes: int | None = None
+    peak_traced_bytes: int | None = None
+
+    @property
+    def bars_per_second(self) -> float:
+        return self.bars / self.seconds if self.seconds else 0.0
+
+    @property
+    def options_per_second(self) -> float:
+        return self.options / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self) | {'bars_per_second': self.bars_per_second,
+                               'options_per_second': self.options_per_second}
+
+
+def create_market(tier: Tier) -> SyntheticMarket:
+    end = pd.bdate_range(START, periods=tier.days)[-1].date()
+    return SyntheticMarket(start=START, end=end, expirations=tier.expirations,
+                           strikes_per_expiration=tier.strikes_per_expiration)
+
+
+def create_legs_market(tier: Tier, legs: int) -> SyntheticMarket:
+    """
+    The first day of the tier, for the benchmarks that open legs. There are enough strikes for the first
+    expiration, and the expirations after it, to each have at least legs contracts, and they are made closer
+    together to fit in LEGS_STRIKE_RANGE.
+    """
+    strikes = max(tier.strikes_per_expiration, math.ceil(legs / 2))
+    strike_interval = min(SyntheticMarket.strike_interval, LEGS_STRIKE_RANGE / strikes)
+    return SyntheticMarket(start=START, end=START, expirations=max(tier.expirations, 2),
+                           strikes_per_expiration=strikes, strike_interval=strike_interval)
+
+
+def check_legs(opened: int, legs: int, benchmark: str) -> None:
+    if opened < legs:
+        raise ValueError(f'{benchmark} opened {opened} of the {legs} legs requested')
+
+
+def create_test_manager(market: SyntheticMarket, end: datetime.date = None) -> OptionTestManager:
+    start = datetime.datetime.combine(market.start, market.first_quote_time)
+    end = datetime.datetime.combine(end or market.end, get_settlement_datetime(market.start).time())
+    select_filter = SelectFilter(symbol=market.symbol)
+    data_loader = SyntheticDataLoader(start=start, end=end, select_filter=select_filter,
+                                      extended_option_attributes=EXTENDED_ATTRIBUTES, market=market)
+    return OptionTestManager(start_datetime=start, end_datetime=end, select_filter=select_filter,
+                             starting_cash=100_000_000.0, extended_option_attributes=EXTENDED_ATTRIBUTES,
+                             data_loader=data_loader)
+
+
+def get_condor_strikes(option_chain: OptionChain, expiration: datetime.date) -> tuple[float, float, float]:
+    """
+    The strike nearest the spot price, and the strikes one and two wing widths from it. The wings are up to 4 strikes
+    wide, and the center is moved so both wings are inside the strikes of the expiration.
+    """
+    strikes = option_chain.expiration_strikes[expiration]
+    spot_price = option_chain.spot_prices[0]
+    center = min(range(len(strikes)), key=lambda i: abs(strikes[i] - spot_price))
+    wing = max(1, min(4, (len(strikes) - 1) // 4))
+    center = min(max(center, 2 * wing), len(strikes) - 1 - 2 * wing)
+    return strikes[center], strikes[center + wing] - strikes[center], strikes[center + 2 * wing] - strikes[center]
+
+
+def bench_cache_load(market: SyntheticMarket) -> BenchmarkResult:
+    data_loader = create_test_manager(market, end=market.start).data_loader
+    start = time.perf_counter()
+    data_loader.load_cache(datetime.datetime.combine(market.start, market.first_quote_time))
+    seconds = time.perf_counter() - start
+    return BenchmarkResult('cache_load', seconds, bars=market.minutes_per_day, options=len(data_loader.data_cache))
+
+
+def bench_chain_construction(market: SyntheticMarket) -> BenchmarkResult:
+    test_manager = create_test_manager(market, end=market.start)
+    quote_datetimes = test_manager.data_loader.get_quote_datetimes().to_pydatetime()
+    test_manager.data_loader.load_cache(quote_datetimes[0])
+    options = 0
+    start = time.perf_counter()
+    for quote_datetime in quote_datetimes:
+        test_manager.get_current_option_chain(quote_datetime)
+        options += len(test_manager.option_chain)
+    seconds = time.perf_counter() - start
+    return BenchmarkResult('chain_construction', seconds, bars=len(quote_datetimes), options=options)
+
+
+def bench_spread_selection(market: SyntheticMarket, repeats: int) -> list[BenchmarkResult]:
+    test_manager = create_test_manager(market, end=market.start)
+    quote_datetime = datetime.datetime.combine(market.start, ENTRY_TIME)
+    test_manager.get_current_option_chain(quote_datetime)
+    option_chain = test_manager.option_chain
+    expiration = option_chain.expirations[0]
+    atm, width, _ = get_condor_strikes(option_chain, expiration)
+    constructors = {
+        'single': lambda: Single.get_single(option_chain=option_chain, expiration=expiration,
+                                            option_type=OptionType.CALL, option_position_type=OptionPositionType.LONG,
+                                            strike=atm),
+        'vertical': lambda: Vertical.get_vertical(option_chain=option_chain, expiration=expiration,
+                                                  option_type=OptionType.CALL, long_strike=atm,
+                                                  short_strike=atm + width),
+        'iron_condor': lambda: IronCondor.get_iron_condor_by_strike(
+            option_chain=option_chain, expiration=expiration, long_call_strike=atm + width,
+            short_call_strike=atm + 2 * width, long_put_strike=atm - width, short_put_strike=atm - 2 * width),
+        'butterfly': lambda: Butterfly.get_balanced_butterfly(option_chain=option_chain, expiration=expiration,
+                                                              option_type=OptionType.CALL, center_strike=atm,
+                                                              wing_width=width)}
+    results = []
+    for name, constructor in constructors.items():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            constructor()
+        seconds = time.perf_counter() - start
+        results.append(BenchmarkResult(f'spread_selection.{name}', seconds, bars=repeats,
+                                       options=repeats * len(option_chain)))
+    return results
+
+
+def open_singles(test_manager: OptionTestManager, options: list[Option]) -> None:
+    for option in options:
+        single = Single([option], OptionCombinationType.SINGLE, OptionPositionType.LONG)
+        test_manager.portfolio.open_position(single, quantity=1)
+
+
+def get_chain_options(option_chain: OptionChain, expirations: list[datetime.date]) -> list[Option]:
+    return [option_chain.get_option(i) for expiration in expirations
+            for i in option_chain.get_indexes(expiration=expiration).tolist()]
+
+
+def bench_portfolio_next(market: SyntheticMarket, legs: int) -> BenchmarkResult:
+    test_manager = create_test_manager(market, end=market.start)
+    quote_datetimes = test_manager.data_loader.get_quote_datetimes().to_pydatetime()
+    test_manager.get_current_option_chain(quote_datetimes[0])
+    # the legs do not expire during the day, so every bar only marks them
+    option_chain = test_manager.option_chain
+    open_singles(test_manager, get_chain_options(option_chain, option_chain.expirations[1:])[:legs])
+    portfolio = test_manager.portfolio
+    check_legs(len(portfolio.book), legs, 'portfolio_next')
+    # the first bar loads the update caches
+    portfolio.next(quote_datetimes[1])
+    bars = quote_datetimes[2:]
+    start = time.perf_counter()
+    for quote_datetime in bars:
+        portfolio.next(quote_datetime)
+    seconds = time.perf_counter() - start
+    return BenchmarkResult(f'portfolio_next.{legs}_legs', seconds, bars=len(bars), options=legs * len(bars))
+
+
+def bench_expiry_settlement(market: SyntheticMarket, legs: int) -> BenchmarkResult:
+    test_manager = create_test_manager(market, end=market.start)
+    quote_datetimes = test_manager.data_loader.get_quote_datetimes().to_pydatetime()
+    test_manager.get_current_option_chain(quote_datetimes[0])
+    # closing a position divides by its open price, so options quoted at zero are left out
+    options = [o for o in get_chain_options(test_manager.option_chain, [market.start]) if o.price > 0]
+    open_singles(test_manager, options[:legs])
+    portfolio = test_manager.portfolio
+    check_legs(len(portfolio.book), legs, 'expiry_settlement')
+    settlement = get_settlement_datetime(market.start)
+    for quote_datetime in quote_datetimes[1:]:
+        if quote_datetime >= settlement:
+            break
+        portfolio.next(quote_datetime)
+    start = time.perf_counter()
+    portfolio.next(settlement)
+    seconds = time.perf_counter() - start
+    if portfolio.positions:
+        raise RuntimeError('The positions were not settled at the expiration')
+    return BenchmarkResult('expiry_settlement', seconds, bars=1, options=legs)
+
+
+class CountingStrategy(Strategy):
+    """
+    Counts the chain options loaded and the open legs marked at each bar, for the options per second
+    """
+    def __init__(self):
+        self.options = 0
+
+    def on_start(self):
+        self.engine.portfolio.bind(next=self._on_portfolio_next)
+
+    def on_end(self):
+        self.engine.portfolio.unbind(self._on_portfolio_next)
+
+    def _on_portfolio_next(self, quote_datetime, *args):
+        self.options += len(self.engine.portfolio.book)
+
+    def on_chain(self, option_chain):
+        self.options += len(option_chain)
+
+
+class ZeroDteIronCondorStrategy(CountingStrategy):
+    """
+    Buys an iron condor expiring the same day at 10:00 every day and holds it to settlement.
+    get_iron_condor_by_strike only accepts long iron condors, with the long strikes inside the short strikes.
+    """
+    def on_bar(self, bar):
+        if bar.quote_datetime.time() == ENTRY_TIME:
+            self.engine.load_option_chain()
+
+    def on_chain(self, option_chain):
+        super().on_chain(option_chain)
+        expiration = option_chain.expirations[0]
+        atm, inner_width, outer_width = get_condor_strikes(option_chain, expiration)
+        iron_condor = IronCondor.get_iron_condor_by_strike(
+            option_chain=option_chain, expiration=expiration, long_call_strike=atm + inner_width,
+            short_call_strike=atm + outer_width, long_put_strike=atm - inner_width, short_put_strike=atm - outer_width)
+        self.engine.portfolio.open_position(iron_condor, quantity=1)
+
+
+class NextDayDeltaPutStrategy(CountingStrategy):
+    """
+    Buys a 30 delta put expiring the next day at 10:00 every day and holds it to settlement
+    """
+    def on_bar(self, bar):
+        if bar.quote_datetime.time() == ENTRY_TIME:
+            self.engine.load_option_chain()
+
+    def on_chain(self, option_chain):
+        super().on_chain(option_chain)
+        expiration = option_chain.expirations[min(1, len(option_chain.expirations) - 1)]
+        single = Single.get_single_by_delta(option_chain=option_chain, expiration=expiration,
+                                            option_type=OptionType.PUT, option_position_type=OptionPositionType.LONG,
+                                            delta=-0.3)
+        self.engine.portfolio.open_position(single, quantity=1)
+
+
+def bench_end_to_end(market: SyntheticMarket, name: str, strategy: CountingStrategy) -> BenchmarkResult:
+    start = time.perf_counter()
+    test_manager = create_test_manager(market)
+    BacktestEngine(test_manager=test_manager, strategy=strategy).run()
+    seconds = time.perf_counter() - start
+    test_manager.data_loader.close()
+    return BenchmarkResult(f'end_to_end.{name}', seconds, bars=len(test_manager.portfolio.close_values),
+                           options=strategy.options)
+
+
+def run_suite(tier: Tier, legs: list[int], repeats: int, trace_memory: bool = False) -> list[BenchmarkResult]:
+    market = create_market(tier)
+    legs = sorted(set(legs))
+    legs_market = create_legs_market(tier, legs[-1])
+    benchmarks = [lambda: [bench_cache_load(market)],
+                  lambda: [bench_chain_construction(market)],
+                  lambda: bench_spread_selection(market, repeats)]
+    benchmarks += [lambda n=n: [bench_portfolio_next(legs_market, n)] for n in legs]
+    benchmarks += [lambda: [bench_expiry_settlement(legs_market, legs[-1])],
+                   lambda: [bench_end_to_end(market, 'zero_dte_iron_condor', ZeroDteIronCondorStrategy())],
+                   lambda: [bench_end_to_end(market, 'next_day_delta_put', NextDayDeltaPutStrategy())]]
+    results = []
+    for benchmark in benchmarks:
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            benchmark_results = benchmark()
+            peak_traced = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+        for result in benchmark_results:
+            result.peak_rss_bytes = get_peak_rss()
+            result.peak_traced_bytes = peak_traced
+            results.append(result)
+    return results
+
+
+def compare_results(results: list[dict], baseline: list[dict], threshold: float) -> list[dict]:
+    """
+    The benchmarks in both result sets whose bars per second dropped by more than the threshold,
+    as a fraction of the baseline
+    """
+    baseline_rates = {r['name']: r['bars_per_second'] for r in baseline}
+    regressions = []
+    for result in results:
+        baseline_rate = baseline_rates.get(result['name'])
+        if not baseline_rate:
+            continue
+        change = result['bars_per_second'] / baseline_rate - 1
+        if change < -threshold:
+            regressions.append({'name': result['name'], 'baseline_bars_per_second': baseline_rate,
+                                'bars_per_second': result['bars_per_second'], 'change': change})
+    return regressions
+
+
+@contextlib.contextmanager
+def benchmark_settings():
+    """
+    Turns off fees and slippage and reads the synthetic data format, and puts the settings back afterwards
+    """
+    previous = {name: settings.get(name, None) for name in BENCHMARK_SETTINGS}
+    for name, value in BENCHMARK_SETTINGS.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
+
+
+def get_report(tier_name: str, tier: Tier, results: list[BenchmarkResult]) -> dict:
+    return {'tier': tier_name, 'days': tier.days, 'contracts': tier.contracts,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'results': [result.to_dict() for result in results]}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tier', choices=list(TIERS), default='day')
+    parser.add_argument('--legs', type=int, nargs='+', default=[1, 10, 50, 100, 250, 500])
+    parser.add_argument('--repeats', type=int, default=100, help='calls of each spread constructor')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare with this results file, instead of the stored tier baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the tier baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='report a regression if bars per second dropped by more than this fraction')
+    parser.add_argument('--trace-memory', action='store_true', help='report the peak memory traced by tracemalloc')
+    args = parser.parse_args(argv)
+
+    tier = TIERS[args.tier]
+    print(f'{args.tier}: {tier.days} days, {tier.contracts} contracts a minute')
+    with benchmark_settings():
+        results = run_suite(tier, args.legs, args.repeats, args.trace_memory)
+    print(f'{"benchmark":<36} {"seconds":>10} {"bars/s":>12} {"options/s":>14} {"peak MB":>10}')
+    for result in results:
+        peak = result.peak_traced_bytes if result.peak_traced_bytes is not None else result.peak_rss_bytes
+        peak_mb = f'{peak / 2 ** 20:>10.1f}' if peak is not None else f'{"":>10}'
+        print(f'{result.name:<36} {result.seconds:>10.4f} {result.bars_per_second:>12.1f} '
+              f'{result.options_per_second:>14.0f} {peak_mb}')
+
+    report = get_report(args.tier, tier, results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    tier_baseline_path = BASELINE_DIR / f'{args.tier}.json'
+    baseline_path = Path(args.baseline) if args.baseline else tier_baseline_path
+    exit_code = 0
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare_results(report['results'], baseline['results'], args.threshold)
+        for regression in regressions:
+            print(f'regression: {regression["name"]} {regression["bars_per_second"]:.1f} bars/s, '
+                  f'{regression["change"]:.0%} from {regression["baseline_bars_per_second"]:.1f}')
+        print(f'{len(regressions)} regressions over {args.threshold:.0%} against {baseline_path}')
+        exit_code = 1 if regressions else 0
+    if args.save_baseline or not tier_baseline_path.exists():
+        BASELINE_DIR.mkdir(exist_ok=True)
+        with open(tier_baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'stored the results as the baseline in {tier_baseline_path}')
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
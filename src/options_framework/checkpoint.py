@@ -0,0 +1,262 @@
+import datetime
+import importlib
+import os
+import pickle
+import struct
+import zlib
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from options_framework.option import Option, TradeOpenInfo, TradeCloseInfo
+from options_framework.option_types import OptionStatus
+from options_framework.spreads.option_combo import OptionCombination, reserve_position_ids
+
+# A checkpoint file starts with the magic bytes and the format version,
+# followed by the zlib compressed pickle of the checkpoint values
+_HEADER = struct.Struct('<7sH')
+_MAGIC = b'OBFCKPT'
+_VERSION = 2
+CHECKPOINT_SUFFIX = '.ckpt'
+CLOSE_VALUES_FILE = 'close_values.bin'
+
+
+def get_checkpoint_path(checkpoint_dir: str | Path, quote_datetime: datetime.datetime) -> Path:
+    # the names sort in quote datetime order
+    return Path(checkpoint_dir) / f'checkpoint_{quote_datetime:%Y%m%d_%H%M%S}{CHECKPOINT_SUFFIX}'
+
+
+def find_latest_checkpoint(checkpoint_dir: str | Path) -> Path | None:
+    paths = sorted(Path(checkpoint_dir).glob(f'checkpoint_*{CHECKPOINT_SUFFIX}'))
+    return paths[-1] if paths else None
+
+
+def remove_old_checkpoints(checkpoint_dir: str | Path, keep: int) -> None:
+    """
+    Deletes all but the latest keep checkpoints
+    """
+    paths = sorted(Path(checkpoint_dir).glob(f'checkpoint_*{CHECKPOINT_SUFFIX}'))
+    for path in paths[:-keep] if keep > 0 else paths:
+        path.unlink()
+
+
+def _get_cursor_datetime(option: Option) -> int | None:
+    # the quote datetime of the update cache row the option is on, in nanoseconds since the epoch
+    if option._update_times is None or option._cursor < 0 or option.update_cache is not option._cursor_cache:
+        return None
+    return int(np.datetime64(option._update_times[option._cursor], 'ns').astype(np.int64))
+
+
+def _encode_option(option: Option) -> dict:
+    # The update cache is not saved. It is loaded again when the test is resumed.
+    values = {f.name: getattr(option, f.name) for f in fields(Option)
+              if not f.name.startswith('_') and f.name != 'update_cache'}
+    # the trade records are named tuples, which are saved as plain tuples
+    if option.trade_open_info is not None:
+        values['trade_open_info'] = tuple(option.trade_open_info)
+    if option.trade_close_info is not None:
+        values['trade_close_info'] = tuple(option.trade_close_info)
+    values['trade_close_records'] = [tuple(record) for record in option.trade_close_records]
+    return values
+
+
+def _decode_option(values: dict) -> Option:
+    values = dict(values)
+    option = Option(**{f.name: values.pop(f.name) for f in fields(Option) if f.init and f.name in values})
+    for name, value in values.items():
+        setattr(option, name, value)
+    if option.trade_open_info is not None:
+        option.trade_open_info = TradeOpenInfo(*option.trade_open_info)
+    if option.trade_close_info is not None:
+        option.trade_close_info = TradeCloseInfo(*option.trade_close_info)
+    option.trade_close_records = [TradeCloseInfo(*record) for record in option.trade_close_records]
+    return option
+
+
+def _encode_position(position: OptionCombination) -> dict:
+    options = position.options
+    values, option_fields = {}, {}
+    for f in fields(position):
+        value = getattr(position, f.name)
+        if f.name == 'options':
+            continue
+        if isinstance(value, Option):
+            # fields like Vertical.long_option refer to one of the options of the position
+            option_fields[f.name] = next(i for i, o in enumerate(options) if o is value)
+        else:
+            values[f.name] = value
+    position_type = type(position)
+    return {'type': (position_type.__module__, position_type.__qualname__),
+            'options': [_encode_option(o) for o in options], 'values': values, 'option_fields': option_fields}
+
+
+def _decode_position(state: dict) -> OptionCombination:
+    module, name = state['type']
+    position_type = getattr(importlib.import_module(module), name)
+    # The position is restored field by field. Calling the constructor would run the spread validation again
+    # and change the quantities of the options.
+    position = position_type.__new__(position_type)
+    position.options = [_decode_option(values) for values in state['options']]
+    for name, value in state['values'].items():
+        setattr(position, name, value)
+    for name, index in state['option_fields'].items():
+        setattr(position, name, position.options[index])
+    return position
+
+
+def _encode_close_values(close_values: list) -> dict:
+    timestamps = np.array([np.datetime64(row[0], 'ns') for row in close_values], dtype='datetime64[ns]')
+    extra = [row[2:] for row in close_values]
+    return {'timestamps': timestamps.astype(np.int64), 'values': np.array([row[1] for row in close_values]),
+            'extra': extra if any(extra) else None}
+
+
+def _decode_close_values(state: dict) -> list:
+    quote_datetimes = pd.DatetimeIndex(state['timestamps'].astype('datetime64[ns]')).to_pydatetime()
+    extra = state['extra'] if state['extra'] is not None else [[]] * len(quote_datetimes)
+    return [[quote_datetime, value] + list(args)
+            for quote_datetime, value, args in zip(quote_datetimes, state['values'].tolist(), extra)]
+
+
+@dataclass(repr=False)
+class CloseValuesLog:
+    """
+    The close values of a test, appended to a file in chunks. Each checkpoint only appends the close values
+    added since the previous checkpoint, so saving a checkpoint does not take longer as the test runs.
+    A checkpoint records the chunks that hold its close values. The file is only appended to, so resuming
+    from an earlier checkpoint never changes the chunks of the later ones.
+    """
+    path: Path
+    chunks: list = field(default_factory=list)
+    """The offset and length in the file of each chunk, in order"""
+    rows: int = 0
+    """The number of close values in the chunks"""
+
+    def append(self, close_values: list) -> None:
+        if len(close_values) <= self.rows:
+            return
+        data = zlib.compress(pickle.dumps(_encode_close_values(close_values[self.rows:]),
+                                          protocol=pickle.HIGHEST_PROTOCOL))
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+        self.chunks = self.chunks + [(offset, len(data))]
+        self.rows = len(close_values)
+
+    def read(self) -> list:
+        close_values = []
+        with open(self.path, 'rb') as f:
+            for offset, length in self.chunks:
+                f.seek(offset)
+                close_values += _decode_close_values(pickle.loads(zlib.decompress(f.read(length))))
+        return close_values
+
+    def get_state(self) -> dict:
+        return {'file': self.path.name, 'chunks': self.chunks, 'rows': self.rows}
+
+
+@dataclass(repr=False)
+class Checkpoint:
+    """
+    The state of a test after a bar: the portfolio cash, open and closed positions and close values, the quote the
+    open legs are on in their update caches, and the cache window of the data loader. A test resumed from the
+    checkpoint continues with the bar after quote_datetime.
+
+    Checkpoints are saved as pickles, so only load checkpoint files written by your own runs.
+    """
+    quote_datetime: datetime.datetime
+    """The quote datetime of the last bar before the checkpoint"""
+    cash: float
+    close_values: list
+    positions: list = field(default_factory=list)
+    closed_positions: list = field(default_factory=list)
+    leg_cursors: dict = field(default_factory=dict)
+    """The quote datetime of the update cache row of each open leg in nanoseconds, by position id and leg index"""
+    loader_state: dict = field(default_factory=dict)
+    user_state: dict = field(default_factory=dict)
+    close_values_log: CloseValuesLog | None = None
+    """The file the close values are appended to, when the checkpoint was saved or loaded"""
+
+    @classmethod
+    def capture(cls, test_manager) -> 'Checkpoint':
+        portfolio = test_manager.portfolio
+        positions = list(portfolio.positions.values())
+        leg_cursors = {(position.position_id, i): _get_cursor_datetime(option)
+                       for position in positions for i, option in enumerate(position.options)}
+        return cls(quote_datetime=portfolio.close_values[-1][0], cash=portfolio.cash,
+                   close_values=portfolio.close_values, positions=positions,
+                   closed_positions=list(portfolio.closed_positions.values()), leg_cursors=leg_cursors,
+                   loader_state=test_manager.data_loader.get_checkpoint_state(),
+                   user_state=test_manager.user_state)
+
+    def save(self, path: str | Path, close_values_log: CloseValuesLog = None) -> Path:
+        """
+        Writes the checkpoint. The file is written under a temporary name and then renamed, so an interrupted
+        run never leaves a partly written checkpoint.
+
+        The close values are appended to the close values log, which must be in the same folder as the
+        checkpoint. Pass the log of the previous checkpoint of the test, so only the new close values are written.
+        Without a log, all the close values are written to a log named after the checkpoint.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if close_values_log is None:
+            close_values_log = CloseValuesLog(path.with_name(path.stem + '_' + CLOSE_VALUES_FILE))
+        close_values_log.append(self.close_values)
+        self.close_values_log = close_values_log
+        state = {'quote_datetime': self.quote_datetime, 'cash': self.cash,
+                 'close_values': close_values_log.get_state(),
+                 'positions': [_encode_position(p) for p in self.positions],
+                 'closed_positions': [_encode_position(p) for p in self.closed_positions],
+                 'leg_cursors': self.leg_cursors, 'loader_state': self.loader_state, 'user_state': self.user_state}
+        data = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        temp_path = path.with_name(path.name + '.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION))
+            f.write(data)
+        os.replace(temp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> 'Checkpoint':
+        with open(path, 'rb') as f:
+            magic, version = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f'{path} is not a checkpoint file this version can read')
+            state = pickle.loads(zlib.decompress(f.read()))
+        log_state = state['close_values']
+        close_values_log = CloseValuesLog(Path(path).with_name(log_state['file']), chunks=log_state['chunks'],
+                                          rows=log_state['rows'])
+        state['close_values'] = close_values_log.read()
+        state['close_values_log'] = close_values_log
+        state['positions'] = [_decode_position(p) for p in state['positions']]
+        state['closed_positions'] = [_decode_position(p) for p in state['closed_positions']]
+        return cls(**state)
+
+    def restore(self, test_manager) -> None:
+        """
+        Sets the state of a new test manager from the checkpoint. The update caches of the open legs are loaded
+        from the earliest quote the legs are on, and the cursor of each leg is moved back to its quote.
+        """
+        portfolio = test_manager.portfolio
+        portfolio.restore(cash=self.cash, positions=self.positions, closed_positions=self.closed_positions,
+                          close_values=self.close_values)
+        position_ids = [p.position_id for p in self.positions + self.closed_positions]
+        if position_ids:
+            reserve_position_ids(max(position_ids) + 1)
+
+        legs = [(self.leg_cursors.get((position.position_id, i)), option) for position in self.positions
+                for i, option in enumerate(position.options) if OptionStatus.EXPIRED not in option.status]
+        cursors = [cursor for cursor, _ in legs if cursor is not None]
+        start = pd.Timestamp(min(cursors)).to_pydatetime() if cursors else self.quote_datetime
+        test_manager.data_loader.resume(self.loader_state, [option for _, option in legs], start)
+        for cursor, option in legs:
+            if option.update_cache is None:
+                continue
+            option._load_update_columns()
+            if cursor is not None and option._update_times is not None:
+                times = option._update_times.astype('datetime64[ns]').astype(np.int64)
+                option._cursor = int(np.searchsorted(times, cursor, side='right')) - 1
+        test_manager.user_state.update(self.user_state)
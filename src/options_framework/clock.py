@@ -0,0 +1,86 @@
+import datetime
+from dataclasses import dataclass, field
+
+import numpy as np
+
+NANOSECONDS_PER_DAY = 86_400 * 10 ** 9
+
+
+def _time_of_day_ns(value: datetime.time) -> int:
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 10 ** 9 + value.microsecond * 1000
+
+
+@dataclass(repr=False)
+class SkippingClock:
+    """
+    Chooses the next bar to visit, so a backtest does not step through bars where the strategy has nothing to do.
+
+    When no positions are open, the clock jumps to the next bar at one of the entry times. When positions are open,
+    every bar is visited unless a recheck interval or price bounds are given. With a recheck interval, the clock
+    jumps to the first bar at or after the interval. With price bounds, it stops at the first bar where the price
+    leaves the bounds. The last bar before the next settlement of the open positions and the settlement bar are
+    always visited, because expiring legs are settled with the last quote before the settlement.
+    """
+    timestamps: np.ndarray
+    """The bar timestamps, in nanoseconds since the epoch"""
+    entry_times: list[datetime.time]
+    """Times of day the strategy can open positions"""
+    recheck_interval: datetime.timedelta | None = None
+    """How often to visit a bar while positions are open"""
+    prices: np.ndarray | None = None
+    """Underlying price of each bar, used for the price bounds"""
+    entry_indexes: np.ndarray = field(init=False)
+    """Positions of the bars at the entry times"""
+    _recheck_ns: int | None = field(init=False, default=None)
+
+    def __post_init__(self):
+        self.timestamps = np.asarray(self.timestamps, dtype=np.int64)
+        times_of_day = self.timestamps % NANOSECONDS_PER_DAY
+        entry_times = np.array([_time_of_day_ns(t) for t in self.entry_times], dtype=np.int64)
+        self.entry_indexes = np.flatnonzero(np.isin(times_of_day, entry_times))
+        if self.recheck_interval is not None:
+            self._recheck_ns = int(self.recheck_interval.total_seconds() * 10 ** 9)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def get_first_index(self) -> int:
+        return int(self.entry_indexes[0]) if len(self.entry_indexes) else len(self.timestamps)
+
+    def get_next_index(self, index: int, positions_open: bool, next_settlement: datetime.datetime | None = None,
+                       price_bounds: tuple[float, float] | None = None) -> int:
+        """
+        Returns the position of the next bar to visit after the bar at index, or the number of bars if there are
+        no more bars to visit.
+
+        :param index: position of the bar that was just visited
+        :param positions_open: whether the portfolio has open positions after the bar
+        :param next_settlement: the earliest settlement of the open positions
+        :param price_bounds: low and high price. The clock stops at the first bar with a price outside the bounds.
+        """
+        end = len(self.timestamps)
+        loc = np.searchsorted(self.entry_indexes, index, side='right')
+        next_index = int(self.entry_indexes[loc]) if loc < len(self.entry_indexes) else end
+        if not positions_open:
+            return next_index
+
+        if price_bounds is None or self.prices is None:
+            if self._recheck_ns is None:
+                return index + 1
+            price_bounds = None
+        if self._recheck_ns is not None:
+            recheck = np.searchsorted(self.timestamps, self.timestamps[index] + self._recheck_ns, side='left')
+            next_index = min(next_index, int(recheck))
+        if next_settlement is not None:
+            settlement = np.datetime64(next_settlement, 'ns').astype(np.int64)
+            settlement_index = int(np.searchsorted(self.timestamps, settlement, side='left'))
+            before_settlement = settlement_index - 1
+            next_index = min(next_index, before_settlement if before_settlement > index else settlement_index)
+        next_index = max(next_index, index + 1)
+        if price_bounds is not None:
+            low, high = price_bounds
+            prices = self.prices[index + 1:next_index]
+            outside = np.flatnonzero((prices < low) | (prices > high))
+            if len(outside):
+                next_index = index + 1 + int(outside[0])
+        return next_index
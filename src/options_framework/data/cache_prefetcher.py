@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+
+from pandas import DataFrame
+
+
+@dataclass(slots=True)
+class CacheLoadStats:
+    """
+    Counts the cache windows loaded by a data loader, and how long the backtest was blocked waiting for them.
+    """
+    windows_loaded: int = 0
+    """Total number of cache windows loaded"""
+    prefetch_hits: int = 0
+    """Windows that were fetched in the background before they were needed"""
+    retained_hits: int = 0
+    """Windows that were already loaded by an earlier run and were kept in memory"""
+    waits: int = 0
+    """Windows the backtest had to wait for, either because it was fetched synchronously or was still in progress"""
+    wait_seconds: float = 0.0
+    """Total time spent waiting for cache windows"""
+
+    @property
+    def prefetch_hit_rate(self) -> float:
+        return self.prefetch_hits / self.windows_loaded if self.windows_loaded else 0.0
+
+    @property
+    def average_wait_seconds(self) -> float:
+        return self.wait_seconds / self.waits if self.waits else 0.0
+
+
+@dataclass(repr=False)
+class CachePrefetcher:
+    """
+    Loads data loader cache windows, optionally fetching the next window on a background thread
+    while the current window is being used. When a window is requested, the prefetched result is used
+    if it was fetched for the same key, otherwise the window is fetched synchronously.
+
+    The fetch function is called on the background thread, so it must not modify the data loader.
+    The caller swaps the returned window into the data loader cache.
+
+    When retain is set, every window is kept in memory by key, and a window that was loaded before is
+    not fetched again. This is used when the same data loader is rewound for several runs over the same data.
+    """
+    fetch: Callable[[Hashable], Any]
+    enabled: bool = False
+    retain: bool = False
+    stats: CacheLoadStats = field(init=False, default_factory=CacheLoadStats)
+    _executor: ThreadPoolExecutor | None = field(init=False, default=None)
+    _future: Future | None = field(init=False, default=None)
+    _future_key: Hashable = field(init=False, default=None)
+    _retained: dict = field(init=False, default_factory=dict)
+
+    def get(self, key: Hashable) -> DataFrame:
+        """
+        Returns the window for the key. Blocks until the window is fetched.
+        :param key: key identifying the window, usually the start of the window
+        :return: the result of the fetch function
+        """
+        if self.retain and key in self._retained:
+            self.stats.windows_loaded += 1
+            self.stats.retained_hits += 1
+            return self._retained[key]
+
+        future, future_key = self._future, self._future_key
+        self._future, self._future_key = None, None
+        self.stats.windows_loaded += 1
+
+        if future is not None and future_key == key:
+            if future.done():
+                self.stats.prefetch_hits += 1
+                result = future.result()
+            else:
+                start = time.perf_counter()
+                result = future.result()
+                self._record_wait(start)
+        else:
+            if future is not None:
+                future.cancel()
+            start = time.perf_counter()
+            result = self.fetch(key)
+            self._record_wait(start)
+
+        if self.retain:
+            self._retained[key] = result
+        return result
+
+    def prefetch(self, key: Hashable) -> None:
+        """
+        Starts fetching the window for the key in the background, if prefetching is enabled.
+        Any prefetch that is still pending for a different key is discarded.
+        """
+        if not self.enabled or key is None or (self.retain and key in self._retained):
+            return
+        if self._future is not None:
+            if self._future_key == key:
+                return
+            self._future.cancel()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cache_prefetch')
+        self._future = self._executor.submit(self.fetch, key)
+        self._future_key = key
+
+    def get_prefetched(self) -> Any:
+        """
+        The window fetched in the background that has not been requested yet, or None if there is no prefetch,
+        or it has not finished or failed
+        """
+        future = self._future
+        if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def get_retained(self) -> list:
+        """
+        The windows kept in memory when retain is set
+        """
+        return list(self._retained.values())
+
+    def shutdown(self) -> None:
+        if self._future is not None:
+            self._future.cancel()
+        self._future, self._future_key = None, None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _record_wait(self, start: float) -> None:
+        self.stats.waits += 1
+        self.stats.wait_seconds += time.perf_counter() - start
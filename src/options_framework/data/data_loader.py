@@ -1,13 +1,20 @@
 import os
 import datetime
+import weakref
 from abc import ABC, abstractmethod
 from typing import List
+from options_framework.data.cache_prefetcher import CachePrefetcher, CacheLoadStats
+from options_framework.data.query_telemetry import QueryTelemetry
+from options_framework.data.shared_chain_cache import SharedChainCache, SharedLoaderWindows
+from options_framework.data.update_cache_windows import UpdateCachePager, RetainedUpdateCaches
 from options_framework.option import Option
 from options_framework.option_types import OptionType, SelectFilter
 from options_framework.config import settings
 from pathlib import Path
 from pydispatch import Dispatcher
+import pandas as pd
 from pandas import DataFrame
+import numpy as np
 
 class DataLoader(ABC, Dispatcher):
     _events_ = ['option_chain_loaded']
@@ -21,10 +28,111 @@ class DataLoader(ABC, Dispatcher):
         self.select_filter = select_filter
         self.extended_option_attributes = extended_option_attributes if extended_option_attributes else []
         self.data_cache: DataFrame | None = None
+        self.data_cache_key = None
         self.last_loaded_date: datetime.datetime | None = None
+        self.cache_prefetcher: CachePrefetcher | None = None
+        self.query_telemetry: QueryTelemetry | None = None
+        """For loaders that query a database, the record of the queries they have run"""
+        self.pending_options: list[Option] = []
+        self.update_caches = weakref.WeakValueDictionary()
+        """Update caches already loaded, by option id. A cache is kept as long as an option is using it."""
+        self.update_cache_pager = UpdateCachePager(window_days=settings.get('UPDATE_CACHE_WINDOW_DAYS', None))
+        self.retained_update_caches: RetainedUpdateCaches | None = None
+        """When data is retained, the update caches loaded by earlier runs"""
+        self.load_visited_only = False
+        """When set, the option chain is fetched for each quote datetime that is requested, instead of loading
+        the cache window that starts there. Used when the clock skips most of the quote datetimes."""
+        self.shared_windows: SharedLoaderWindows | None = None
+        """When set, the cache windows are shared with other processes loading the same data"""
         super().__init__()
 
+    @property
+    def cache_stats(self) -> CacheLoadStats | None:
+        """
+        Cache window load counts and the time spent waiting for data, for loaders that load the data in windows
+        """
+        return self.cache_prefetcher.stats if self.cache_prefetcher is not None else None
+
+    def retain_data(self) -> None:
+        """
+        Keeps the option chain windows and update caches in memory after they are loaded, so the loader can be
+        rewound and used for another run over the same data without loading it again.
+        """
+        if self.retained_update_caches is None:
+            self.retained_update_caches = RetainedUpdateCaches()
+        if self.cache_prefetcher is not None:
+            self.cache_prefetcher.retain = True
+
+    def share_cache(self, shared_cache: SharedChainCache) -> None:
+        """
+        Loads the cache windows through a shared chain cache. A window that another process has already loaded
+        is attached from shared memory instead of being fetched, and is not copied into this process.
+        """
+        # Windows are only shared between loaders with the same type, test period, select filter and attributes
+        loader_key = (type(self).__name__, str(self.start_datetime), str(self.end_datetime),
+                      repr(self.select_filter), tuple(self.extended_option_attributes))
+        self.shared_windows = SharedLoaderWindows(shared_cache=shared_cache, loader_key=loader_key)
+        fetch = self.cache_prefetcher.fetch
+        self.cache_prefetcher.fetch = lambda key: self.shared_windows.fetch(fetch, key)
+
+    def _set_data_cache(self, key, df: DataFrame) -> None:
+        """
+        Makes the window loaded for the key the current cache. The shared window that was the current cache
+        is released, unless the windows are retained for another run.
+        """
+        if self.shared_windows is not None and self.data_cache is not None and not self.cache_prefetcher.retain:
+            self.shared_windows.release(self.data_cache_key)
+        self.data_cache = df
+        self.data_cache_key = key
+
+    def close(self) -> None:
+        """
+        Stops any prefetch in progress and releases the shared windows used by the loader
+        """
+        if self.cache_prefetcher is not None:
+            self.cache_prefetcher.shutdown()
+        self.data_cache = None
+        self.data_cache_key = None
+        if self.shared_windows is not None:
+            self.shared_windows.release_all()
+
+    def rewind(self) -> None:
+        """
+        Moves the loader back to the start of the test, and clears the state of the last run.
+        """
+        self._set_data_cache(None, None)
+        self.last_loaded_date = self.start_datetime - datetime.timedelta(days=1)
+        self.pending_options = []
+        self.update_cache_pager.clear()
+
+    def get_checkpoint_state(self) -> dict:
+        """
+        The position of the loader in the quote datetimes, saved with a checkpoint: the key of the current cache
+        window, which is the first quote datetime or date of the window
+        """
+        return {'window_key': self.data_cache_key}
+
+    def resume(self, state: dict, options: list[Option], start: datetime.datetime) -> None:
+        """
+        Moves the loader to the position saved with a checkpoint. The cache window that was current is loaded
+        again, and the update caches for the open options are loaded from the start datetime.
+        """
+        self.rewind()
+        key = state['window_key']
+        if key is not None:
+            if not isinstance(key, datetime.datetime):
+                key = datetime.datetime.combine(key, datetime.time.min)
+            self.load_cache(key)
+        options = [o for o in options if o.update_cache is None]
+        if options:
+            self._load_update_cache_window(options, start=start)
+            self.update_cache_pager.add(options)
+
     def next_option_chain(self, quote_datetime: datetime.datetime | datetime.date):
+        if self.load_visited_only:
+            self.on_option_chain_loaded(quote_datetime=quote_datetime,
+                                        option_chain=self.fetch_option_chain(quote_datetime))
+            return
         if self.last_loaded_date < quote_datetime:
             self.load_cache(quote_datetime)
         self.get_option_chain(quote_datetime)
@@ -34,17 +142,108 @@ class DataLoader(ABC, Dispatcher):
         pass
 
     def on_option_chain_loaded(self, quote_datetime: datetime.datetime | datetime.date,
-                               option_chain: list[Option]):
+                               option_chain: DataFrame | list[Option]):
         self.emit('option_chain_loaded', quote_datetime=quote_datetime, option_chain=option_chain)
 
     @abstractmethod
     def get_option_chain(self, quote_datetime: datetime.datetime):
         pass
 
+    def _get_cached_quotes(self, quote_datetime: datetime.datetime) -> DataFrame:
+        # The cache is ordered by quote_datetime, so the rows for one quote are a contiguous slice
+        quote_datetimes = self.data_cache.index.values
+        start = np.searchsorted(quote_datetimes, np.datetime64(quote_datetime), side='left')
+        end = np.searchsorted(quote_datetimes, np.datetime64(quote_datetime), side='right')
+        return self.data_cache.iloc[start:end]
+
     @abstractmethod
     def get_expirations(self):
         pass
 
     @abstractmethod
+    def fetch_option_chain(self, quote_datetime: datetime.datetime) -> DataFrame:
+        """
+        Fetches the option chain for one quote datetime, without loading it into the cache
+        """
+        pass
+
+    @abstractmethod
+    def get_quote_datetimes(self) -> pd.DatetimeIndex:
+        """
+        The quote datetimes with option quotes between the start and end of the test, in order
+        """
+        pass
+
     def on_options_opened(self, portfolio, options: list[Option]) -> None:
+        """
+        Queues the options of a new position. The update caches for all the options opened in a bar
+        are loaded together by load_update_caches before the next quote is processed.
+        """
+        self.pending_options.extend(options)
+
+    def load_update_caches(self, quote_datetime: datetime.datetime = None, *args) -> None:
+        """
+        Loads the update caches for the queued options with a single query. Options that already have a cache,
+        or have the same option id as an option with a cache, use the existing cache.
+        The caches end at the option expiration or the end of the test, whichever is first. When the
+        update cache pager has window days, the next window is loaded when the quote datetime moves past
+        the end of the loaded window.
+        """
+        options = [o for o in self.pending_options if o.update_cache is None]
+        self.pending_options = []
+        missing = []
+        for option in options:
+            cache = self.update_caches.get(option.option_id)
+            if cache is None:
+                cache = self._get_retained_update_cache(option)
+            if cache is not None:
+                option.update_cache = cache
+            else:
+                missing.append(option)
+        if missing:
+            self._load_update_cache_window(missing, start=min(o.trade_open_info.date for o in missing))
+        self.update_cache_pager.add(options)
+
+        if quote_datetime is None:
+            return
+        due = self.update_cache_pager.get_due(quote_datetime, self._get_update_cache_limit)
+        if due:
+            # Quotes before the current quote datetime will not be used, so the next window starts here
+            self._load_update_cache_window(due, start=quote_datetime)
+
+    def _load_update_cache_window(self, options: list[Option], start: datetime.datetime) -> None:
+        pager = self.update_cache_pager
+        end = max(pager.get_end(start, self._get_update_cache_limit(o)) for o in options)
+        caches = self.fetch_update_caches(options, start, end)
+        for option in options:
+            cache = caches.get(option.option_id)
+            option.update_cache = cache if cache is not None else DataFrame()
+            self.update_caches[option.option_id] = option.update_cache
+            option_end = pager.page_ends[option.option_id] = min(end, self._get_update_cache_limit(option))
+            if self.retained_update_caches is not None:
+                self.retained_update_caches.add(option.option_id, start, option_end, option.update_cache)
+
+    def _get_retained_update_cache(self, option: Option) -> DataFrame | None:
+        # A cache loaded by an earlier run can be used if it starts at or before the trade was opened
+        retained = self.retained_update_caches.get(option) if self.retained_update_caches else None
+        if retained is None:
+            return None
+        end, cache = retained
+        self.update_caches[option.option_id] = cache
+        self.update_cache_pager.page_ends[option.option_id] = end
+        return cache
+
+    def _get_update_cache_limit(self, option: Option) -> datetime.datetime:
+        # Options are PM settled, so there are no quotes after 4:15 PM on the expiration date
+        end_datetime = self.end_datetime
+        if not isinstance(end_datetime, datetime.datetime):
+            end_datetime = datetime.datetime.combine(end_datetime, datetime.time.max)
+        return min(datetime.datetime.combine(option.expiration, datetime.time(16, 15)), end_datetime)
+
+    @abstractmethod
+    def fetch_update_caches(self, options: list[Option], start: datetime.datetime, end: datetime.datetime) -> dict:
+        """
+        Fetches the quotes for the options between the start and end datetimes.
+        :return: dictionary of update cache DataFrames indexed by quote_datetime, by option id
+        """
         pass
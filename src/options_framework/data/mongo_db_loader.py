@@ -23,6 +23,15 @@ class MongoDbDataLoader(DataLoader):
     def load_cache(self, quote_datetime: datetime.datetime):
         pass
 
+    def fetch_update_caches(self, options: list[Option], start: datetime.datetime, end: datetime.datetime) -> dict:
+        pass
+
+    def fetch_option_chain(self, quote_datetime: datetime.datetime):
+        pass
+
+    def get_quote_datetimes(self):
+        pass
+
     def __init__(self, *, start: datetime.datetime, end: datetime.datetime, select_filter: SelectFilter,
                  extended_option_attributes: list[str] = None):
         pass
\ No newline at end of file
@@ -0,0 +1,218 @@
+import bisect
+import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pandas import DataFrame
+
+from options_framework.config import settings
+from options_framework.data.cache_prefetcher import CachePrefetcher
+from options_framework.data.data_loader import DataLoader
+from options_framework.option import Option
+from options_framework.option_types import SelectFilter
+
+BASE_FIELDS = ['option_id', 'symbol', 'expiration', 'strike', 'option_type', 'quote_datetime', 'spot_price',
+               'bid', 'ask', 'price']
+
+PARTITIONING = ds.partitioning(pa.schema([('symbol', pa.string()), ('quote_date', pa.date32())]), flavor='hive')
+
+
+def write_parquet_dataset(df: DataFrame, dataset_root: str | Path, row_group_size: int = 50_000) -> None:
+    """
+    Writes option quotes to a Parquet dataset partitioned by symbol and quote date, in the layout
+    the ParquetDataLoader reads: <dataset_root>/symbol=SPXW/quote_date=2016-03-01/*.parquet
+    The rows are sorted by expiration and strike inside each file, so the row group statistics let the loader
+    skip row groups outside the expiration, strike and greek ranges of the select filter.
+
+    :param df: option quotes with the option field names as columns. The quote_datetime can be a column or the index
+    :param dataset_root: root folder of the dataset
+    :param row_group_size: maximum number of rows in each row group
+    """
+    df = df.reset_index() if 'quote_datetime' not in df.columns else df.copy()
+    df['quote_datetime'] = pd.to_datetime(df['quote_datetime'])
+    df['expiration'] = pd.to_datetime(df['expiration'])
+    df['quote_date'] = df['quote_datetime'].dt.date
+    df = df.sort_values(['symbol', 'quote_date', 'expiration', 'strike', 'quote_datetime'])
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(table, dataset_root, format='parquet', partitioning=PARTITIONING,
+                     existing_data_behavior='overwrite_or_ignore', max_rows_per_group=row_group_size,
+                     min_rows_per_group=min(row_group_size, 1024))
+
+
+class ParquetDataLoader(DataLoader):
+    """
+    Loads option quotes from a local Parquet dataset partitioned by symbol and quote date.
+    The cache holds buffer_days quote dates at a time.
+    The select filter is converted to a dataset filter expression, so only the partitions and row groups that
+    can match are read, and only the columns for the extended option attributes are read from disk.
+    """
+
+    def __init__(self, *, start: datetime.datetime, end: datetime.datetime, select_filter: SelectFilter,
+                 extended_option_attributes: list[str] = None, dataset_root: str | Path = None):
+        super().__init__(start=start, end=end, select_filter=select_filter,
+                         extended_option_attributes=extended_option_attributes)
+        dataset_root = dataset_root if dataset_root else settings.PARQUET_DATA_LOADER_SETTINGS.dataset_root
+        self.dataset = ds.dataset(dataset_root, format='parquet', partitioning=PARTITIONING)
+        self.columns = BASE_FIELDS + self.extended_option_attributes
+        self.last_loaded_date = start - datetime.timedelta(days=1)
+        self.quote_dates = self._get_quote_dates_list()
+        self.expirations = self._get_expirations_list()
+        self.cache_prefetcher = CachePrefetcher(fetch=self._fetch_cache,
+                                                enabled=settings.PARQUET_DATA_LOADER_SETTINGS.get('prefetch', False))
+
+    def load_cache(self, start: datetime.datetime) -> None:
+        # Load whole quote dates. The window ends at the end of the last day loaded.
+        first_loc = bisect.bisect_left(self.quote_dates, start.date())
+        first_date = self.quote_dates[first_loc] if first_loc < len(self.quote_dates) else start.date()
+        df = self.cache_prefetcher.get(first_date)
+        last_date, next_date = self._get_window_dates(first_date)
+
+        self._set_data_cache(first_date, df)
+        self.last_loaded_date = datetime.datetime.combine(last_date, datetime.time.max)
+        self.cache_prefetcher.prefetch(next_date)
+
+    def _fetch_cache(self, first_date: datetime.date) -> DataFrame:
+        # This runs on the prefetch thread when prefetching is enabled, so it must not change the loader state
+        last_date, _ = self._get_window_dates(first_date)
+        fltr = self._build_filter(first_date, last_date)
+        table = self.dataset.to_table(columns=self.columns, filter=fltr)
+        df = table.to_pandas()
+        df = self._apply_relative_filters(df)
+        return df.sort_values(['quote_datetime', 'expiration', 'strike'], kind='stable').set_index('quote_datetime')
+
+    def fetch_option_chain(self, quote_datetime: datetime.datetime) -> DataFrame:
+        fltr = self._build_filter(quote_datetime.date(), quote_datetime.date()) \
+            & (ds.field('quote_datetime') == pd.Timestamp(quote_datetime))
+        df = self.dataset.to_table(columns=self.columns, filter=fltr).to_pandas()
+        df = self._apply_relative_filters(df)
+        return df.sort_values(['expiration', 'strike'], kind='stable').set_index('quote_datetime')
+
+    def _get_window_dates(self, first_date: datetime.date) -> tuple[datetime.date, datetime.date | None]:
+        """
+        Returns the last quote date of the cache window starting at first_date,
+        and the first quote date of the next window, or None if this is the last window.
+        """
+        buffer_days = settings.PARQUET_DATA_LOADER_SETTINGS.buffer_days
+        first_loc = bisect.bisect_left(self.quote_dates, first_date)
+        last_loc = first_loc + buffer_days - 1
+        if last_loc + 1 < len(self.quote_dates):
+            return self.quote_dates[last_loc], self.quote_dates[last_loc + 1]
+        last_date = self.quote_dates[-1] if self.quote_dates else first_date
+        return max(last_date, first_date), None
+
+    def get_option_chain(self, quote_datetime: datetime.datetime):
+        df = self._get_cached_quotes(quote_datetime)
+        super().on_option_chain_loaded(quote_datetime=quote_datetime, option_chain=df)
+
+    def get_expirations(self):
+        return self.expirations
+
+    def get_quote_datetimes(self) -> pd.DatetimeIndex:
+        # Only the quote_datetime column is read
+        fltr = ((ds.field('symbol') == self.select_filter.symbol)
+                & (ds.field('quote_date') >= self.start_datetime.date())
+                & (ds.field('quote_date') <= self.end_datetime.date())
+                & (ds.field('quote_datetime') >= pd.Timestamp(self.start_datetime))
+                & (ds.field('quote_datetime') <= pd.Timestamp(self.end_datetime)))
+        quote_datetimes = self.dataset.to_table(columns=['quote_datetime'], filter=fltr).column('quote_datetime')
+        quote_datetimes = pc.unique(quote_datetimes).to_pandas().sort_values()
+        return pd.DatetimeIndex(quote_datetimes, name='quote_datetime')
+
+    def fetch_update_caches(self, options: list[Option], start: datetime.datetime, end: datetime.datetime) -> dict:
+        option_ids = list(dict.fromkeys(o.option_id for o in options))
+        fltr = ((ds.field('symbol') == self.select_filter.symbol)
+                & (ds.field('quote_date') >= start.date())
+                & (ds.field('quote_date') <= end.date())
+                & ds.field('option_id').isin(option_ids)
+                & (ds.field('quote_datetime') >= pd.Timestamp(start))
+                & (ds.field('quote_datetime') <= pd.Timestamp(end)))
+        df = self.dataset.to_table(columns=self.columns, filter=fltr).to_pandas()
+        df = df.sort_values('quote_datetime', kind='stable').set_index('quote_datetime')
+
+        return dict(tuple(df.groupby('option_id', sort=False)))
+
+    def _build_filter(self, first_date: datetime.date, last_date: datetime.date) -> ds.Expression:
+        """
+        Converts the select filter to a dataset filter expression. Partitions are pruned by symbol and quote date,
+        and row groups are pruned with the expiration, option type and greek range statistics.
+        """
+        fltr = ((ds.field('symbol') == self.select_filter.symbol)
+                & (ds.field('quote_date') >= first_date)
+                & (ds.field('quote_date') <= last_date)
+                & (ds.field('quote_datetime') >= pd.Timestamp(self.start_datetime))
+                & (ds.field('quote_datetime') <= pd.Timestamp(self.end_datetime)))
+        if self.select_filter.option_type:
+            fltr &= ds.field('option_type') == self.select_filter.option_type.value
+
+        # The expiration range is relative to the quote date. Use the widest range for the window here,
+        # and the exact range for each quote is applied after the rows are read.
+        expiration_dte = self.select_filter.expiration_dte
+        if expiration_dte and expiration_dte.low:
+            fltr &= ds.field('expiration') >= pd.Timestamp(first_date + datetime.timedelta(days=expiration_dte.low))
+        if expiration_dte and expiration_dte.high is not None:
+            fltr &= ds.field('expiration') <= pd.Timestamp(last_date + datetime.timedelta(days=expiration_dte.high))
+
+        strike_offset = self.select_filter.strike_offset
+        if strike_offset and strike_offset.low:
+            fltr &= ds.field('strike') >= pc.subtract(ds.field('spot_price'), strike_offset.low)
+        if strike_offset and strike_offset.high:
+            fltr &= ds.field('strike') <= pc.add(ds.field('spot_price'), strike_offset.high)
+
+        for name, fltr_range in self._range_filters().items():
+            if fltr_range.low is not None:
+                fltr &= ds.field(name) >= fltr_range.low
+            if fltr_range.high is not None:
+                fltr &= ds.field(name) <= fltr_range.high
+
+        return fltr
+
+    def _range_filters(self) -> dict:
+        select_filter = self.select_filter
+        range_filters = {'delta': select_filter.delta_range, 'gamma': select_filter.gamma_range,
+                         'theta': select_filter.theta_range, 'vega': select_filter.vega_range,
+                         'rho': select_filter.rho_range, 'open_interest': select_filter.open_interest_range,
+                         'implied_volatility': select_filter.implied_volatility_range}
+        return {name: fltr_range for name, fltr_range in range_filters.items()
+                if fltr_range is not None and (fltr_range.low is not None or fltr_range.high is not None)}
+
+    def _apply_relative_filters(self, df: DataFrame) -> DataFrame:
+        expiration_dte = self.select_filter.expiration_dte
+        if not expiration_dte or (not expiration_dte.low and expiration_dte.high is None):
+            return df
+        quote_dates = df['quote_datetime'].dt.normalize()
+        mask = pd.Series(True, index=df.index)
+        if expiration_dte.low:
+            mask &= df['expiration'] >= quote_dates + pd.Timedelta(days=expiration_dte.low)
+        if expiration_dte.high is not None:
+            mask &= df['expiration'] <= quote_dates + pd.Timedelta(days=expiration_dte.high)
+        return df[mask]
+
+    def _get_quote_dates_list(self) -> list[datetime.date]:
+        # The quote dates are read from the partition folders, so no data files are opened
+        fltr = ((ds.field('symbol') == self.select_filter.symbol)
+                & (ds.field('quote_date') >= self.start_datetime.date())
+                & (ds.field('quote_date') <= self.end_datetime.date()))
+        quote_dates = {ds.get_partition_keys(fragment.partition_expression)['quote_date']
+                       for fragment in self.dataset.get_fragments(filter=fltr)}
+        return sorted(quote_dates)
+
+    def _get_expirations_list(self) -> list[datetime.date]:
+        expiration_dte = self.select_filter.expiration_dte
+        first_date = self.start_datetime.date()
+        last_date = self.end_datetime.date()
+        if expiration_dte and expiration_dte.low:
+            first_date += datetime.timedelta(days=expiration_dte.low)
+        if expiration_dte and expiration_dte.high is not None:
+            last_date += datetime.timedelta(days=expiration_dte.high)
+        fltr = ((ds.field('symbol') == self.select_filter.symbol)
+                & (ds.field('quote_date') >= self.start_datetime.date())
+                & (ds.field('quote_date') <= self.end_datetime.date())
+                & (ds.field('expiration') >= pd.Timestamp(first_date)))
+        if expiration_dte and expiration_dte.high is not None:
+            fltr &= ds.field('expiration') <= pd.Timestamp(last_date)
+        expirations = self.dataset.to_table(columns=['expiration'], filter=fltr).column('expiration')
+        expirations = pc.unique(expirations).to_pandas().sort_values()
+        return [x.to_pydatetime().date() for x in expirations]
@@ -0,0 +1,177 @@
+import datetime
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+import pandas as pd
+from pandas import DataFrame
+
+from options_framework.config import settings
+
+SUMMARY_COLUMNS = ['query_name', 'queries', 'rows', 'bytes', 'fetch_seconds', 'convert_seconds', 'max_seconds',
+                   'slow_queries']
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """
+    One query issued by a data loader
+    """
+    query_name: str
+    template: str
+    """The query before the parameters were put in"""
+    params: dict
+    rows: int
+    bytes: int
+    """Memory used by the DataFrame the rows were converted to"""
+    fetch_seconds: float
+    """Time to run the query and fetch the rows from the database"""
+    convert_seconds: float
+    """Time to convert the rows to a DataFrame"""
+    started: datetime.datetime
+
+    @property
+    def total_seconds(self) -> float:
+        return self.fetch_seconds + self.convert_seconds
+
+
+def format_query(template: str, params: dict) -> str:
+    """
+    Puts the parameters into a query template, where they are named in braces, like {start_date}
+    """
+    query = template
+    for name, value in params.items():
+        query = query.replace('{' + name + '}', str(value))
+    return query
+
+
+@dataclass(repr=False)
+class QueryTelemetry:
+    """
+    Records the queries a data loader runs. The queries are totalled by name as they are recorded: the number
+    of queries, the rows returned, the bytes of the DataFrames, and the time spent fetching the rows and
+    converting them to a DataFrame.
+
+    Queries that take at least slow_query_seconds are kept with their template and parameters, up to
+    max_slow_queries of the latest ones, and are appended to the slow query log file as JSON lines, with the
+    query that was run. get_summary returns the totals, and the BacktestEngine writes the summary to the
+    QUERY_SUMMARY_OUTPUT setting at the end of a run.
+
+    Only the SQL Server data loader runs queries, so it is the only loader with telemetry. The Parquet and
+    synthetic loaders leave query_telemetry unset, and the time they spend loading is timed by the profiler.
+
+    Cache windows can be fetched on the prefetch thread, so recording is done under a lock.
+    """
+    slow_query_seconds: float | None = None
+    slow_query_log: str | Path | None = None
+    max_slow_queries: int = 100
+    totals: dict = field(init=False, default_factory=dict)
+    """The totals of the queries by name, in the SUMMARY_COLUMNS order"""
+    slow_queries: deque = field(init=False)
+    """The latest slow queries"""
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+
+    def __post_init__(self):
+        self.slow_queries = deque(maxlen=self.max_slow_queries)
+
+    def read_sql(self, conn, query_name: str, template: str, params: dict,
+                 index_col: str | None = None) -> DataFrame:
+        """
+        Runs a query and returns the rows as a DataFrame, recording the query.
+        When index_col is set, the column is parsed as datetimes and used as the index.
+        """
+        started = datetime.datetime.now()
+        start = time.perf_counter()
+        # the query is run as it is, like pandas does, so colons in it are not read as bind parameters
+        result = conn.exec_driver_sql(format_query(template, params))
+        columns = list(result.keys())
+        rows = result.fetchall()
+        fetched = time.perf_counter()
+        df = DataFrame.from_records(rows, columns=columns, coerce_float=True)
+        if index_col is not None:
+            df = df.set_index(index_col)
+            df.index = pd.to_datetime(df.index)
+        converted = time.perf_counter()
+        self.record(QueryStats(query_name=query_name, template=template, params=params, rows=len(df),
+                               bytes=int(df.memory_usage(deep=True, index=True).sum()),
+                               fetch_seconds=fetched - start, convert_seconds=converted - fetched, started=started))
+        return df
+
+    def record(self, stats: QueryStats) -> None:
+        slow = self.is_slow(stats)
+        with self._lock:
+            total = self.totals.get(stats.query_name)
+            if total is None:
+                total = self.totals[stats.query_name] = [stats.query_name, 0, 0, 0, 0.0, 0.0, 0.0, 0]
+            total[1] += 1
+            total[2] += stats.rows
+            total[3] += stats.bytes
+            total[4] += stats.fetch_seconds
+            total[5] += stats.convert_seconds
+            total[6] = max(total[6], stats.total_seconds)
+            if slow:
+                total[7] += 1
+                self.slow_queries.append(stats)
+                if self.slow_query_log:
+                    self._write_slow_query(stats)
+
+    def is_slow(self, stats: QueryStats) -> bool:
+        return self.slow_query_seconds is not None and stats.total_seconds >= self.slow_query_seconds
+
+    def _write_slow_query(self, stats: QueryStats) -> None:
+        entry = asdict(stats) | {'total_seconds': stats.total_seconds,
+                                 'query': format_query(stats.template, stats.params)}
+        with open(self.slow_query_log, 'a') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+
+    def get_slow_queries(self) -> DataFrame:
+        """
+        One row per slow query that is kept, in the order they were run
+        """
+        with self._lock:
+            queries = list(self.slow_queries)
+        rows = [(q.query_name, q.rows, q.bytes, q.fetch_seconds, q.convert_seconds, q.started, q.params)
+                for q in queries]
+        return DataFrame(rows, columns=['query_name', 'rows', 'bytes', 'fetch_seconds', 'convert_seconds',
+                                        'started', 'params'])
+
+    def get_summary(self) -> DataFrame:
+        """
+        The queries totalled by name, ordered by total time
+        """
+        with self._lock:
+            totals = [list(total) for total in self.totals.values()]
+        summary = DataFrame(totals, columns=SUMMARY_COLUMNS)
+        order = (summary['fetch_seconds'] + summary['convert_seconds']).sort_values(ascending=False, kind='stable')
+        return summary.loc[order.index].reset_index(drop=True)
+
+    def export(self, path: str | Path) -> Path:
+        """
+        Writes the summary to a JSON file, or to a CSV file if the path ends with .csv
+        """
+        path = Path(path)
+        summary = self.get_summary()
+        if path.suffix.lower() == '.csv':
+            summary.to_csv(path, index=False)
+        else:
+            with open(path, 'w') as f:
+                json.dump({'queries': summary.to_dict(orient='records')}, f, indent=2)
+        return path
+
+    def write_output(self) -> Path | None:
+        """
+        Exports the summary to the QUERY_SUMMARY_OUTPUT setting, if it is set.
+        The BacktestEngine calls this at the end of a run.
+        """
+        output = settings.get('QUERY_SUMMARY_OUTPUT', None)
+        if not output or not self.totals:
+            return None
+        return self.export(output)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.totals = {}
+            self.slow_queries.clear()
@@ -0,0 +1,262 @@
+import ctypes
+import hashlib
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import secrets
+import struct
+import weakref
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Hashable
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# The segment starts with the number of consumers attached to it and the length of the JSON column layout
+_HEADER = struct.Struct('<qq')
+_ALIGNMENT = 64
+_INDEX_COLUMN = '__index__'
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _get_column_arrays(df: DataFrame) -> list[tuple[str, np.ndarray, list | None]]:
+    """
+    Returns the name, array and categories of each column, with the index first. Columns with a NumPy numeric or
+    datetime dtype are stored as they are. Any other column, like the symbol, is stored as categorical codes.
+    """
+    columns = [(_INDEX_COLUMN, df.index)] + [(name, df[name]) for name in df.columns]
+    arrays = []
+    for name, values in columns:
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufmM':
+            arrays.append((name, np.ascontiguousarray(values.to_numpy()), None))
+        else:
+            categorical = pd.Categorical(values)
+            arrays.append((name, np.ascontiguousarray(categorical.codes), categorical.categories.tolist()))
+    return arrays
+
+
+@dataclass(repr=False)
+class SharedWindow:
+    """
+    A data loader cache window attached from a shared memory segment. The DataFrame columns are views of the
+    segment, so every process that attaches to the window uses the same copy of the data.
+    """
+    name: str
+    data: DataFrame
+    _shm: shared_memory.SharedMemory
+    _lock: Any
+    attached: bool = True
+
+    @classmethod
+    def publish(cls, name: str, df: DataFrame, lock) -> 'SharedWindow':
+        """
+        Creates the shared memory segment for the window and copies the DataFrame into it.
+        The caller is counted as the first consumer.
+        """
+        arrays = _get_column_arrays(df)
+        layout = {'rows': len(df), 'index_name': df.index.name, 'columns': []}
+        offset = 0
+        for column_name, array, categories in arrays:
+            layout['columns'].append({'name': column_name, 'dtype': array.dtype.str, 'offset': offset,
+                                      'categories': categories})
+            offset = _align(offset + array.nbytes)
+        layout_bytes = json.dumps(layout).encode()
+        data_start = _align(_HEADER.size + len(layout_bytes))
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(data_start + offset, 1))
+        _HEADER.pack_into(shm.buf, 0, 1, len(layout_bytes))
+        shm.buf[_HEADER.size:_HEADER.size + len(layout_bytes)] = layout_bytes
+        for (_, array, _), column in zip(arrays, layout['columns']):
+            start = data_start + column['offset']
+            shm.buf[start:start + array.nbytes] = array.view(np.uint8).reshape(-1)
+        return cls(name=name, data=cls._read(shm), _shm=shm, _lock=lock)
+
+    @classmethod
+    def attach(cls, name: str, lock) -> 'SharedWindow | None':
+        """
+        Attaches to the segment for the window, or returns None if the window is not published.
+        Must be called with the lock held.
+        """
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            return None
+        consumers, layout_size = _HEADER.unpack_from(shm.buf, 0)
+        _HEADER.pack_into(shm.buf, 0, consumers + 1, layout_size)
+        return cls(name=name, data=cls._read(shm), _shm=shm, _lock=lock)
+
+    @staticmethod
+    def _read(shm: shared_memory.SharedMemory) -> DataFrame:
+        _, layout_size = _HEADER.unpack_from(shm.buf, 0)
+        layout = json.loads(bytes(shm.buf[_HEADER.size:_HEADER.size + layout_size]))
+        data_start = _align(_HEADER.size + layout_size)
+
+        # The columns are views of one array over the segment that does not export its buffer. The segment is only
+        # unmapped when that array, and so every DataFrame, slice and array that uses the window, is released.
+        address = ctypes.addressof(ctypes.c_char.from_buffer(shm.buf))
+        segment = np.ctypeslib.as_array((ctypes.c_uint8 * shm.size).from_address(address))
+        weakref.finalize(segment, shm.close)
+
+        rows = layout['rows']
+        columns = {}
+        for column in layout['columns']:
+            dtype = np.dtype(column['dtype'])
+            start = data_start + column['offset']
+            values = segment[start:start + rows * dtype.itemsize].view(dtype)
+            if column['categories'] is not None:
+                values = pd.Categorical.from_codes(values, categories=column['categories'], validate=False)
+            columns[column['name']] = values
+        index = pd.Index(columns.pop(_INDEX_COLUMN), name=layout['index_name'], copy=False)
+        return DataFrame(columns, index=index, copy=False)
+
+    def detach(self) -> None:
+        """
+        Stops counting this process as a consumer of the window. The last consumer to detach removes the segment.
+        The memory is freed once the data of the window is no longer used in any process.
+        """
+        if not self.attached:
+            return
+        self.attached = False
+        with self._lock:
+            consumers, layout_size = _HEADER.unpack_from(self._shm.buf, 0)
+            _HEADER.pack_into(self._shm.buf, 0, consumers - 1, layout_size)
+            if consumers == 1:
+                self._shm.unlink()
+        self.data = None
+
+
+@dataclass(repr=False)
+class SharedChainCache:
+    """
+    Shares data loader cache windows between processes with multiprocessing.shared_memory.
+
+    The first process that needs a window fetches it and publishes it to a shared memory segment. The other
+    processes attach to the segment and use the columns in place, so the memory for a window does not grow
+    with the number of worker processes. Each segment counts the processes attached to it, and the last process
+    to release the window removes the segment. Windows that are still attached when a process exits are
+    released then.
+
+    Create the cache in the parent process and pass it to the workers when they are started, so they all
+    use the same lock.
+    """
+    prefix: str = field(default_factory=lambda: f'obf_{secrets.token_hex(4)}_')
+    _lock: Any = field(default_factory=multiprocessing.Lock)
+    _windows: dict = field(init=False, default_factory=dict)
+    _uses: dict = field(init=False, default_factory=dict)
+    _finalizer: multiprocessing.util.Finalize | None = field(init=False, default=None)
+    _pid: int = field(init=False, default_factory=os.getpid)
+
+    def __post_init__(self):
+        if os.name == 'posix':
+            # Start the resource tracker before any workers are started, so they all report their segments to
+            # the same tracker. A worker with its own tracker would report a segment as leaked when another
+            # worker removes it.
+            resource_tracker.ensure_running()
+
+    def __getstate__(self) -> dict:
+        # the windows attached in this process are not sent to other processes
+        return {'prefix': self.prefix, '_lock': self._lock}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(prefix=state['prefix'], _lock=state['_lock'])
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def get_name(self, key: Hashable) -> str:
+        return self.prefix + hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+
+    def get(self, key: Hashable, fetch: Callable[[], DataFrame]) -> DataFrame:
+        """
+        Returns the window for the key, attaching to the published window if there is one. Otherwise the window is
+        fetched and published. Every get must be matched by a release when the window is no longer needed.
+        """
+        self._check_process()
+        name = self.get_name(key)
+        window = self._windows.get(name)
+        if window is None:
+            with self._lock:
+                window = SharedWindow.attach(name, self._lock)
+            if window is None:
+                # Fetch without holding the lock, so processes loading other windows do not wait.
+                # If another process published the window in the meantime, that copy is used.
+                df = fetch()
+                with self._lock:
+                    window = SharedWindow.attach(name, self._lock)
+                    if window is None:
+                        window = SharedWindow.publish(name, df, self._lock)
+            self._windows[name] = window
+            if self._finalizer is None:
+                self._finalizer = multiprocessing.util.Finalize(self, type(self)._release_windows,
+                                                                args=(self._windows,), exitpriority=10)
+        self._uses[name] = self._uses.get(name, 0) + 1
+        return window.data
+
+    def release(self, key: Hashable) -> None:
+        self._check_process()
+        name = self.get_name(key)
+        uses = self._uses.get(name, 0) - 1
+        if uses > 0:
+            self._uses[name] = uses
+            return
+        self._uses.pop(name, None)
+        window = self._windows.pop(name, None)
+        if window is not None:
+            window.detach()
+
+    def close(self) -> None:
+        """
+        Releases every window attached in this process
+        """
+        self._check_process()
+        self._uses.clear()
+        self._release_windows(self._windows)
+
+    def _check_process(self) -> None:
+        # A forked process gets a copy of the windows attached by its parent, but they are not its attachments
+        if self._pid != os.getpid():
+            self._windows, self._uses, self._finalizer = {}, {}, None
+            self._pid = os.getpid()
+
+    @staticmethod
+    def _release_windows(windows: dict) -> None:
+        for window in windows.values():
+            window.detach()
+        windows.clear()
+
+
+@dataclass(repr=False)
+class SharedLoaderWindows:
+    """
+    The windows of one data loader in a shared chain cache. The loader key is added to the key of each window, so
+    windows are only shared between loaders that load the same data. The keys of the windows the loader has
+    fetched and not released are kept, so they can be released when the loader moves on or is closed.
+    """
+    shared_cache: SharedChainCache
+    loader_key: tuple
+    keys: list = field(init=False, default_factory=list)
+
+    def get_key(self, key: Hashable) -> tuple:
+        return self.loader_key + (str(key),)
+
+    def fetch(self, fetch: Callable[[Hashable], DataFrame], key: Hashable) -> DataFrame:
+        # This can run on the prefetch thread, so it only records the key of the window it gets
+        df = self.shared_cache.get(self.get_key(key), lambda: fetch(key))
+        self.keys.append(key)
+        return df
+
+    def release(self, key: Hashable) -> None:
+        if key in self.keys:
+            self.keys.remove(key)
+            self.shared_cache.release(self.get_key(key))
+
+    def release_all(self) -> None:
+        for key in self.keys:
+            self.shared_cache.release(self.get_key(key))
+        self.keys = []
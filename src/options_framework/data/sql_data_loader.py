@@ -7,34 +7,13 @@ from sqlalchemy.engine import URL
 from sqlalchemy import create_engine
 from sqlalchemy.sql import text
 
-from multiprocessing import Pool
-
 from options_framework.config import settings
+from options_framework.data.cache_prefetcher import CachePrefetcher
 from options_framework.data.data_loader import DataLoader
+from options_framework.data.query_telemetry import QueryTelemetry, format_query
 from options_framework.option import Option
 from options_framework.option_types import OptionType, SelectFilter, FilterRange
 
-def create_option(quote_datetime, row, fields_list):
-    option = Option(
-        option_id=row['option_id'],
-        symbol=row['symbol'],
-        expiration=row['expiration'].date(),
-        strike=row['strike'],
-        option_type=OptionType.CALL if row['option_type'] == 1 else OptionType.PUT,
-        quote_datetime=quote_datetime,
-        spot_price=row['spot_price'],
-        bid=row['bid'],
-        ask=row['ask'],
-        price=row['price'],
-        delta=row['delta'] if 'delta' in fields_list else None,
-        gamma=row['gamma'] if 'gamma' in fields_list else None,
-        theta=row['theta'] if 'theta' in fields_list else None,
-        vega=row['vega'] if 'vega' in fields_list else None,
-        rho=row['rho'] if 'rho' in fields_list else None,
-        open_interest=row['open_interest'] if 'open_interest' in fields_list else None,
-        implied_volatility=row['implied_volatility'] if 'implied_volatility' in fields_list else None)
-    return option
-
 
 class SQLServerDataLoader(DataLoader):
 
@@ -50,84 +29,85 @@ class SQLServerDataLoader(DataLoader):
         connection_url = URL.create("mssql+pyodbc", query={"odbc_connect": connection_string})
 
         self.sql_alchemy_engine = create_engine(connection_url)
+        self.query_telemetry = QueryTelemetry(slow_query_seconds=settings.get('SLOW_QUERY_SECONDS', None),
+                                              slow_query_log=settings.get('SLOW_QUERY_LOG', None),
+                                              max_slow_queries=settings.get('MAX_SLOW_QUERIES', 100))
         self.last_loaded_date = start - datetime.timedelta(days=1)
         self.start_load_date = start
         self.datetimes_list = self._get_datetimes_list()
         expirations = self._get_expirations_list()
         self.expirations = [x.to_pydatetime().date() for x in list(expirations['expiration'])]
+        self.cache_prefetcher = CachePrefetcher(fetch=self._fetch_cache,
+                                                enabled=settings.SQL_DATA_LOADER_SETTINGS.get('prefetch', False))
 
     def load_cache(self, start: datetime.datetime) -> None:
         self.start_load_date = start
+        df = self.cache_prefetcher.get(start)
+        self._set_data_cache(start, df)
+        self.last_loaded_date = df.iloc[-1].name.to_pydatetime() # set to end of data loaded
+        self.cache_prefetcher.prefetch(self._get_next_window_start(self.last_loaded_date))
+
+    def _fetch_cache(self, start: datetime.datetime) -> pd.DataFrame:
+        # This runs on the prefetch thread when prefetching is enabled, so it must not change the loader state
         start_loc = self.datetimes_list.index.get_loc(str(start))
         end_loc = start_loc + settings.SQL_DATA_LOADER_SETTINGS.buffer_size
         end_loc = end_loc if end_loc < len(self.datetimes_list) else len(self.datetimes_list)-1
         query_end_date = self.datetimes_list.iloc[end_loc].name.to_pydatetime()
-        query = self._build_query(start, query_end_date)
         with self.sql_alchemy_engine.connect() as conn:
-            df = pd.read_sql(query, conn, index_col="quote_datetime", parse_dates=True)
+            df = self.query_telemetry.read_sql(conn, 'cache_window', self._build_query_template(),
+                                               self._get_query_params(start, query_end_date),
+                                               index_col="quote_datetime")
+        return df
 
-        df.index = pd.to_datetime(df.index)
-        self.data_cache = df
-        self.last_loaded_date = df.iloc[-1].name.to_pydatetime() # set to end of data loaded
+    def fetch_option_chain(self, quote_datetime: datetime.datetime) -> pd.DataFrame:
+        with self.sql_alchemy_engine.connect() as conn:
+            df = self.query_telemetry.read_sql(conn, 'option_chain', self._build_query_template(),
+                                               self._get_query_params(quote_datetime, quote_datetime),
+                                               index_col="quote_datetime")
+        return df
+
+    def _get_next_window_start(self, last_loaded_date: datetime.datetime) -> datetime.datetime | None:
+        next_loc = self.datetimes_list.index.searchsorted(last_loaded_date, side='right')
+        if next_loc >= len(self.datetimes_list):
+            return None
+        return self.datetimes_list.index[next_loc].to_pydatetime()
 
     def get_option_chain(self, quote_datetime):
+        df = self._get_cached_quotes(quote_datetime)
+        super().on_option_chain_loaded(quote_datetime=quote_datetime, option_chain=df)
 
-        df = self.data_cache.loc[str(quote_datetime)]
-        #count = len(df)
-        # rows = [(i, row, self.fields_list) for i, row in df.iterrows()]
-        # pool = Pool(processes=10)
-        # options = pool.starmap_async(create_option, rows).get()
-        # pool.close()
-        # pool.join()
-
-
-        options = [Option(
-            option_id=row['option_id'],
-            symbol=row['symbol'],
-            expiration=row['expiration'].date(),
-            strike=row['strike'],
-            option_type=OptionType.CALL if row['option_type'] == 1 else OptionType.PUT,
-            quote_datetime=i,
-            spot_price=row['spot_price'],
-            bid=row['bid'],
-            ask=row['ask'],
-            price=row['price'],
-            delta=row['delta'] if 'delta' in self.extended_option_attributes else None,
-            gamma=row['gamma'] if 'gamma' in self.extended_option_attributes else None,
-            theta=row['theta'] if 'theta' in self.extended_option_attributes else None,
-            vega=row['vega'] if 'vega' in self.extended_option_attributes else None,
-            rho=row['rho'] if 'rho' in self.extended_option_attributes else None,
-            open_interest=row['open_interest'] if 'open_interest' in self.extended_option_attributes else None,
-            implied_volatility=row['implied_volatility'] if 'implied_volatility' in self.extended_option_attributes else None
-            ) for i, row in df.iterrows()]
-
-        super().on_option_chain_loaded(quote_datetime=quote_datetime, option_chain=options)
-
-    def on_options_opened(self, portfolio, options: list[Option]) -> None:
-        option_ids = [str(o.option_id) for o in options]
-        open_date = options[0].trade_open_info.date
-        #print(f"options {','.join(option_ids)} were opened on {open_date}")
+    def fetch_update_caches(self, options: list[Option], start: datetime.datetime, end: datetime.datetime) -> dict:
+        option_ids = [str(o.option_id) for o in dict.fromkeys(o.option_id for o in options)]
         fields = ['option_id', 'symbol', 'expiration', 'strike', 'option_type', 'quote_datetime', 'spot_price',
                   'bid', 'ask', 'price'] + self.extended_option_attributes
         field_mapping = ','.join([db_field for option_field, db_field in settings.FIELD_MAPPING.items() \
                                   if option_field in fields])
         query = "select " + field_mapping
         query += settings.SELECT_OPTIONS_QUERY['from']
-        query += f' where option_id in ({",".join(option_ids)})'
-        query += f' and {settings.SELECT_OPTIONS_QUERY.quote_datetime_field} >= CONVERT(datetime2, \'{open_date}\')'
+        query += ' where option_id in ({option_ids})'
+        query += f' and {settings.SELECT_OPTIONS_QUERY.quote_datetime_field} >= CONVERT(datetime2, \'{{start}}\')'
+        query += f' and {settings.SELECT_OPTIONS_QUERY.quote_datetime_field} <= CONVERT(datetime2, \'{{end}}\')'
         query += f' order by {settings.SELECT_OPTIONS_QUERY.quote_datetime_field}'
+        params = {'option_ids': ",".join(option_ids), 'start': start, 'end': end}
         with self.sql_alchemy_engine.connect() as conn:
-            df = pd.read_sql(query, conn, index_col="quote_datetime", parse_dates=True)
-        df.index = pd.to_datetime(df.index)
+            df = self.query_telemetry.read_sql(conn, 'update_caches', query, params, index_col="quote_datetime")
 
-        for option in options:
-            cache = df.loc[df['option_id'] == option.option_id]
-            option.update_cache = cache
+        return dict(tuple(df.groupby('option_id', sort=False)))
 
     def get_expirations(self):
         return self.expirations
 
+    def get_quote_datetimes(self) -> pd.DatetimeIndex:
+        return self.datetimes_list.index
+
     def _build_query(self, start_date: datetime.datetime, end_date: datetime.datetime):
+        return format_query(self._build_query_template(), self._get_query_params(start_date, end_date))
+
+    def _get_query_params(self, start_date: datetime.datetime, end_date: datetime.datetime) -> dict:
+        return {'symbol': self.select_filter.symbol, 'start_date': start_date, 'end_date': end_date}
+
+    def _build_query_template(self):
+        # the symbol and dates are left as {symbol}, {start_date} and {end_date}, so every window has the same template
         fields = ['option_id', 'symbol', 'expiration', 'strike', 'option_type', 'quote_datetime', 'spot_price',
                        'bid', 'ask', 'price'] + self.extended_option_attributes
         field_mapping = ','.join([db_field for option_field, db_field in settings.FIELD_MAPPING.items() \
@@ -136,19 +116,18 @@ class SQLServerDataLoader(DataLoader):
         query = settings.SELECT_OPTIONS_QUERY['select']
         query += field_mapping
         query += settings.SELECT_OPTIONS_QUERY['from']
-        query += (settings.SELECT_OPTIONS_QUERY['where']
-                  .replace('{symbol}', self.select_filter.symbol)
-                  .replace('{start_date}', str(start_date))
-                  .replace('{end_date}', str(end_date)))
+        query += settings.SELECT_OPTIONS_QUERY['where']
         if self.select_filter.option_type:
             query += f' and option_type = {self.select_filter.option_type.value}'
 
         if self.select_filter.expiration_dte:
+            # the days to expiration are counted from the quote date, like the other data loaders do,
+            # so a high of 0 keeps only the options expiring on the quote date
             low_val, high_val = self.select_filter.expiration_dte.low, self.select_filter.expiration_dte.high
-            if low_val and low_val > 0:
-                query += f' and expiration >= DATEADD(day, {low_val}, quote_datetime)'
-            if high_val:
-                query += f' and expiration <= DATEADD(day, {high_val}, quote_datetime)'
+            if low_val:
+                query += f' and expiration >= DATEADD(day, {low_val}, CAST(quote_datetime AS date))'
+            if high_val is not None:
+                query += f' and expiration <= DATEADD(day, {high_val}, CAST(quote_datetime AS date))'
 
         if self.select_filter.strike_offset:
             low_val, high_val = self.select_filter.strike_offset.low, self.select_filter.strike_offset.high
@@ -172,10 +151,11 @@ class SQLServerDataLoader(DataLoader):
         symbol = self.select_filter.symbol
         start_date = self.start_datetime
         end_date = self.end_datetime
-        query = settings.SELECT_OPTIONS_QUERY.quote_datetime_list_query.replace('{symbol}', symbol).replace('{start_date}', str(start_date)).replace('{end_date}', str(end_date))
+        query = settings.SELECT_OPTIONS_QUERY.quote_datetime_list_query
+        params = {'symbol': symbol, 'start_date': start_date, 'end_date': end_date}
         with self.sql_alchemy_engine.connect() as conn:
-            df = pd.read_sql(query, conn, parse_dates=True, index_col=[settings.SELECT_OPTIONS_QUERY.quote_datetime_field])
-        df.index = pd.to_datetime(df.index)
+            df = self.query_telemetry.read_sql(conn, 'quote_datetimes', query, params,
+                                               index_col=settings.SELECT_OPTIONS_QUERY.quote_datetime_field)
         return df
 
     def _get_expirations_list(self):
@@ -186,10 +166,8 @@ class SQLServerDataLoader(DataLoader):
         exp_end = self.select_filter.expiration_dte.high
         start_date += datetime.timedelta(days=exp_start)
         end_date += datetime.timedelta(days=exp_end)
-        query = settings.SELECT_OPTIONS_QUERY['select_expirations_list_query'] \
-                .replace('{symbol}', symbol) \
-                .replace('{start_date}', str(start_date)) \
-                .replace('{end_date}', str(end_date))
+        query = settings.SELECT_OPTIONS_QUERY['select_expirations_list_query']
+        params = {'symbol': symbol, 'start_date': start_date, 'end_date': end_date}
         # query = "select distinct expiration "
         # query += settings.SELECT_OPTIONS_QUERY['from']
         # query += (settings.SELECT_OPTIONS_QUERY['where']
@@ -198,5 +176,5 @@ class SQLServerDataLoader(DataLoader):
         #           .replace('{end_date}', str(end_date)))
         # query += " order by expiration"
         with self.sql_alchemy_engine.connect() as conn:
-            df = pd.read_sql(query, conn, parse_dates=True)
+            df = self.query_telemetry.read_sql(conn, 'expirations', query, params)
         return df
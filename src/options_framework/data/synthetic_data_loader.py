@@ -0,0 +1,388 @@
+import bisect
+import datetime
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from options_framework.config import settings
+from options_framework.data.cache_prefetcher import CachePrefetcher
+from options_framework.data.data_loader import DataLoader
+from options_framework.option import Option
+from options_framework.option_types import OptionType, SelectFilter
+
+BASE_FIELDS = ['option_id', 'symbol', 'expiration', 'strike', 'option_type', 'quote_datetime', 'spot_price',
+               'bid', 'ask', 'price']
+GREEK_FIELDS = ['delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest', 'implied_volatility']
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+
+def _norm_cdf(x: np.ndarray) -> np.ndarray:
+    # Abramowitz and Stegun 26.2.17, accurate to 7.5e-8, so the prices are exact to the cent
+    t = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    upper_tail = _norm_pdf(x) * poly
+    return np.where(x >= 0, 1.0 - upper_tail, upper_tail)
+
+
+def black_scholes(spot: np.ndarray, strike: np.ndarray, years: np.ndarray, volatility: np.ndarray,
+                  rate: float, is_call: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Black-Scholes prices and greeks of European options on an underlying without dividends.
+    Theta is per calendar day, and vega and rho are per percentage point. Options with no time left
+    are worth their intrinsic value, and only have a delta if they are in the money.
+    """
+    spot, strike, years, volatility, is_call = np.broadcast_arrays(spot, strike, years, volatility, is_call)
+    expired = years <= 0
+    t = np.where(expired, 1.0, years)
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * volatility ** 2) * t) / (volatility * sqrt_t)
+    d2 = d1 - volatility * sqrt_t
+    discount = np.exp(-rate * t)
+    pdf_d1 = _norm_pdf(d1)
+    sign = np.where(is_call, 1.0, -1.0)
+    cdf_d1, cdf_d2 = _norm_cdf(sign * d1), _norm_cdf(sign * d2)
+
+    price = sign * (spot * cdf_d1 - strike * discount * cdf_d2)
+    delta = sign * cdf_d1
+    gamma = pdf_d1 / (spot * volatility * sqrt_t)
+    theta = (-spot * pdf_d1 * volatility / (2 * sqrt_t) - sign * rate * strike * discount * cdf_d2) / 365
+    vega = spot * pdf_d1 * sqrt_t / 100
+    rho = sign * strike * t * discount * cdf_d2 / 100
+
+    intrinsic = np.maximum(sign * (spot - strike), 0.0)
+    in_the_money = intrinsic > 0
+    zero = np.zeros_like(price)
+    return {'price': np.where(expired, intrinsic, price),
+            'delta': np.where(expired, np.where(in_the_money, sign, 0.0), delta),
+            'gamma': np.where(expired, zero, gamma),
+            'theta': np.where(expired, zero, theta),
+            'vega': np.where(expired, zero, vega),
+            'rho': np.where(expired, zero, rho)}
+
+
+@dataclass(repr=False)
+class SyntheticMarket:
+    """
+    A deterministic market of minute quotes for an underlying and its daily expiring options.
+
+    The underlying follows a geometric Brownian motion drawn from the seed, one step per minute, over the
+    business days from start to end. Every trading day an expiration is listed expirations trading days ahead,
+    so each day has expirations options chains, the nearest expiring that day. The strikes of an expiration are
+    strikes_per_expiration strikes strike_interval apart, centered on the underlying price when it is listed,
+    and do not change until it expires.
+
+    Option prices and greeks are Black-Scholes values, with an implied volatility of volatility plus skew times
+    the log moneyness of the strike. Time is counted in trading minutes, with 252 trading days a year, for both
+    the underlying and the options, and options expire at the last minute of the day. The bid and ask are spread
+    around the price. The same parameters always give the same quotes, so a market can be shared by several
+    loaders, like the shards of a day sharded run.
+    """
+    start: datetime.date
+    end: datetime.date
+    symbol: str = 'SPXW'
+    seed: int = 0
+    spot_price: float = 2000.0
+    """The price of the underlying at the first minute"""
+    volatility: float = 0.2
+    """The annual volatility of the underlying, and the implied volatility of the options at the money"""
+    drift: float = 0.0
+    rate: float = 0.0
+    skew: float = -0.1
+    strikes_per_expiration: int = 40
+    strike_interval: float = 5.0
+    expirations: int = 5
+    """The number of expirations quoted each day"""
+    minutes_per_day: int = 405
+    first_quote_time: datetime.time = datetime.time(9, 31)
+    spread: float = 0.02
+    """The bid to ask spread as a fraction of the price. The spread is at least 5 cents."""
+    trading_days: list = field(init=False, default_factory=list)
+    expiration_dates: list = field(init=False, default_factory=list)
+    """Every expiration listed in the market, in order. The position of an expiration is part of its option ids."""
+    spot_prices: np.ndarray = field(init=False, repr=False)
+    """The underlying price for each trading day and minute"""
+    _strike_centers: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.start = self.start.date() if isinstance(self.start, datetime.datetime) else self.start
+        self.end = self.end.date() if isinstance(self.end, datetime.datetime) else self.end
+        days = pd.bdate_range(self.start, self.end)
+        self.trading_days = [d.date() for d in days]
+        self.expiration_dates = [d.date() for d in pd.bdate_range(days[0], periods=len(days) + self.expirations - 1)] \
+            if len(days) else []
+
+        rng = np.random.default_rng(self.seed)
+        dt = 1 / (TRADING_DAYS_PER_YEAR * self.minutes_per_day)
+        shocks = rng.standard_normal((len(days), self.minutes_per_day))
+        log_returns = (self.drift - 0.5 * self.volatility ** 2) * dt + self.volatility * math.sqrt(dt) * shocks
+        if log_returns.size:
+            # the path starts at spot_price
+            log_returns.flat[0] = 0.0
+        self.spot_prices = self.spot_price * np.exp(np.cumsum(log_returns.ravel())).reshape(log_returns.shape)
+
+        # an expiration is listed on the trading day expirations - 1 days before it, or the first day
+        listing_days = np.maximum(np.arange(len(self.expiration_dates)) - (self.expirations - 1), 0)
+        opening_prices = self.spot_prices[listing_days, 0] if len(days) else np.empty(0)
+        self._strike_centers = np.round(opening_prices / self.strike_interval) * self.strike_interval
+
+    @classmethod
+    def from_settings(cls, start: datetime.date, end: datetime.date) -> 'SyntheticMarket':
+        """
+        A market for the test period, with the parameters in the SYNTHETIC_DATA_LOADER_SETTINGS setting
+        """
+        market_settings = settings.get('SYNTHETIC_DATA_LOADER_SETTINGS', {})
+        parameters = {name: market_settings[name] for name in ['symbol', 'seed', 'spot_price', 'volatility', 'drift',
+                                                               'rate', 'skew', 'strikes_per_expiration',
+                                                               'strike_interval', 'expirations', 'minutes_per_day',
+                                                               'spread'] if name in market_settings}
+        return cls(start=start, end=end, **parameters)
+
+    @property
+    def contracts_per_day(self) -> int:
+        return self.expirations * 2 * self.strikes_per_expiration
+
+    def get_quote_datetimes(self) -> pd.DatetimeIndex:
+        first_times = pd.DatetimeIndex([datetime.datetime.combine(d, self.first_quote_time)
+                                        for d in self.trading_days]).as_unit('ns')
+        minutes = pd.to_timedelta(np.arange(self.minutes_per_day), unit='min')
+        quote_datetimes = (first_times.values[:, None] + minutes.values[None, :]).ravel()
+        return pd.DatetimeIndex(quote_datetimes, name='quote_datetime')
+
+    def get_day_index(self, quote_date: datetime.date) -> int | None:
+        i = bisect.bisect_left(self.trading_days, quote_date)
+        return i if i < len(self.trading_days) and self.trading_days[i] == quote_date else None
+
+    def get_strikes(self, expiration_index: int) -> np.ndarray:
+        offsets = np.arange(self.strikes_per_expiration) - self.strikes_per_expiration // 2
+        return self._strike_centers[expiration_index] + offsets * self.strike_interval
+
+    def get_listed_contracts(self, day_index: int) -> dict[str, np.ndarray]:
+        """
+        The options quoted on a trading day, ordered by expiration, strike and option type
+        """
+        expiration_indexes = np.arange(day_index, day_index + self.expirations)
+        strike_indexes = np.arange(self.strikes_per_expiration)
+        type_indexes = np.arange(2)
+        e, s, t = (a.ravel() for a in np.meshgrid(expiration_indexes, strike_indexes, type_indexes, indexing='ij'))
+        return self._get_contracts(e, t, s)
+
+    def get_contracts(self, option_ids: list[int]) -> dict[str, np.ndarray]:
+        """
+        The contracts of option ids, which hold the position of the expiration, the option type and the strike
+        """
+        ids = np.asarray(option_ids, dtype=np.int64) - 1
+        e, rest = np.divmod(ids, 2 * self.strikes_per_expiration)
+        t, s = np.divmod(rest, self.strikes_per_expiration)
+        return self._get_contracts(e, t, s)
+
+    def _get_contracts(self, expiration_indexes: np.ndarray, type_indexes: np.ndarray,
+                       strike_indexes: np.ndarray) -> dict[str, np.ndarray]:
+        offsets = strike_indexes - self.strikes_per_expiration // 2
+        strikes = self._strike_centers[expiration_indexes] + offsets * self.strike_interval
+        centers = self._strike_centers[expiration_indexes]
+        return {'option_id': (expiration_indexes * 2 * self.strikes_per_expiration
+                              + type_indexes * self.strikes_per_expiration + strike_indexes + 1).astype(np.int64),
+                'expiration_index': expiration_indexes,
+                'option_type': np.where(type_indexes == 0, OptionType.CALL.value, OptionType.PUT.value),
+                'strike': strikes.astype(float),
+                'open_interest': np.round(5000 * np.exp(-20 * np.abs(np.log(strikes / centers)))).astype(np.int64)}
+
+    def get_quotes(self, day_index: int, contracts: dict[str, np.ndarray] = None,
+                   minutes: slice = slice(None)) -> DataFrame:
+        """
+        The quotes of the options on a trading day, ordered by quote datetime and then in contract order.
+        All the options listed that day are quoted if contracts is not set. Contracts that expired before the day
+        are left out.
+        """
+        contracts = self.get_listed_contracts(day_index) if contracts is None else contracts
+        expiration_indexes = contracts['expiration_index']
+        live = (expiration_indexes >= day_index) & (expiration_indexes < day_index + self.expirations)
+        contracts = {name: values[live] for name, values in contracts.items()}
+
+        day = self.trading_days[day_index]
+        first_time = np.datetime64(datetime.datetime.combine(day, self.first_quote_time), 'ns')
+        minute_numbers = np.arange(self.minutes_per_day)[minutes]
+        quote_datetimes = first_time + minute_numbers.astype('timedelta64[m]')
+        spot = self.spot_prices[day_index, minutes]
+        expirations = np.array(self.expiration_dates, dtype='datetime64[D]')[contracts['expiration_index']]
+
+        n_minutes, n_contracts = len(quote_datetimes), len(contracts['option_id'])
+        # time to expiration is counted in trading minutes, the same clock the underlying moves on, so the
+        # implied volatility matches the volatility of the path. Options expire at the last minute of the day.
+        minutes_left = (contracts['expiration_index'][None, :] - day_index) * self.minutes_per_day \
+            + (self.minutes_per_day - 1 - minute_numbers)[:, None]
+        strike = contracts['strike'][None, :]
+        spot_grid = spot[:, None]
+        implied_volatility = np.maximum(self.volatility + self.skew * np.log(strike / spot_grid), 0.01)
+        values = black_scholes(spot_grid, strike, minutes_left / (TRADING_DAYS_PER_YEAR * self.minutes_per_day),
+                               implied_volatility, self.rate,
+                               (contracts['option_type'] == OptionType.CALL.value)[None, :])
+
+        price = np.round(values['price'], 2)
+        half_spread = np.maximum(price * self.spread, 0.05) / 2
+        columns = {'option_id': np.tile(contracts['option_id'], n_minutes),
+                   'symbol': self.symbol,
+                   'expiration': np.tile(expirations.astype('datetime64[ns]'), n_minutes),
+                   'strike': np.tile(contracts['strike'], n_minutes),
+                   'option_type': np.tile(contracts['option_type'], n_minutes),
+                   'quote_datetime': np.repeat(quote_datetimes, n_contracts),
+                   'spot_price': np.repeat(np.round(spot, 2), n_contracts),
+                   'bid': np.maximum(np.round(price - half_spread, 2), 0.0).ravel(),
+                   'ask': np.round(price + half_spread, 2).ravel(),
+                   'price': price.ravel()}
+        for name in ['delta', 'gamma', 'theta', 'vega', 'rho']:
+            columns[name] = values[name].ravel()
+        columns['open_interest'] = np.tile(contracts['open_interest'], n_minutes)
+        columns['implied_volatility'] = np.broadcast_to(implied_volatility, (n_minutes, n_contracts)).ravel()
+        return DataFrame(columns)
+
+
+class SyntheticDataLoader(DataLoader):
+    """
+    Loads option quotes generated by a SyntheticMarket, so a test can run at any scale without a database.
+    The cache holds buffer_days trading days at a time, and the select filter is applied to the generated quotes.
+    """
+
+    def __init__(self, *, start: datetime.datetime, end: datetime.datetime, select_filter: SelectFilter,
+                 extended_option_attributes: list[str] = None, market: SyntheticMarket = None,
+                 buffer_days: int = None):
+        super().__init__(start=start, end=end, select_filter=select_filter,
+                         extended_option_attributes=extended_option_attributes)
+        unknown = [name for name in self.extended_option_attributes if name not in GREEK_FIELDS]
+        if unknown:
+            raise ValueError(f'The synthetic data loader does not generate {", ".join(unknown)}')
+        loader_settings = settings.get('SYNTHETIC_DATA_LOADER_SETTINGS', {})
+        self.market = market if market is not None else SyntheticMarket.from_settings(start, end)
+        self.buffer_days = buffer_days if buffer_days else loader_settings.get('buffer_days', 1)
+        self.columns = BASE_FIELDS + self.extended_option_attributes
+        self.last_loaded_date = start - datetime.timedelta(days=1)
+        self.quote_dates = [d for d in self.market.trading_days if self._get_start_date() <= d <= self._get_end_date()]
+        self.expirations = self._get_expirations_list()
+        self.cache_prefetcher = CachePrefetcher(fetch=self._fetch_cache,
+                                                enabled=loader_settings.get('prefetch', False))
+
+    def _get_start_date(self) -> datetime.date:
+        start = self.start_datetime
+        return start.date() if isinstance(start, datetime.datetime) else start
+
+    def _get_end_date(self) -> datetime.date:
+        end = self.end_datetime
+        return end.date() if isinstance(end, datetime.datetime) else end
+
+    def load_cache(self, start: datetime.datetime) -> None:
+        # Load whole trading days. The window ends at the end of the last day loaded.
+        first_loc = bisect.bisect_left(self.quote_dates, start.date())
+        first_date = self.quote_dates[first_loc] if first_loc < len(self.quote_dates) else start.date()
+        df = self.cache_prefetcher.get(first_date)
+        last_loc = min(first_loc + self.buffer_days, len(self.quote_dates)) - 1
+        last_date = self.quote_dates[last_loc] if last_loc >= first_loc else first_date
+        next_date = self.quote_dates[last_loc + 1] if last_loc + 1 < len(self.quote_dates) else None
+
+        self._set_data_cache(first_date, df)
+        self.last_loaded_date = datetime.datetime.combine(last_date, datetime.time.max)
+        self.cache_prefetcher.prefetch(next_date)
+
+    def _fetch_cache(self, first_date: datetime.date) -> DataFrame:
+        # This runs on the prefetch thread when prefetching is enabled, so it must not change the loader state
+        first_loc = bisect.bisect_left(self.quote_dates, first_date)
+        dates = self.quote_dates[first_loc:first_loc + self.buffer_days]
+        frames = [self._filter(self.market.get_quotes(self.market.get_day_index(d))) for d in dates]
+        df = pd.concat(frames, ignore_index=True) if frames else DataFrame(columns=self.columns)
+        return df.set_index('quote_datetime')
+
+    def fetch_option_chain(self, quote_datetime: datetime.datetime) -> DataFrame:
+        day_index = self.market.get_day_index(quote_datetime.date())
+        minute = self._get_minute(quote_datetime)
+        if day_index is None or minute is None:
+            return DataFrame(columns=self.columns).set_index('quote_datetime')
+        df = self._filter(self.market.get_quotes(day_index, minutes=slice(minute, minute + 1)))
+        return df.set_index('quote_datetime')
+
+    def _get_minute(self, quote_datetime: datetime.datetime) -> int | None:
+        first_time = datetime.datetime.combine(quote_datetime.date(), self.market.first_quote_time)
+        minute, remainder = divmod((quote_datetime - first_time).total_seconds(), 60)
+        if remainder or not 0 <= minute < self.market.minutes_per_day:
+            return None
+        return int(minute)
+
+    def get_option_chain(self, quote_datetime: datetime.datetime):
+        df = self._get_cached_quotes(quote_datetime)
+        super().on_option_chain_loaded(quote_datetime=quote_datetime, option_chain=df)
+
+    def get_expirations(self):
+        return self.expirations
+
+    def get_quote_datetimes(self) -> pd.DatetimeIndex:
+        quote_datetimes = self.market.get_quote_datetimes()
+        in_test = (quote_datetimes >= pd.Timestamp(self.start_datetime)) \
+            & (quote_datetimes <= pd.Timestamp(self.end_datetime))
+        return quote_datetimes[in_test]
+
+    def fetch_update_caches(self, options: list[Option], start: datetime.datetime, end: datetime.datetime) -> dict:
+        option_ids = list(dict.fromkeys(o.option_id for o in options))
+        contracts = self.market.get_contracts(option_ids)
+        frames = []
+        for quote_date in self.quote_dates:
+            if not start.date() <= quote_date <= end.date():
+                continue
+            df = self.market.get_quotes(self.market.get_day_index(quote_date), contracts)
+            frames.append(df[(df['quote_datetime'] >= pd.Timestamp(max(start, self.start_datetime)))
+                             & (df['quote_datetime'] <= pd.Timestamp(min(end, self.end_datetime)))])
+        if not frames:
+            return {}
+        df = pd.concat(frames, ignore_index=True)[self.columns].set_index('quote_datetime')
+
+        return dict(tuple(df.groupby('option_id', sort=False)))
+
+    def _filter(self, df: DataFrame) -> DataFrame:
+        """
+        Applies the select filter and the test period to generated quotes, and keeps the loader columns
+        """
+        select_filter = self.select_filter
+        mask = (df['quote_datetime'] >= pd.Timestamp(self.start_datetime)) \
+            & (df['quote_datetime'] <= pd.Timestamp(self.end_datetime))
+        if select_filter.option_type:
+            mask &= df['option_type'] == select_filter.option_type.value
+        expiration_dte = select_filter.expiration_dte
+        if expiration_dte and (expiration_dte.low or expiration_dte.high is not None):
+            quote_dates = df['quote_datetime'].dt.normalize()
+            if expiration_dte.low:
+                mask &= df['expiration'] >= quote_dates + pd.Timedelta(days=expiration_dte.low)
+            if expiration_dte.high is not None:
+                mask &= df['expiration'] <= quote_dates + pd.Timedelta(days=expiration_dte.high)
+        strike_offset = select_filter.strike_offset
+        if strike_offset and strike_offset.low:
+            mask &= df['strike'] >= df['spot_price'] - strike_offset.low
+        if strike_offset and strike_offset.high:
+            mask &= df['strike'] <= df['spot_price'] + strike_offset.high
+        range_filters = {'delta': select_filter.delta_range, 'gamma': select_filter.gamma_range,
+                         'theta': select_filter.theta_range, 'vega': select_filter.vega_range,
+                         'rho': select_filter.rho_range, 'open_interest': select_filter.open_interest_range,
+                         'implied_volatility': select_filter.implied_volatility_range}
+        for name, fltr_range in range_filters.items():
+            if fltr_range is not None and fltr_range.low is not None:
+                mask &= df[name] >= fltr_range.low
+            if fltr_range is not None and fltr_range.high is not None:
+                mask &= df[name] <= fltr_range.high
+        return df.loc[mask.to_numpy(), self.columns].reset_index(drop=True)
+
+    def _get_expirations_list(self) -> list[datetime.date]:
+        expiration_dte = self.select_filter.expiration_dte
+        first_date, last_date = self._get_start_date(), self._get_end_date()
+        first_loc = bisect.bisect_left(self.market.trading_days, first_date)
+        last_loc = bisect.bisect_right(self.market.trading_days, last_date) - 1
+        expirations = self.market.expiration_dates[first_loc:last_loc + self.market.expirations]
+        if expiration_dte and expiration_dte.low:
+            first_date += datetime.timedelta(days=expiration_dte.low)
+        if expiration_dte and expiration_dte.high is not None:
+            last_date += datetime.timedelta(days=expiration_dte.high)
+            return [e for e in expirations if first_date <= e <= last_date]
+        return [e for e in expirations if e >= first_date]
@@ -0,0 +1,80 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Callable
+
+from pandas import DataFrame
+
+from options_framework.option import Option
+
+
+@dataclass(repr=False)
+class UpdateCachePager:
+    """
+    Tracks the update cache windows of the open options for a data loader. When window_days is set, the update
+    caches are loaded that many days at a time, and the next window of an option is due when the quote datetime
+    moves past the end of its loaded window. Without window_days, each cache is loaded to the option expiration
+    or the end of the test in one window.
+    """
+    window_days: int | None = None
+    page_ends: dict = field(init=False, default_factory=dict)
+    """The end of the loaded window, by option id"""
+    options: list = field(init=False, default_factory=list)
+    """The options whose caches are loaded in windows and do not reach their last quote yet"""
+
+    def get_end(self, start: datetime.datetime, limit: datetime.datetime) -> datetime.datetime:
+        """
+        The end of the window that starts at start, for an option with no quotes after limit
+        """
+        if self.window_days:
+            return min(limit, start + datetime.timedelta(days=self.window_days))
+        return limit
+
+    def add(self, options: list[Option]) -> None:
+        if self.window_days:
+            self.options += options
+
+    def get_due(self, quote_datetime: datetime.datetime,
+                get_limit: Callable[[Option], datetime.datetime]) -> list[Option]:
+        """
+        The options that need the next window of their update cache at the quote datetime. Options that were
+        closed, or whose loaded window reaches their last quote, are no longer tracked.
+        """
+        if not self.options:
+            return []
+        page_ends = self.page_ends
+        self.options = [o for o in self.options if o.update_cache is not None
+                        and page_ends[o.option_id] < get_limit(o)]
+        return [o for o in self.options if quote_datetime > page_ends[o.option_id]]
+
+    def clear(self) -> None:
+        self.page_ends = {}
+        self.options = []
+
+
+@dataclass(repr=False)
+class RetainedUpdateCaches:
+    """
+    The update caches loaded by earlier runs of a data loader that is rewound for another run over the same data,
+    with the start and end datetimes of each cache, by option id.
+    """
+    caches: dict = field(init=False, default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.caches)
+
+    def add(self, option_id, start: datetime.datetime, end: datetime.datetime, cache: DataFrame) -> None:
+        self.caches[option_id] = (start, end, cache)
+
+    def get(self, option: Option) -> tuple[datetime.datetime, DataFrame] | None:
+        """
+        The end and the update cache retained for the option, if a cache was retained that starts at or before
+        the trade was opened
+        """
+        retained = self.caches.get(option.option_id)
+        if retained is None or retained[0] > option.trade_open_info.date:
+            return None
+        _, end, cache = retained
+        return end, cache
+
+    def get_caches(self) -> list[DataFrame]:
+        return [cache for _, _, cache in self.caches.values()]
@@ -0,0 +1,186 @@
+import datetime
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from options_framework.data.data_loader import DataLoader
+from options_framework.option_types import SelectFilter
+from options_framework.results import TRADE_RECORD_COLUMNS, get_trade_records
+from options_framework.test_manager import OptionTestManager
+
+SHARD_COLUMNS = ['shard', 'first_date', 'last_date', 'units', 'starting_cash', 'profit_loss', 'ending_cash',
+                 'trades']
+SHARD_TRADE_COLUMNS = ['shard'] + TRADE_RECORD_COLUMNS
+
+
+@dataclass(repr=False)
+class ShardedResults:
+    """
+    The results of a day sharded run, after the cash has been chained from one shard to the next
+    """
+    shards: DataFrame
+    """One row per shard, with its dates, the units traded and the chained cash before and after it"""
+    equity_curve: pd.Series
+    """The chained portfolio value at every quote datetime, indexed by quote datetime"""
+    trades: DataFrame
+    """The positions closed in every shard, numbered in the order they were closed, with the units applied"""
+
+    @property
+    def ending_value(self) -> float:
+        return float(self.shards['ending_cash'].iloc[-1]) if len(self.shards) else None
+
+
+@dataclass(repr=False)
+class DayShardedRun:
+    """
+    Runs a path independent test, like a 0DTE strategy that opens and settles its positions within the day,
+    as independent shards of one or more trading days spread across a pool of worker processes.
+
+    Each shard gets its own OptionTestManager and data loader for the days of the shard, and starts with the
+    starting cash. run_test is called as run_test(test_manager) and drives the test for the shard, the same as
+    the run_test of a ParameterSweep. It must be a module level function so it can be sent to the worker
+    processes. Every position must be closed by the end of the shard.
+
+    Only the cash links one shard to the next, so the shards are chained together in a final pass, in date order.
+    Each shard trades one unit. When a position_sizer is given, it is called with the chained cash at the start of
+    each shard and returns the number of units for the shard, and the profit/loss, quantities and fees of the shard
+    are multiplied by the units. The results do not depend on the number of processes.
+    """
+    run_test: Callable[[OptionTestManager], None]
+    start_datetime: datetime.datetime
+    end_datetime: datetime.datetime
+    select_filter: SelectFilter
+    starting_cash: float
+    extended_option_attributes: list = field(default_factory=lambda: [])
+    days_per_shard: int = 1
+    processes: int | None = None
+    """Number of worker processes. None uses the number of CPUs, and 1 runs every shard in this process."""
+    seed: int = 0
+    position_sizer: Callable[[float], int] | None = None
+    """Returns the number of units to trade in a shard from the cash at the start of the shard"""
+    data_loader_factory: Callable[..., DataLoader] | None = None
+    """Creates the data loader for a shard, called with the start, end, select_filter and
+    extended_option_attributes keyword arguments. If not set, the test manager creates one from the settings."""
+    trading_days: list[datetime.date] | None = None
+    """The dates with quotes in the test. If not set, they are read from the quote datetimes of a data loader."""
+
+    def get_trading_days(self) -> list[datetime.date]:
+        if self.trading_days is None:
+            data_loader = _create_test_manager(self, self.start_datetime, self.end_datetime).data_loader
+            quote_datetimes = data_loader.get_quote_datetimes()
+            data_loader.close()
+            self.trading_days = sorted(set(quote_datetimes.date))
+        return [d for d in self.trading_days if self.start_datetime.date() <= d <= self.end_datetime.date()]
+
+    def get_shards(self) -> list[tuple[int, datetime.datetime, datetime.datetime]]:
+        """
+        The shard number, start and end datetime of each shard, in date order
+        """
+        days = self.get_trading_days()
+        shards = []
+        for shard, first in enumerate(range(0, len(days), self.days_per_shard)):
+            shard_days = days[first:first + self.days_per_shard]
+            start = max(self.start_datetime, datetime.datetime.combine(shard_days[0], datetime.time.min))
+            end = min(self.end_datetime, datetime.datetime.combine(shard_days[-1], datetime.time.max))
+            shards.append((shard, start, end))
+        return shards
+
+    def get_shard_seed(self, shard: int) -> int:
+        return int(np.random.SeedSequence([self.seed, shard]).generate_state(1)[0])
+
+    def run(self) -> ShardedResults:
+        shards = self.get_shards()
+        processes = self.processes if self.processes else os.cpu_count()
+        processes = min(processes, len(shards)) if shards else 1
+        if processes == 1:
+            _init_worker(self)
+            try:
+                results = [_run_shard(shard) for shard in shards]
+            finally:
+                _init_worker(None)
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(self,)) as executor:
+                results = list(executor.map(_run_shard, shards))
+        return self.chain_results(shards, results)
+
+    def chain_results(self, shards: list[tuple], results: list[tuple]) -> ShardedResults:
+        """
+        Chains the cash of the shards in date order, applying the units of each shard to its profit/loss
+        """
+        cash = self.starting_cash
+        shard_rows, equity_curves, trades = [], [], []
+        for (shard, start, end), (profit_loss, equity_curve, shard_trades) in zip(shards, results):
+            units = self.position_sizer(cash) if self.position_sizer is not None else 1
+            shard_profit_loss = round(profit_loss * units, 2)
+            equity_curves.append(equity_curve['profit_loss'].mul(units).add(cash).round(2)
+                                 .set_axis(equity_curve['quote_datetime']))
+            shard_trades = shard_trades.copy()
+            for name in ['quantity', 'trade_value', 'profit_loss', 'fees']:
+                shard_trades[name] = shard_trades[name] * units
+            trades.append(shard_trades)
+            shard_rows.append((shard, start.date(), end.date(), units, cash, shard_profit_loss,
+                               round(cash + shard_profit_loss, 2), len(shard_trades)))
+            cash = round(cash + shard_profit_loss, 2)
+
+        trades = [df for df in trades if not df.empty]
+        trades = pd.concat(trades, ignore_index=True) if trades else DataFrame(columns=SHARD_TRADE_COLUMNS)
+        trades['trade_number'] = range(len(trades))
+        equity_curve = pd.concat(equity_curves) if equity_curves else pd.Series(dtype=float)
+        equity_curve.name = 'portfolio_value'
+        return ShardedResults(shards=DataFrame(shard_rows, columns=SHARD_COLUMNS), equity_curve=equity_curve,
+                              trades=trades)
+
+
+# The run of the worker process
+_sharded_run: DayShardedRun | None = None
+
+
+def _init_worker(sharded_run: DayShardedRun | None) -> None:
+    global _sharded_run
+    _sharded_run = sharded_run
+
+
+def _create_test_manager(sharded_run: DayShardedRun, start: datetime.datetime,
+                         end: datetime.datetime) -> OptionTestManager:
+    data_loader = None
+    if sharded_run.data_loader_factory is not None:
+        data_loader = sharded_run.data_loader_factory(start=start, end=end, select_filter=sharded_run.select_filter,
+                                                      extended_option_attributes=sharded_run.extended_option_attributes)
+    return OptionTestManager(start_datetime=start, end_datetime=end, select_filter=sharded_run.select_filter,
+                             starting_cash=sharded_run.starting_cash,
+                             extended_option_attributes=sharded_run.extended_option_attributes,
+                             data_loader=data_loader)
+
+
+def _run_shard(shard: tuple[int, datetime.datetime, datetime.datetime]) -> tuple[float, DataFrame, DataFrame]:
+    shard_number, start, end = shard
+    sharded_run = _sharded_run
+    seed = sharded_run.get_shard_seed(shard_number)
+    random.seed(seed)
+    np.random.seed(seed)
+
+    test_manager = _create_test_manager(sharded_run, start, end)
+    try:
+        sharded_run.run_test(test_manager)
+    finally:
+        test_manager.detach()
+        test_manager.data_loader.close()
+    portfolio = test_manager.portfolio
+    if portfolio.positions:
+        raise ValueError(f'{len(portfolio.positions)} positions are still open at the end of the shard from '
+                         + f'{start} to {end}. Only strategies that close every position within a shard can be '
+                         + 'run in day shards.')
+
+    equity_curve = DataFrame([values[:2] for values in portfolio.close_values],
+                             columns=['quote_datetime', 'portfolio_value'])
+    equity_curve['profit_loss'] = equity_curve.pop('portfolio_value') - sharded_run.starting_cash
+    trades = DataFrame(get_trade_records(list(portfolio.closed_positions.values())), columns=TRADE_RECORD_COLUMNS)
+    trades.insert(0, 'shard', shard_number)
+    return portfolio.portfolio_value - sharded_run.starting_cash, equity_curve, trades
@@ -0,0 +1,249 @@
+import datetime
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from options_framework.clock import NANOSECONDS_PER_DAY
+from options_framework.option_chain import OptionChain
+from options_framework.option_portfolio import OptionPortfolio
+from options_framework.spreads.option_combo import OptionCombination
+from options_framework.test_manager import OptionTestManager
+
+PRICE_FIELDS = ['open', 'high', 'low', 'close']
+
+
+@dataclass(slots=True)
+class Bar:
+    """
+    The current bar of the engine clock. The engine updates the same Bar object on every bar,
+    so a strategy that needs to keep bar values must copy them.
+    """
+    index: int = 0
+    """Position of the bar in the clock"""
+    timestamp: int = 0
+    """Nanoseconds since the epoch"""
+    quote_datetime: datetime.datetime | None = None
+    new_day: bool = False
+    """True for the first bar of each date"""
+    open: float = float('nan')
+    high: float = float('nan')
+    low: float = float('nan')
+    close: float = float('nan')
+
+
+class Strategy:
+    """
+    Base class for the strategies run by the BacktestEngine. Override the callbacks the strategy uses.
+    The engine is set before on_start is called.
+
+    When the engine skips idle bars, entry_times must be set. Bars are skipped until the next entry time while
+    no positions are open. While positions are open, every bar is visited unless the strategy sets a
+    recheck_interval or returns price bounds from get_price_bounds.
+    """
+    engine: 'BacktestEngine' = None
+    entry_times: list[datetime.time] | None = None
+    recheck_interval: datetime.timedelta | None = None
+
+    def on_start(self) -> None:
+        pass
+
+    def on_bar(self, bar: Bar) -> None:
+        """
+        Called for every bar, after the portfolio has been moved to the bar
+        """
+        pass
+
+    def on_chain(self, option_chain: OptionChain) -> None:
+        """
+        Called when the engine has loaded the option chain for the current bar
+        """
+        pass
+
+    def on_expiry(self, position: OptionCombination) -> None:
+        """
+        Called when a position is closed because all its options expired
+        """
+        pass
+
+    def on_end(self) -> None:
+        pass
+
+    def get_price_bounds(self) -> tuple[float, float] | None:
+        """
+        Low and high underlying price. When the engine skips idle bars and positions are open,
+        the bars are skipped until the close leaves these bounds.
+        """
+        return None
+
+
+@dataclass(repr=False)
+class BacktestEngine:
+    """
+    Runs a strategy over the quote datetimes of a test, without Backtrader.
+
+    The clock is an array of int64 timestamps, built once before the run from the underlying price data,
+    or from the quote datetimes of the data loader if there is no price data. The datetime for each bar
+    and the new day flags are also computed once, so each bar only moves the portfolio and calls the strategy.
+    The option chain is only loaded when the strategy asks for it with load_option_chain.
+    If the test manager was resumed from a checkpoint, the run starts with the bar after the checkpoint.
+
+    When skip_idle_bars is set, the bars are visited with the skipping clock of the test manager, using the entry
+    times, recheck interval and price bounds of the strategy. The data loader then fetches the option chain
+    only for the bars that are visited.
+    """
+    test_manager: OptionTestManager
+    strategy: Strategy
+    price_data: DataFrame | None = None
+    """Underlying prices indexed by datetime. The open, high, low and close columns are set on each bar."""
+    skip_idle_bars: bool = False
+    clock: np.ndarray = field(init=False, default=None)
+    """The bar timestamps, in nanoseconds since the epoch"""
+    bar: Bar = field(init=False, default_factory=Bar)
+    expirations: set = field(init=False, default_factory=set)
+    _quote_datetimes: list = field(init=False, default_factory=list)
+    _days: list = field(init=False, default_factory=list)
+    _new_days: list = field(init=False, default_factory=list)
+    _prices: dict = field(init=False, default_factory=dict)
+    _stopped: bool = field(init=False, default=False)
+    _callbacks: dict = field(init=False, default_factory=dict)
+    """The strategy callbacks for the run, timed when the profiler is enabled"""
+
+    def __post_init__(self):
+        if self.price_data is not None:
+            index = pd.DatetimeIndex(self.price_data.index)
+        else:
+            index = self.test_manager.data_loader.get_quote_datetimes()
+        in_test = (index >= pd.Timestamp(self.test_manager.start_datetime)) \
+            & (index <= pd.Timestamp(self.test_manager.end_datetime))
+        index = pd.DatetimeIndex(index[in_test]).as_unit('ns')
+        self.clock = index.asi8
+        self._quote_datetimes = list(index.to_pydatetime())
+        days = self.clock // NANOSECONDS_PER_DAY
+        self._days = days.tolist()
+        self._new_days = np.concatenate([[True], days[1:] != days[:-1]]).tolist() if len(days) else []
+        if self.price_data is not None:
+            self._prices = {name: self.price_data[name].to_numpy(dtype=float)[in_test].tolist()
+                            for name in PRICE_FIELDS if name in self.price_data.columns}
+        self.expirations = set(self.test_manager.expirations)
+        self.portfolio.bind(position_expired=self._on_position_expired)
+
+    @property
+    def portfolio(self) -> OptionPortfolio:
+        return self.test_manager.portfolio
+
+    @property
+    def option_chain(self) -> OptionChain:
+        return self.test_manager.option_chain
+
+    def is_expiration(self, date: datetime.date) -> bool:
+        return date in self.expirations
+
+    def load_option_chain(self) -> OptionChain:
+        """
+        Loads the option chain for the current bar and passes it to the strategy on_chain callback
+        """
+        self.test_manager.get_current_option_chain(self.bar.quote_datetime)
+        self._get_callback('on_chain')(self.test_manager.option_chain)
+        return self.test_manager.option_chain
+
+    def stop(self) -> None:
+        """
+        Ends the run after the current bar
+        """
+        self._stopped = True
+
+    def run(self) -> OptionPortfolio:
+        strategy = self.strategy
+        strategy.engine = self
+        self._stopped = False
+        profiler = self.test_manager.profiler
+        self._callbacks = {name: getattr(strategy, name) if profiler is None
+                           else profiler.wrap(getattr(strategy, name), f'Strategy.{name}')
+                           for name in ['on_bar', 'on_chain', 'on_expiry']}
+        memory_monitor = self.test_manager.memory_monitor
+        if memory_monitor is not None:
+            memory_monitor.take_snapshot('start')
+        strategy.on_start()
+        if self.skip_idle_bars:
+            self._run_skipping_idle_bars()
+        else:
+            self._run_every_bar()
+        strategy.on_end()
+        if memory_monitor is not None:
+            memory_monitor.take_snapshot('end')
+            memory_monitor.write_output()
+            memory_monitor.stop()
+        if profiler is not None:
+            profiler.write_output()
+            # the instrumented methods are put back, so tests run after this one are not timed
+            profiler.disable()
+        query_telemetry = self.test_manager.data_loader.query_telemetry
+        if query_telemetry is not None:
+            query_telemetry.write_output()
+        return self.portfolio
+
+    def _run_every_bar(self) -> None:
+        bar = self.bar
+        portfolio_next, on_bar = self.portfolio.next, self._get_callback('on_bar')
+        quote_datetimes, new_days = self._quote_datetimes, self._new_days
+        prices = list(self._prices.items())
+        first_index = self._get_resumed_index() + 1
+        for i, timestamp in enumerate(self.clock[first_index:].tolist(), first_index):
+            bar.index, bar.timestamp = i, timestamp
+            bar.quote_datetime, bar.new_day = quote_datetimes[i], new_days[i]
+            for name, values in prices:
+                setattr(bar, name, values[i])
+            portfolio_next(bar.quote_datetime)
+            on_bar(bar)
+            if self._stopped:
+                break
+
+    def _run_skipping_idle_bars(self) -> None:
+        strategy, bar, portfolio = self.strategy, self.bar, self.portfolio
+        if strategy.entry_times is None:
+            raise ValueError('The strategy must set entry_times to skip idle bars')
+        closes = np.asarray(self._prices['close']) if 'close' in self._prices else None
+        clock = self.test_manager.get_skipping_clock(self.clock, strategy.entry_times, strategy.recheck_interval,
+                                                     prices=closes)
+        calendar = portfolio.book.calendar
+        timestamps, quote_datetimes, days = self.clock.tolist(), self._quote_datetimes, self._days
+        prices = list(self._prices.items())
+        on_bar = self._get_callback('on_bar')
+        i, end, last_day = clock.get_first_index(), len(clock), None
+        resumed_index = self._get_resumed_index()
+        if resumed_index >= 0:
+            # continue with the bar the clock would have visited after the last bar before the checkpoint
+            positions_open = len(portfolio.positions) > 0
+            price_bounds = strategy.get_price_bounds() if positions_open else None
+            i = clock.get_next_index(resumed_index, positions_open, calendar.next_settlement, price_bounds)
+            last_day = days[resumed_index]
+        while i < end:
+            bar.index, bar.timestamp, bar.quote_datetime = i, timestamps[i], quote_datetimes[i]
+            bar.new_day, last_day = days[i] != last_day, days[i]
+            for name, values in prices:
+                setattr(bar, name, values[i])
+            portfolio.next(bar.quote_datetime)
+            on_bar(bar)
+            if self._stopped:
+                break
+            positions_open = len(portfolio.positions) > 0
+            price_bounds = strategy.get_price_bounds() if positions_open else None
+            i = clock.get_next_index(i, positions_open, calendar.next_settlement, price_bounds)
+
+    def _get_resumed_index(self) -> int:
+        # the position of the last bar before the checkpoint the test was resumed from, or -1
+        resumed_datetime = self.test_manager.resumed_datetime
+        if resumed_datetime is None:
+            return -1
+        timestamp = np.datetime64(resumed_datetime, 'ns').astype(np.int64)
+        return int(np.searchsorted(self.clock, timestamp, side='right')) - 1
+
+    def _get_callback(self, name: str):
+        # the callbacks are only set while running, so a chain loaded outside a run goes straight to the strategy
+        callback = self._callbacks.get(name)
+        return callback if callback is not None else getattr(self.strategy, name)
+
+    def _on_position_expired(self, position: OptionCombination) -> None:
+        self._get_callback('on_expiry')(position)
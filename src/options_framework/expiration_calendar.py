@@ -0,0 +1,72 @@
+import datetime
+import heapq
+from dataclasses import dataclass, field
+
+SETTLEMENT_TIME = datetime.time(16, 15)
+
+
+def get_settlement_datetime(expiration: datetime.date) -> datetime.datetime:
+    """
+    Options are assumed to be PM settled, at 16:15 on the expiration date
+    """
+    return datetime.datetime.combine(expiration, SETTLEMENT_TIME)
+
+
+@dataclass(repr=False)
+class ExpirationCalendar:
+    """
+    Buckets the slots of the position book by settlement datetime, so the book only does expiry work on the bars
+    where a bucket is due. Checking for expirations on any other bar is a single comparison with next_settlement.
+    """
+    next_settlement: datetime.datetime | None = field(init=False, default=None)
+    """The earliest settlement datetime of the legs in the calendar"""
+    _buckets: dict = field(init=False, default_factory=dict)
+    _settlements: dict = field(init=False, default_factory=dict)
+    _heap: list = field(init=False, default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self._settlements)
+
+    def add(self, slot: int, settlement: datetime.datetime) -> None:
+        bucket = self._buckets.get(settlement)
+        if bucket is None:
+            bucket = self._buckets[settlement] = {}
+            heapq.heappush(self._heap, settlement)
+        bucket[slot] = None
+        self._settlements[slot] = settlement
+        if self.next_settlement is None or settlement < self.next_settlement:
+            self.next_settlement = settlement
+
+    def remove(self, slot: int) -> None:
+        settlement = self._settlements.pop(slot, None)
+        if settlement is None:
+            return
+        bucket = self._buckets[settlement]
+        del bucket[slot]
+        if not bucket:
+            # the empty bucket is dropped from the heap when it reaches the top
+            del self._buckets[settlement]
+            if settlement == self.next_settlement:
+                self._update_next_settlement()
+
+    def get_settlement(self, slot: int) -> datetime.datetime | None:
+        return self._settlements.get(slot)
+
+    def pop_due(self, quote_datetime: datetime.datetime) -> list[int]:
+        """
+        Removes and returns the slots of every bucket that settles at or before the quote datetime,
+        in settlement order.
+        """
+        slots = []
+        while self.next_settlement is not None and self.next_settlement <= quote_datetime:
+            bucket = self._buckets.pop(heapq.heappop(self._heap))
+            for slot in bucket:
+                del self._settlements[slot]
+            slots.extend(bucket)
+            self._update_next_settlement()
+        return slots
+
+    def _update_next_settlement(self) -> None:
+        while self._heap and self._heap[0] not in self._buckets:
+            heapq.heappop(self._heap)
+        self.next_settlement = self._heap[0] if self._heap else None
@@ -0,0 +1,232 @@
+import csv
+import datetime
+import json
+import sys
+import tracemalloc
+from dataclasses import dataclass, field, fields, is_dataclass
+from pathlib import Path
+
+import numpy as np
+from pandas import DataFrame
+
+from options_framework.config import settings
+
+try:
+    import resource
+except ImportError:
+    # the resource module is only available on Unix
+    resource = None
+
+HOLDERS = ['data_cache', 'prefetched_window', 'retained_windows', 'update_caches', 'position_book', 'option_chain',
+           'open_positions', 'closed_positions', 'close_values']
+SUMMARY_COLUMNS = ['holder', 'bytes', 'high_water_bytes']
+
+# Option fields that hold the update cache, which is counted on its own, or refer back to the position book
+_OPTION_CACHE_FIELDS = {'update_cache', '_cursor_cache', '_update_times', '_update_columns', '_book'}
+# Position book fields with the Option objects and update caches, which are counted with the positions and caches
+_BOOK_SHARED_FIELDS = {'options', '_caches', '_subscribed'}
+# Rows of the close values are measured this many at a time, and the size of the rest is estimated from them
+_CLOSE_VALUES_SAMPLE = 1000
+
+
+def get_size(obj, seen: set = None, exclude: set = frozenset()) -> int:
+    """
+    Estimates the memory used by an object and the objects it holds. DataFrames and arrays are measured with
+    their memory usage, and containers and dataclasses are followed. Objects already in seen are not counted
+    again, and dataclass fields in exclude are skipped.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(get_size(k, seen, exclude) + get_size(v, seen, exclude) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(get_size(v, seen, exclude) for v in obj)
+    elif is_dataclass(obj) and not isinstance(obj, type):
+        # a field without a default can be unset, like the quote datetime of an option chain that was not loaded
+        size += sum(get_size(getattr(obj, f.name, None), seen, exclude) for f in fields(obj) if f.name not in exclude)
+    return size
+
+
+def _get_close_values_size(close_values: list) -> int:
+    # The rows all have the same shape, so a large list is measured from a sample of its last rows
+    sample = close_values[-_CLOSE_VALUES_SAMPLE:]
+    sample_size = sum(get_size(row) for row in sample)
+    rows_size = sample_size * len(close_values) // len(sample) if sample else 0
+    return sys.getsizeof(close_values) + rows_size
+
+
+def get_peak_rss() -> int | None:
+    """
+    The peak resident memory of the process in bytes, where the platform reports it
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, and macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@dataclass(repr=False)
+class MemoryMonitor:
+    """
+    Attributes the memory of a test to the structures that hold most of it: the data loader cache windows, the
+    update caches of the options, the position book, the option chain, the open and closed positions, and the
+    portfolio close values.
+
+    get_report measures the holders on demand. With a sample interval, the holders are also measured every time
+    that many bars have run, and the high-water mark of each holder is kept. When trace_allocations is set,
+    tracemalloc is started, and take_snapshot records the allocations at a phase of the run so the snapshots
+    of two phases can be compared with get_snapshot_diff. The BacktestEngine takes snapshots at the start
+    and end of a run, writes the summary to the MEMORY_OUTPUT setting, and stops the monitor.
+    """
+    test_manager: object
+    sample_interval: int | None = None
+    """Measures the holders every time this many bars have run"""
+    trace_allocations: bool = False
+    samples: list = field(init=False, default_factory=list)
+    """The quote datetime, the bytes of each holder and the peak resident memory of the process, for every sample"""
+    high_water_marks: dict = field(init=False, default_factory=dict)
+    """The most bytes each holder and the total have used in a sample"""
+    snapshots: dict = field(init=False, default_factory=dict)
+    """tracemalloc snapshots by phase name"""
+    _bars: int = field(init=False, default=0)
+    _closed_sizes: dict = field(init=False, default_factory=dict)
+    _started_tracing: bool = field(init=False, default=False)
+
+    def __post_init__(self):
+        if self.sample_interval:
+            self.test_manager.portfolio.bind(next=self._on_next)
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def get_report(self) -> dict[str, int]:
+        """
+        The bytes used by each holder, and the total
+        """
+        test_manager = self.test_manager
+        data_loader, portfolio = test_manager.data_loader, test_manager.portfolio
+        report = dict.fromkeys(HOLDERS, 0)
+        seen = set()
+        if data_loader.data_cache is not None:
+            report['data_cache'] = get_size(data_loader.data_cache, seen)
+        prefetcher = data_loader.cache_prefetcher
+        if prefetcher is not None:
+            prefetched = prefetcher.get_prefetched()
+            if prefetched is not None:
+                report['prefetched_window'] = get_size(prefetched, seen)
+            report['retained_windows'] = sum(get_size(df, seen) for df in prefetcher.get_retained())
+
+        caches = list(data_loader.update_caches.values())
+        caches += [o.update_cache for p in portfolio.positions.values() for o in p.options]
+        if data_loader.retained_update_caches:
+            caches += data_loader.retained_update_caches.get_caches()
+        report['update_caches'] = sum(get_size(cache, seen) for cache in caches if cache is not None)
+        report['position_book'] = get_size(portfolio.book, seen, _BOOK_SHARED_FIELDS)
+        report['option_chain'] = get_size(test_manager.option_chain, seen)
+        report['open_positions'] = sum(get_size(p, seen, _OPTION_CACHE_FIELDS) for p in portfolio.positions.values())
+        report['closed_positions'] = self._get_closed_positions_size(portfolio.closed_positions)
+        report['close_values'] = _get_close_values_size(portfolio.close_values)
+        report['total'] = sum(report.values())
+        return report
+
+    def _get_closed_positions_size(self, closed_positions: dict) -> int:
+        # Closed positions do not change, so each one is only measured once
+        sizes = self._closed_sizes
+        for position_id, position in closed_positions.items():
+            if position_id not in sizes:
+                sizes[position_id] = get_size(position, exclude=_OPTION_CACHE_FIELDS)
+        return sys.getsizeof(closed_positions) + sum(sizes[position_id] for position_id in closed_positions)
+
+    def sample(self, quote_datetime: datetime.datetime = None) -> dict[str, int]:
+        """
+        Measures the holders, keeps the sample and updates the high-water marks
+        """
+        report = self.get_report()
+        self.samples.append({'quote_datetime': quote_datetime} | report | {'peak_rss': get_peak_rss()})
+        for holder, size in report.items():
+            if size > self.high_water_marks.get(holder, 0):
+                self.high_water_marks[holder] = size
+        return report
+
+    def _on_next(self, quote_datetime: datetime.datetime, *args) -> None:
+        self._bars += 1
+        if self._bars >= self.sample_interval:
+            self._bars = 0
+            self.sample(quote_datetime)
+
+    def get_samples(self) -> DataFrame:
+        return DataFrame(self.samples, columns=['quote_datetime'] + HOLDERS + ['total', 'peak_rss'])
+
+    def get_summary(self, top: int = None) -> DataFrame:
+        """
+        The holders ordered by their high-water mark, with the bytes they hold now.
+        The largest top holders are returned if top is set.
+        """
+        report = self.sample(self.test_manager.portfolio.book.quote_datetime)
+        rows = [(holder, report[holder], self.high_water_marks.get(holder, 0)) for holder in HOLDERS]
+        summary = DataFrame(rows, columns=SUMMARY_COLUMNS)
+        summary = summary.sort_values('high_water_bytes', ascending=False, kind='stable').reset_index(drop=True)
+        return summary.head(top) if top is not None else summary
+
+    def take_snapshot(self, phase: str) -> tracemalloc.Snapshot | None:
+        """
+        Records the allocations traced at a phase of the run, if allocations are traced
+        """
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        self.snapshots[phase] = snapshot
+        return snapshot
+
+    def get_snapshot_diff(self, first_phase: str, second_phase: str, limit: int = 10) -> list[str]:
+        """
+        The source lines with the largest change in allocated memory from the first phase to the second
+        """
+        statistics = self.snapshots[second_phase].compare_to(self.snapshots[first_phase], 'lineno')
+        return [str(stat) for stat in statistics[:limit]]
+
+    def export(self, path: str | Path, top: int = None) -> Path:
+        """
+        Writes the summary to a JSON file, or to a CSV file if the path ends with .csv. The JSON file also has
+        the peak resident memory, and the allocation changes from the start to the end of the run if they
+        were traced.
+        """
+        path = Path(path)
+        summary = self.get_summary(top)
+        if path.suffix.lower() == '.csv':
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(SUMMARY_COLUMNS)
+                writer.writerows(summary.itertuples(index=False))
+        else:
+            output = {'holders': summary.to_dict(orient='records'), 'peak_rss': get_peak_rss()}
+            if {'start', 'end'} <= self.snapshots.keys():
+                output['allocation_changes'] = self.get_snapshot_diff('start', 'end')
+            with open(path, 'w') as f:
+                json.dump(output, f, indent=2)
+        return path
+
+    def write_output(self) -> list[Path]:
+        """
+        Exports the summary of the largest MEMORY_SUMMARY_TOP holders, or of all of them, to the MEMORY_OUTPUT
+        setting, if it is set. The BacktestEngine calls this at the end of a run.
+        """
+        output = settings.get('MEMORY_OUTPUT', None)
+        if not output:
+            return []
+        return [self.export(output, top=settings.get('MEMORY_SUMMARY_TOP', None))]
+
+    def stop(self) -> None:
+        if self.sample_interval:
+            self.test_manager.portfolio.unbind(self._on_next)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
@@ -3,9 +3,12 @@ from dataclasses import dataclass, field
 from decimal import Decimal
 from typing import Optional
 import datetime
+
+import numpy as np
 from pandas import DataFrame
 from options_framework.option_types import OptionPositionType, OptionType, OptionStatus
-from options_framework.utils.helpers import decimalize_0, decimalize_2, decimalize_4
+from options_framework.utils.helpers import decimalize_0, decimalize_2, decimalize_4, round_array
+from options_framework.utils.fixed_point import cents_enabled, cents_to_float, to_cents, to_quantity
 from options_framework.config import settings
 
 from pydispatch import Dispatcher
@@ -89,6 +92,15 @@ class Option(Dispatcher):
     update_cache: DataFrame | None = field(default=None, compare=False)
     user_defined: dict = field(default_factory=lambda: {}, compare=False)
 
+    # update cache columns as arrays, and the position of the current quote in them
+    _cursor_cache: DataFrame | None = field(init=False, default=None, compare=False)
+    _update_times: np.ndarray | None = field(init=False, default=None, compare=False)
+    _update_columns: tuple = field(init=False, default=(), compare=False)
+    _cursor: int = field(init=False, default=-1, compare=False)
+    # the position book and row of the option while it is an open leg in a portfolio
+    _book: object = field(init=False, default=None, compare=False)
+    _book_slot: int | None = field(init=False, default=None, compare=False)
+
     def __post_init__(self):
         # check for required fields
         if self.option_id is None:
@@ -126,12 +138,17 @@ class Option(Dispatcher):
         :return: fees that were added to the option
         :rtype: float
         """
-        fee = decimalize_2(settings.STANDARD_FEE)
-        qty = decimalize_0(quantity)
-        fees = fee * abs(qty)
-        total_fees = decimalize_2(self.total_fees) + fees
-        self.total_fees = float(total_fees)
-        fees = float(fees)
+        if cents_enabled():
+            fee_cents = to_cents(settings.STANDARD_FEE) * abs(to_quantity(quantity))
+            self.total_fees = cents_to_float(to_cents(self.total_fees) + fee_cents)
+            fees = cents_to_float(fee_cents)
+        else:
+            fee = decimalize_2(settings.STANDARD_FEE)
+            qty = decimalize_0(quantity)
+            fees = fee * abs(qty)
+            total_fees = decimalize_2(self.total_fees) + fees
+            self.total_fees = float(total_fees)
+            fees = float(fees)
 
         self.emit("fees_incurred", fees)
         #print(f'emit fees {self.option_id}')
@@ -149,39 +166,79 @@ class Option(Dispatcher):
         quote_time, exp_time = self.quote_datetime.time(), datetime.time(16, 15)
         if ((quote_date == expiration_date and quote_time >= exp_time)
                 or (quote_date > expiration_date)):
-            self.status |= OptionStatus.EXPIRED
-            self.emit("option_expired", self.option_id)
-            #print(f'emit expire {self.option_id}')
-            self.update_cache = None
+            self.expire()
             return True
         return False
 
+    def expire(self) -> None:
+        """
+        Adds the OptionStatus.EXPIRED flag and emits the option_expired event. The update cache is no longer needed.
+        """
+        self.status |= OptionStatus.EXPIRED
+        self.emit("option_expired", self.option_id)
+        #print(f'emit expire {self.option_id}')
+        self.update_cache = None
+
     def next_update(self, quote_datetime: datetime.datetime):
+        if self._book is not None:
+            self._book.update_leg(self, quote_datetime)
+            return
         self.quote_datetime = quote_datetime
         if self._check_expired():
             return
-        update_values = self.update_cache.loc[quote_datetime]
-        update_fields = [f for f in update_values.index if f not in ['option_id', 'symbol', 'strike', 'expiration',
-                                                                     'option_type']]
-        self.spot_price = update_values['spot_price']
-        self.bid = float(decimalize_2(update_values['bid']))
-        self.ask = float(decimalize_2(update_values['ask']))
-        self.price = float(decimalize_2(update_values['price']))
-
-        if 'delta' in update_fields:
-            self.delta = update_values['delta']
-        if 'gamma' in update_fields:
-            self.gamma = update_values['gamma']
-        if 'theta' in update_fields:
-            self.theta = update_values['theta']
-        if 'vega' in update_fields:
-            self.vega = update_values['vega']
-        if 'rho' in update_fields:
-            self.rho = update_values['rho']
-        if 'open_interest' in update_fields:
-            self.open_interest = update_values['open_interest']
-        if 'implied_volatility' in update_fields:
-            self.implied_volatility = update_values['implied_volatility']
+        if self.update_cache is not self._cursor_cache:
+            self._load_update_columns()
+        if self._update_times is None:
+            return
+        i = self._advance_cursor(quote_datetime)
+        if i < 0:
+            # there is no quote at or before this quote datetime, so the current values are kept
+            return
+        for name, values in self._update_columns:
+            setattr(self, name, values[i].item())
+
+    def _load_update_columns(self):
+        """
+        Extracts the update cache columns to arrays, so each update only moves the cursor to the next row.
+        The bid, ask and price are rounded to 2 decimal places once, here.
+        """
+        cache = self.update_cache
+        self._cursor_cache = cache
+        self._cursor = -1
+        if cache is None:
+            self._update_times, self._update_columns = None, ()
+            return
+        self._update_times = cache.index.values
+        columns = []
+        for name in ['spot_price', 'bid', 'ask', 'price', 'delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest',
+                     'implied_volatility']:
+            if name not in cache.columns:
+                continue
+            values = cache[name].to_numpy()
+            if name in ['bid', 'ask', 'price']:
+                values = round_array(values, 2)
+            columns.append((name, values))
+        self._update_columns = tuple(columns)
+
+    def _advance_cursor(self, quote_datetime: datetime.datetime) -> int:
+        """
+        Moves the cursor to the last quote at or before the quote datetime (as-of), and returns it.
+        Moving to the next quote is a single comparison. A search is only done when quotes are skipped
+        or the quote datetime moves backward.
+        """
+        times = self._update_times
+        quote_time = np.datetime64(quote_datetime)
+        i = self._cursor
+        next_i = i + 1
+        if next_i < len(times) and times[next_i] <= quote_time:
+            if next_i + 1 < len(times) and times[next_i + 1] <= quote_time:
+                i = int(np.searchsorted(times, quote_time, side='right')) - 1
+            else:
+                i = next_i
+        elif i >= 0 and times[i] > quote_time:
+            i = int(np.searchsorted(times, quote_time, side='right')) - 1
+        self._cursor = i
+        return i
 
     def open_trade(self, *, quantity: int, **kwargs: dict) -> TradeOpenInfo:
         """
@@ -209,16 +266,26 @@ class Option(Dispatcher):
 
         # calculate premium debit or credit. If this is a long position, the premium is a positive number.
         # If it is a short position, the premium is a negative number.
-        price = decimalize_2(self.price)
-        quantity = decimalize_0(quantity)
         if settings.apply_slippage_entry:
+            price = decimalize_2(self.price)
+            quantity = decimalize_0(quantity)
             if quantity > 0:
                 price -= self.slippage
             else:
                 price += self.slippage
-        premium = float(price * 100 * quantity)
-        price = float(price)
-        quantity = int(quantity)
+            premium = float(price * 100 * quantity)
+            price = float(price)
+            quantity = int(quantity)
+        elif cents_enabled():
+            price_cents = to_cents(self.price)
+            premium = float(price_cents * quantity)
+            price = cents_to_float(price_cents)
+        else:
+            price = decimalize_2(self.price)
+            quantity = decimalize_0(quantity)
+            premium = float(price * 100 * quantity)
+            price = float(price)
+            quantity = int(quantity)
 
         for key, value in kwargs.items():
             self.user_defined[key] = value
@@ -410,6 +477,9 @@ class Option(Dispatcher):
 
     @property
     def current_value(self) -> float:
+        if cents_enabled():
+            # a price in cents times 100 shares is a whole number of dollars
+            return float(to_cents(self.price) * to_quantity(self.quantity))
         current_price = decimalize_2(self.price)
         quantity = decimalize_0(self.quantity)
         current_value = current_price * 100 * quantity
@@ -418,8 +488,10 @@ class Option(Dispatcher):
     @property
     def trade_value(self) -> float:
         price = self.trade_price
-        trade_price = decimalize_2(price)
         quantity = self.quantity if self.status == OptionStatus.INITIALIZED else self.trade_open_info.quantity
+        if cents_enabled():
+            return float(to_cents(price) * to_quantity(quantity))
+        trade_price = decimalize_2(price)
         quantity = decimalize_0(quantity)
         trade_value = trade_price * 100 * quantity
         return float(trade_value)
@@ -442,6 +514,9 @@ class Option(Dispatcher):
         if OptionStatus.TRADE_IS_OPEN not in self.status and OptionStatus.TRADE_IS_CLOSED not in self.status:
             raise Exception("This option has no transactions.")
 
+        if cents_enabled():
+            price_change_cents = to_cents(self.price) - to_cents(self.trade_open_info.price)
+            return float(price_change_cents * to_quantity(self.quantity))
         trade_price = decimalize_2(self.trade_open_info.price)
         current_price = decimalize_2(self.price)
         open_quantity = decimalize_0(self.quantity)
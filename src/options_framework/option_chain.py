@@ -1,27 +1,268 @@
+import bisect
 import datetime
 
 from dataclasses import dataclass, field
+
+import numpy as np
+from pandas import DataFrame
+
 from options_framework.option import Option
-from options_framework.utils.helpers import distinct
+from options_framework.option_types import OptionType
+
+EXTENDED_ATTRIBUTES = ['delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest', 'implied_volatility']
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _to_date(value: datetime.date) -> datetime.date:
+    # the chain indexes are keyed by date, and a datetime is a date that does not compare equal to one
+    return value.date() if isinstance(value, datetime.datetime) else value
+
 
 @dataclass
 class OptionChain:
+    """
+    The option chain holds the quotes for one quote datetime as contiguous arrays, one array per option attribute.
+    Option objects are only created when they are requested, for example when a spread selects its legs.
+
+    When a chain is loaded, the options are sorted once by expiration, option type and strike. The selection
+    methods search these sorted arrays instead of scanning the chain. The option id and delta indexes are built
+    the first time they are used for a chain.
+    """
     quote_datetime: datetime.datetime = field(init=False)
-    option_chain: list = field(init=False, default_factory=list, repr=False)
     expirations: list = field(init=False, default_factory=list, repr=False)
     expiration_strikes: dict = field(init=False, default_factory=lambda: {}, repr=False)
+    option_ids: np.ndarray = field(init=False, default_factory=lambda: np.empty(0), repr=False)
+    symbols: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=object), repr=False)
+    strikes: np.ndarray = field(init=False, default_factory=lambda: np.empty(0), repr=False)
+    expiration_dates: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype='datetime64[D]'),
+                                         repr=False)
+    option_types: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int8), repr=False)
+    spot_prices: np.ndarray = field(init=False, default_factory=lambda: np.empty(0), repr=False)
+    bids: np.ndarray = field(init=False, default_factory=lambda: np.empty(0), repr=False)
+    asks: np.ndarray = field(init=False, default_factory=lambda: np.empty(0), repr=False)
+    prices: np.ndarray = field(init=False, default_factory=lambda: np.empty(0), repr=False)
+    extended_attributes: dict = field(init=False, default_factory=lambda: {}, repr=False)
+    """Arrays for the extended option attributes (delta, gamma, etc.) that were loaded"""
+    _options: dict = field(init=False, default_factory=lambda: {}, repr=False)
+    _strike_indexes: dict = field(init=False, default_factory=lambda: {}, repr=False)
+    _strike_values: dict = field(init=False, default_factory=lambda: {}, repr=False)
+    _delta_indexes: dict = field(init=False, default_factory=lambda: {}, repr=False)
+    _id_index: dict | None = field(init=False, default=None, repr=False)
 
-    def on_option_chain_loaded(self, quote_datetime: datetime.datetime, option_chain: list[Option]):
+    def __len__(self) -> int:
+        return len(self.option_ids)
+
+    def on_option_chain_loaded(self, quote_datetime: datetime.datetime, option_chain: DataFrame | list[Option]):
         self.quote_datetime = quote_datetime
-        self.option_chain = option_chain
-        self.expirations = list(distinct([option.expiration for option in option_chain]))
-        self.expiration_strikes = {e: list(distinct([strike for strike in [option.strike
-                                                                            for option in option_chain if
-                                                                            option.expiration == e]])) for e in
-                                                                            self.expirations}
-        #print(f'option chain loaded {quote_datetime}')
+        if isinstance(option_chain, DataFrame):
+            self._load_data_frame(option_chain)
+        else:
+            self._load_options(option_chain)
+
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """
+        Sorts the chain by expiration, option type and strike. Each (expiration, option type) group is a slice
+        of the sorted positions, with its strikes in ascending order. Options with the same strike keep their
+        chain order.
+        """
+        order = np.lexsort((self.strikes, self.option_types, self.expiration_dates))
+        expiration_dates, option_types = self.expiration_dates[order], self.option_types[order]
+        boundaries = np.flatnonzero((expiration_dates[1:] != expiration_dates[:-1])
+                                    | (option_types[1:] != option_types[:-1])) + 1
+        starts = np.concatenate([[0], boundaries]) if len(order) else np.empty(0, dtype=np.int64)
+        ends = np.concatenate([boundaries, [len(order)]]) if len(order) else np.empty(0, dtype=np.int64)
+
+        self._strike_indexes, self._strike_values = {}, {}
+        expiration_strikes = {}
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            expiration = expiration_dates[start].item()
+            key = (expiration, OptionType(option_types[start].item()))
+            self._strike_indexes[key] = order[start:end]
+            self._strike_values[key] = self.strikes[order[start:end]]
+            expiration_strikes.setdefault(expiration, []).append(self._strike_values[key])
+        self.expirations = list(expiration_strikes)
+        self.expiration_strikes = {e: np.unique(np.concatenate(strikes)).tolist()
+                                   for e, strikes in expiration_strikes.items()}
+        self._delta_indexes = {}
+        self._id_index = None
+
+    def _load_data_frame(self, df: DataFrame):
+        self.option_ids = df['option_id'].to_numpy()
+        self.symbols = df['symbol'].to_numpy(dtype=object)
+        self.strikes = df['strike'].to_numpy(dtype=float)
+        self.expiration_dates = df['expiration'].to_numpy(dtype='datetime64[D]')
+        self.option_types = df['option_type'].to_numpy(dtype=np.int8)
+        self.spot_prices = df['spot_price'].to_numpy(dtype=float)
+        self.bids = df['bid'].to_numpy(dtype=float)
+        self.asks = df['ask'].to_numpy(dtype=float)
+        self.prices = df['price'].to_numpy(dtype=float)
+        self.extended_attributes = {name: df[name].to_numpy(dtype=float)
+                                    for name in EXTENDED_ATTRIBUTES if name in df.columns}
+        self._options = {}
+
+    def _load_options(self, options: list[Option]):
+        self.option_ids = np.array([o.option_id for o in options])
+        self.symbols = np.array([o.symbol for o in options], dtype=object)
+        self.strikes = np.array([o.strike for o in options], dtype=float)
+        self.expiration_dates = np.array([o.expiration for o in options], dtype='datetime64[D]')
+        self.option_types = np.array([o.option_type.value for o in options], dtype=np.int8)
+        self.spot_prices = np.array([o.spot_price for o in options], dtype=float)
+        self.bids = np.array([o.bid for o in options], dtype=float)
+        self.asks = np.array([o.ask for o in options], dtype=float)
+        self.prices = np.array([o.price for o in options], dtype=float)
+        self.extended_attributes = {name: np.array([getattr(o, name) for o in options], dtype=float)
+                                    for name in EXTENDED_ATTRIBUTES
+                                    if any(getattr(o, name) is not None for o in options)}
+        # The options already exist, so they are used instead of creating new ones
+        self._options = dict(enumerate(options))
+
+    @property
+    def option_chain(self) -> list[Option]:
+        """
+        All the options in the chain. This creates an Option object for every contract, so the spread
+        selection methods should be used instead when only a few contracts are needed.
+        """
+        return [self.get_option(i) for i in range(len(self))]
+
+    def get_option(self, index: int) -> Option:
+        """
+        Returns the option at the index position of the chain arrays. The Option object is created the first
+        time it is requested, and the same object is returned after that.
+        :param index: position of the option in the chain arrays
+        :return: Option
+        """
+        index = int(index)
+        option = self._options.get(index)
+        if option is None:
+            option = self._options[index] = self.create_option(index)
+        return option
+
+    def create_option(self, index: int) -> Option:
+        """
+        Creates a new Option object for the index position of the chain arrays, that is not shared with
+        the objects returned by get_option. Use this when the option quantity or position type is set for
+        several positions that can have the same contract.
+        :param index: position of the option in the chain arrays
+        :return: Option
+        """
+        index = int(index)
+        extended = {name: _to_python(values[index]) for name, values in self.extended_attributes.items()}
+        return Option(option_id=_to_python(self.option_ids[index]),
+                      symbol=self.symbols[index],
+                      expiration=self.expiration_dates[index].item(),
+                      strike=self.strikes[index].item(),
+                      option_type=OptionType(self.option_types[index].item()),
+                      quote_datetime=self.quote_datetime,
+                      spot_price=self.spot_prices[index].item(),
+                      bid=self.bids[index].item(),
+                      ask=self.asks[index].item(),
+                      price=self.prices[index].item(),
+                      **extended)
 
     def get_option_by_id(self, option_id: str) -> Option:
-        options = [option for option in self.option_chain if option.option_id == option_id]
-        option = options[0] if options else None
+        if self._id_index is None:
+            # reversed, so the first position of a repeated id is kept
+            ids = self.option_ids.tolist()
+            self._id_index = dict(zip(reversed(ids), range(len(ids) - 1, -1, -1)))
+        index = self._id_index.get(option_id)
+        option = self.get_option(index) if index is not None else None
         return option
+
+    def get_expiration(self, expiration: datetime.date) -> datetime.date | None:
+        """
+        Returns the expiration, or the next expiration after it in the chain, or None if there are no later expirations
+        """
+        i = bisect.bisect_left(self.expirations, expiration)
+        return self.expirations[i] if i < len(self.expirations) else None
+
+    def get_strike_at_or_above(self, *, expiration: datetime.date, strike: int | float) -> float | None:
+        """
+        Returns the strike, or the next higher strike for the expiration, or None if there are no higher strikes
+        """
+        strikes = self.expiration_strikes.get(expiration, [])
+        i = bisect.bisect_left(strikes, strike)
+        return strikes[i] if i < len(strikes) else None
+
+    def get_strike_at_or_below(self, *, expiration: datetime.date, strike: int | float) -> float | None:
+        """
+        Returns the strike, or the next lower strike for the expiration, or None if there are no lower strikes
+        """
+        strikes = self.expiration_strikes.get(expiration, [])
+        i = bisect.bisect_right(strikes, strike)
+        return strikes[i - 1] if i > 0 else None
+
+    def get_indexes_by_strike(self, *, expiration: datetime.date, option_type: OptionType) -> np.ndarray:
+        """
+        Returns the array positions of the options for the expiration and option type, sorted by strike
+        """
+        return self._strike_indexes.get((_to_date(expiration), option_type), np.empty(0, dtype=np.int64))
+
+    def get_indexes(self, *, expiration: datetime.date = None, option_type: OptionType = None) -> np.ndarray:
+        """
+        Returns the array positions of the options matching the expiration and option type, in chain order.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if expiration is not None:
+            mask &= self.expiration_dates == np.datetime64(expiration, 'D')
+        if option_type is not None:
+            mask &= self.option_types == option_type.value
+        return np.flatnonzero(mask)
+
+    def get_option_by_strike(self, *, expiration: datetime.date, option_type: OptionType,
+                             strike: int | float) -> Option | None:
+        """
+        Returns the option with the exact expiration, option type and strike, or None if it is not in the chain.
+        """
+        key = (_to_date(expiration), option_type)
+        strikes = self._strike_values.get(key)
+        if strikes is None:
+            return None
+        i = np.searchsorted(strikes, strike, side='left')
+        if i == len(strikes) or strikes[i] != strike:
+            return None
+        return self.get_option(self._strike_indexes[key][i])
+
+    def get_option_by_delta(self, *, expiration: datetime.date, option_type: OptionType,
+                            delta: float) -> Option | None:
+        """
+        Returns the option with the nearest delta. For calls, this is the highest delta that is less than
+        or equal to the target. For puts, this is the lowest delta that is greater than or equal to the
+        target, so put deltas must be negative numbers.
+        Returns None if no option matches.
+        """
+        if 'delta' not in self.extended_attributes:
+            raise ValueError("Delta values were not loaded in the option chain. "
+                             + "Add 'delta' to the extended option attributes.")
+        indexes, deltas = self._get_delta_index(_to_date(expiration), option_type)
+        if option_type == OptionType.CALL:
+            i = np.searchsorted(deltas, delta, side='right') - 1
+            if i < 0:
+                return None
+            # the first option in chain order with the same delta
+            i = np.searchsorted(deltas, deltas[i], side='left')
+        else:
+            i = np.searchsorted(deltas, delta, side='left')
+            if i == len(deltas):
+                return None
+        return self.get_option(indexes[i])
+
+    def _get_delta_index(self, expiration: datetime.date, option_type: OptionType) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the positions of the options for the expiration and option type sorted by delta, and the sorted
+        deltas. Options without a delta are left out.
+        """
+        key = (expiration, option_type)
+        delta_index = self._delta_indexes.get(key)
+        if delta_index is None:
+            indexes = np.sort(self.get_indexes_by_strike(expiration=expiration, option_type=option_type))
+            deltas = self.extended_attributes['delta'][indexes]
+            indexes = indexes[~np.isnan(deltas)]
+            order = np.argsort(self.extended_attributes['delta'][indexes], kind='stable')
+            indexes = indexes[order]
+            delta_index = self._delta_indexes[key] = (indexes, self.extended_attributes['delta'][indexes])
+        return delta_index
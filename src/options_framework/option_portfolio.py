@@ -5,20 +5,26 @@ from typing import Optional
 
 from options_framework.option import Option, TradeOpenInfo, TradeCloseInfo
 from options_framework.option_types import OptionStatus, OptionPositionType
+from options_framework.position_book import PositionBook
 from options_framework.spreads.option_combo import OptionCombination
+from options_framework.utils.fixed_point import cents_enabled, cents_to_float, to_cents
 from options_framework.utils.helpers import decimalize_2
 from pydispatch import Dispatcher
 
 @dataclass(repr=False)
 class OptionPortfolio(Dispatcher):
 
-    _events_ = ['new_position_opened', 'position_closed', 'next', 'position_expired']
+    _events_ = ['new_position_opened', 'position_closed', 'pre_next', 'next', 'position_expired']
 
     cash: float | int
     positions: Optional[dict] = field(init=False, default_factory=lambda: {})
     closed_positions: Optional[dict] = field(init=False, default_factory=lambda: {})
     portfolio_risk: float = field(init=False, default=0.0)
     close_values: list = field(init=False, default_factory=lambda: [])
+    option_positions: dict = field(init=False, default_factory=lambda: {})
+    """The ids of the open positions that hold each option, by option id"""
+    book: PositionBook = field(init=False, default_factory=lambda: PositionBook())
+    """The values of the option legs of the open positions, as arrays"""
 
     def __post_init__(self):
         pass
@@ -33,16 +39,35 @@ class OptionPortfolio(Dispatcher):
             if new_margin > self.cash:
                 raise ValueError(f'Insufficient margin available to open this position.')
         self.positions[option_position.position_id] = option_position
+        self._bind_options(option_position)
+        option_position.open_trade(quantity=quantity, **kwargs)
+        for option in option_position.options:
+            # the book updates the option when the next quote method is called
+            self.book.add(option)
+        self.emit("new_position_opened", self, option_position.options)
+
+    def restore(self, cash: float | int, positions: list[OptionCombination], closed_positions: list[OptionCombination],
+                close_values: list) -> None:
+        """
+        Sets the state of the portfolio from a checkpoint. The options of the open positions are bound to the
+        portfolio and added to the book without opening their trades again.
+        """
+        self.cash = cash
+        self.close_values = close_values
+        self.closed_positions = {position.position_id: position for position in closed_positions}
+        for position in positions:
+            self.positions[position.position_id] = position
+            self._bind_options(position)
+            for option in position.options:
+                self.book.add(option)
+
+    def _bind_options(self, option_position: OptionCombination) -> None:
+        for option in option_position.options:
+            self.option_positions.setdefault(option.option_id, {})[option_position.position_id] = None
         [option.bind(open_transaction_completed=self.on_option_open_transaction_completed,
                      close_transaction_completed=self.on_option_close_transaction_completed,
                      option_expired=self.on_option_expired,
                      fees_incurred=self.on_fees_incurred) for option in option_position.options]
-        option_position.open_trade(quantity=quantity, **kwargs)
-
-        options = [option for position in self.positions.values() for option in position.options]
-        for o in options:
-            self.bind(next=o.next_update) # create hook for option update when next quote method is called
-        self.emit("new_position_opened", self, option_position.options)
 
     def close_position(self, option_position: OptionCombination, quantity: int = None, **kwargs: dict):
         quantity = quantity if quantity is not None else option_position.quantity
@@ -62,21 +87,46 @@ class OptionPortfolio(Dispatcher):
 
         self.closed_positions[option_position.position_id] = option_position
         del self.positions[option_position.position_id]
+        for option in option_position.options:
+            self.book.remove(option)
+            position_ids = self.option_positions.get(option.option_id)
+            if position_ids is not None:
+                position_ids.pop(option_position.position_id, None)
+                if not position_ids:
+                    del self.option_positions[option.option_id]
         self.emit("position_closed", option_position)
         [option.unbind(self) for option in option_position.options]
 
     def next(self, quote_datetime: datetime.datetime, *args):
+        # pre_next lets the data loader load the update caches for the positions opened in the last bar
+        self.emit('pre_next', quote_datetime)
+        self.book.mark(quote_datetime)
         self.emit('next', quote_datetime)
         values = [quote_datetime, self.portfolio_value] + list(args)
         self.close_values.append(values)
 
     @property
     def portfolio_value(self):
-        current_value = sum(option.current_value for option in [option for position in self.positions.values()
-                                                                for option in position.options])
-        portfolio_value = decimalize_2(current_value) + decimalize_2(self.cash)
+        if cents_enabled():
+            return cents_to_float(int(self.book.current_value) * 100 + to_cents(self.cash))
+        portfolio_value = self.book.current_value + decimalize_2(self.cash)
         return float(portfolio_value)
 
+    @property
+    def unrealized_profit_loss(self) -> float:
+        """
+        The unrealized profit/loss of the open positions, before fees
+        """
+        return float(self.book.unrealized_profit_loss)
+
+    @property
+    def net_greeks(self) -> dict:
+        """
+        The delta, gamma, theta, vega and rho of the open positions, multiplied by quantity and the 100 share
+        multiplier
+        """
+        return self.book.net_greeks
+
     @property
     def portfolio_margin_allocation(self):
         margin = sum(position.required_margin for position in self.positions.values())
@@ -84,19 +134,20 @@ class OptionPortfolio(Dispatcher):
 
     def on_option_open_transaction_completed(self, trade_open_info: TradeOpenInfo):
         self.cash -= trade_open_info.premium
+        self.book.sync_option_id(trade_open_info.option_id)
         #print(f"portfolio: option position was opened {trade_open_info.option_id}")
 
     def on_option_close_transaction_completed(self, trade_close_info: TradeCloseInfo):
         self.cash += trade_close_info.premium
+        self.book.sync_option_id(trade_close_info.option_id)
         #print(f"portfolio: option position was closed {trade_close_info.option_id}")
 
     def on_option_expired(self, option_id):
         #print(f"portfolio: option expired {option_id}")
-        ids = [position.position_id for position in self.positions.values()
-               for option in position.options if option.option_id == option_id]
-        if ids:
-            position = self.positions[ids[0]]
-            if all([OptionStatus.EXPIRED in option.status for option in position.options]):
+        # more than one open position can hold the same option
+        for position_id in list(self.option_positions.get(option_id, ())):
+            position = self.positions.get(position_id)
+            if position is not None and all(OptionStatus.EXPIRED in option.status for option in position.options):
                 self.close_position(position, position.quantity)
                 self.emit('position_expired', position)
 
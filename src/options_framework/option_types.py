@@ -63,6 +63,15 @@ class OptionTradeType(Enum):
     DEBIT = 2
 
 
+class NumericMode(StrEnum):
+    """
+    How prices and values are rounded to cents. Decimal creates a Decimal for every value. Cents uses
+    whole numbers of cents, and gives the same results.
+    """
+    DECIMAL = 'decimal'
+    CENTS = 'cents'
+
+
 @dataclass
 class FilterRange:
     low: float | int = None
@@ -0,0 +1,181 @@
+import datetime
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from options_framework.data.data_loader import DataLoader
+from options_framework.data.shared_chain_cache import SharedChainCache
+from options_framework.option_types import SelectFilter
+from options_framework.results import TRADE_RECORD_COLUMNS, get_trade_records
+from options_framework.test_manager import OptionTestManager
+
+EQUITY_COLUMNS = ['run_id', 'quote_datetime', 'portfolio_value']
+TRADE_COLUMNS = ['run_id'] + TRADE_RECORD_COLUMNS
+
+
+@dataclass(repr=False)
+class SweepResults:
+    """
+    The results of every run of a parameter sweep, as three columnar tables joined by run_id.
+    The rows are in run order, no matter which worker ran each parameter set or in what order they finished.
+    """
+    runs: DataFrame
+    """One row per run, with the parameters, seed, ending portfolio value, number of trades and max drawdown"""
+    equity_curves: DataFrame
+    """The portfolio value at every quote datetime the portfolio was moved to, for every run"""
+    trades: DataFrame
+    """The positions closed in every run, numbered in the order they were closed"""
+
+    def get_equity_curve(self, run_id: int) -> pd.Series:
+        equity_curve = self.equity_curves[self.equity_curves['run_id'] == run_id]
+        return equity_curve.set_index('quote_datetime')['portfolio_value']
+
+    def get_trades(self, run_id: int) -> DataFrame:
+        return self.trades[self.trades['run_id'] == run_id].reset_index(drop=True)
+
+
+@dataclass(repr=False)
+class ParameterSweep:
+    """
+    Runs the same test once for every combination of the values in the parameter grid, spread across a pool of
+    worker processes.
+
+    Each worker creates one data loader for the test period and keeps the option chain windows and update caches
+    it loads in memory. Every run in that worker gets a new OptionTestManager that shares the loader, so the
+    market data is only loaded once per worker, no matter how many parameter sets the worker runs.
+
+    run_test is called as run_test(test_manager, **parameters) and drives the test, for example by adding a
+    Backtrader strategy with the parameters to Cerebro and running it. It must be a module level function
+    so it can be sent to the worker processes. The equity curve and trades are read from the test manager
+    portfolio after run_test returns.
+
+    The results do not depend on the number of processes. The random and numpy random generators are seeded
+    before each run with a seed derived from the sweep seed and the run id, and the position ids, which are
+    counted per process, are replaced with the trade number in the run.
+    """
+    run_test: Callable[..., None]
+    parameter_grid: dict[str, list]
+    start_datetime: datetime.datetime
+    end_datetime: datetime.datetime
+    select_filter: SelectFilter
+    starting_cash: float
+    extended_option_attributes: list = field(default_factory=lambda: [])
+    processes: int | None = None
+    """Number of worker processes. None uses the number of CPUs, and 1 runs every parameter set in this process."""
+    seed: int = 0
+    data_loader_factory: Callable[..., DataLoader] | None = None
+    """Creates the data loader for a worker, called with the start, end, select_filter and
+    extended_option_attributes keyword arguments. If not set, the test manager creates one from the settings."""
+    shared_chain_cache: SharedChainCache | None = None
+    """When set, the workers share the option chain windows through shared memory instead of each keeping a copy"""
+
+    def get_parameter_sets(self) -> list[dict]:
+        """
+        The combinations of the parameter grid values, in run id order. The last parameter in the grid changes fastest.
+        """
+        names = list(self.parameter_grid.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*self.parameter_grid.values())]
+
+    def get_run_seed(self, run_id: int) -> int:
+        return int(np.random.SeedSequence([self.seed, run_id]).generate_state(1)[0])
+
+    def run(self) -> SweepResults:
+        parameter_sets = self.get_parameter_sets()
+        runs = list(enumerate(parameter_sets))
+        processes = self.processes if self.processes else os.cpu_count()
+        processes = min(processes, len(runs)) if runs else 1
+        if processes == 1:
+            _init_worker(self)
+            try:
+                results = [_run_parameter_set(run) for run in runs]
+            finally:
+                _init_worker(None)
+        else:
+            # Each worker keeps its data loader between chunks, so the chunks only need to be large enough
+            # to keep the round trips to the workers down
+            chunksize = max(1, len(runs) // (processes * 4))
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(self,)) as executor:
+                results = list(executor.map(_run_parameter_set, runs, chunksize=chunksize))
+        return self._collect_results(parameter_sets, results)
+
+    def _collect_results(self, parameter_sets: list[dict], results: list[tuple]) -> SweepResults:
+        summaries, equity_curves, trades = zip(*results) if results else ([], [], [])
+        runs = DataFrame([{'run_id': run_id} | parameters | summary
+                          for run_id, (parameters, summary) in enumerate(zip(parameter_sets, summaries))])
+        equity_curves = [df for df in equity_curves if not df.empty]
+        trades = [df for df in trades if not df.empty]
+        equity_curves = pd.concat(equity_curves, ignore_index=True) if equity_curves \
+            else DataFrame(columns=EQUITY_COLUMNS)
+        trades = pd.concat(trades, ignore_index=True) if trades else DataFrame(columns=TRADE_COLUMNS)
+        return SweepResults(runs=runs, equity_curves=equity_curves, trades=trades)
+
+
+# The sweep and the shared data loader of the worker process
+_sweep: ParameterSweep | None = None
+_data_loader: DataLoader | None = None
+
+
+def _init_worker(sweep: ParameterSweep | None) -> None:
+    global _sweep, _data_loader
+    if _data_loader is not None:
+        _data_loader.close()
+    _sweep, _data_loader = sweep, None
+
+
+def _create_test_manager() -> OptionTestManager:
+    global _data_loader
+    sweep = _sweep
+    if _data_loader is None and sweep.data_loader_factory is not None:
+        _data_loader = sweep.data_loader_factory(start=sweep.start_datetime, end=sweep.end_datetime,
+                                                 select_filter=sweep.select_filter,
+                                                 extended_option_attributes=sweep.extended_option_attributes)
+        _share_data(_data_loader)
+    test_manager = OptionTestManager(start_datetime=sweep.start_datetime, end_datetime=sweep.end_datetime,
+                                     select_filter=sweep.select_filter, starting_cash=sweep.starting_cash,
+                                     extended_option_attributes=sweep.extended_option_attributes,
+                                     data_loader=_data_loader)
+    if _data_loader is None:
+        _data_loader = test_manager.data_loader
+        _share_data(_data_loader)
+    return test_manager
+
+
+def _share_data(data_loader: DataLoader) -> None:
+    data_loader.retain_data()
+    if _sweep.shared_chain_cache is not None:
+        data_loader.share_cache(_sweep.shared_chain_cache)
+
+
+def _run_parameter_set(run: tuple[int, dict]) -> tuple[dict, DataFrame, DataFrame]:
+    run_id, parameters = run
+    seed = _sweep.get_run_seed(run_id)
+    random.seed(seed)
+    np.random.seed(seed)
+
+    test_manager = _create_test_manager()
+    try:
+        _sweep.run_test(test_manager, **parameters)
+    finally:
+        test_manager.detach()
+    portfolio = test_manager.portfolio
+
+    equity_curve = DataFrame([values[:2] for values in portfolio.close_values],
+                             columns=['quote_datetime', 'portfolio_value'])
+    equity_curve.insert(0, 'run_id', run_id)
+    trades = DataFrame(get_trade_records(list(portfolio.closed_positions.values())), columns=TRADE_RECORD_COLUMNS)
+    trades.insert(0, 'run_id', run_id)
+
+    ending_value = portfolio.portfolio_value
+    values = equity_curve['portfolio_value'].to_numpy(dtype=float)
+    max_drawdown = float(np.max(np.maximum.accumulate(values) - values)) if len(values) else 0.0
+    summary = {'seed': seed, 'ending_value': ending_value, 'profit_loss': ending_value - _sweep.starting_cash,
+               'trades': len(trades), 'open_positions': len(portfolio.positions), 'max_drawdown': max_drawdown}
+    return summary, equity_curve, trades
@@ -0,0 +1,390 @@
+import datetime
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import numpy as np
+
+from options_framework.expiration_calendar import ExpirationCalendar, get_settlement_datetime
+from options_framework.option import Option
+from options_framework.option_types import OptionStatus, OptionType
+from options_framework.utils.helpers import round_array
+
+QUOTE_COLUMNS = ['spot_price', 'bid', 'ask', 'price']
+EXTENDED_COLUMNS = ['delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest', 'implied_volatility']
+GREEKS = ['delta', 'gamma', 'theta', 'vega', 'rho']
+
+
+def _to_float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+@dataclass(repr=False)
+class PositionBook:
+    """
+    The position book holds the open option legs of a portfolio as parallel arrays, one row (slot) per leg:
+    quantity, open price, the current quote and the greeks. The update caches of all the legs are joined into
+    one set of arrays, so moving every leg to the next quote is a single vectorized step, and the portfolio
+    value, unrealized profit/loss and net greeks are NumPy reductions over the rows.
+
+    The Option objects are views over the book. After each update, the quote values of each leg are copied to
+    its Option, and changes made by trades on an Option are copied back with the sync method.
+
+    The book is also the registry of the legs that receive quote updates. A leg is subscribed when it is added,
+    and unsubscribed when it is removed or expires. Both are constant time, so the cost of each bar only depends
+    on the number of subscribed legs.
+
+    Expirations are handled by an expiration calendar. When the quote datetime reaches the settlement of one or
+    more legs, the legs are settled together at their intrinsic value. No expiry work is done on other bars.
+    """
+    capacity: int = 16
+    quote_datetime: datetime.datetime | None = field(init=False, default=None)
+    """The quote datetime of the last update of all the legs"""
+    options: list = field(init=False, default_factory=list)
+    quantities: np.ndarray = field(init=False, repr=False)
+    open_prices: np.ndarray = field(init=False, repr=False)
+    spot_prices: np.ndarray = field(init=False, repr=False)
+    bids: np.ndarray = field(init=False, repr=False)
+    asks: np.ndarray = field(init=False, repr=False)
+    prices: np.ndarray = field(init=False, repr=False)
+    greeks: dict = field(init=False, repr=False)
+    strikes: np.ndarray = field(init=False, repr=False)
+    calls: np.ndarray = field(init=False, repr=False)
+    active: np.ndarray = field(init=False, repr=False)
+    """The slots that hold an open leg"""
+    subscribed: np.ndarray = field(init=False, repr=False)
+    """The slots of the legs that are updated each bar"""
+    _subscribed: dict = field(init=False, default_factory=dict)
+    calendar: ExpirationCalendar = field(init=False, default_factory=ExpirationCalendar)
+    """The settlement datetimes of the subscribed legs"""
+    _free_slots: list = field(init=False, default_factory=list)
+    _slots_by_id: dict = field(init=False, default_factory=dict)
+    _active_slots: np.ndarray | None = field(init=False, default=None)
+    # joined update caches
+    _caches: list = field(init=False, default_factory=list)
+    _caches_changed: bool = field(init=False, default=True)
+    _cache_slots: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int64))
+    _cache_starts: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int64))
+    _cache_ends: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int64))
+    _cursors: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int64))
+    _times: np.ndarray = field(init=False, default_factory=lambda: np.empty(0, dtype=np.int64))
+    _columns: dict = field(init=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.quantities = np.zeros(self.capacity, dtype=np.int64)
+        self.open_prices = np.zeros(self.capacity)
+        self.spot_prices = np.zeros(self.capacity)
+        self.bids = np.zeros(self.capacity)
+        self.asks = np.zeros(self.capacity)
+        self.prices = np.zeros(self.capacity)
+        self.greeks = {name: np.full(self.capacity, np.nan) for name in GREEKS}
+        self.strikes = np.zeros(self.capacity)
+        self.calls = np.zeros(self.capacity, dtype=bool)
+        self.active = np.zeros(self.capacity, dtype=bool)
+        self.subscribed = np.zeros(self.capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.options) - len(self._free_slots)
+
+    @property
+    def subscribed_count(self) -> int:
+        """The number of legs that are updated each bar"""
+        return len(self._subscribed)
+
+    def add(self, option: Option) -> int:
+        """
+        Adds an open option leg to the book.
+        :return: the slot of the leg in the book arrays
+        """
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self.options)
+            if slot == self.capacity:
+                self._grow()
+            self.options.append(None)
+            self._caches.append(None)
+        self.options[slot] = option
+        self.active[slot] = True
+        self._active_slots = None
+        self._caches_changed = True
+        self._slots_by_id.setdefault(option.option_id, set()).add(slot)
+        option._book, option._book_slot = self, slot
+        self.strikes[slot] = option.strike
+        self.calls[slot] = option.option_type == OptionType.CALL
+        self._copy_quote(slot, option)
+        self.sync(option)
+        if OptionStatus.EXPIRED in option.status:
+            self.settle([slot], option.quote_datetime)
+        else:
+            self.subscribe(option)
+            self.calendar.add(slot, get_settlement_datetime(option.expiration))
+        return slot
+
+    def remove(self, option: Option) -> None:
+        if option._book is not self:
+            return
+        slot = option._book_slot
+        self.unsubscribe(option)
+        self.calendar.remove(slot)
+        self.options[slot] = None
+        self._caches[slot] = None
+        self.active[slot] = False
+        self.quantities[slot] = 0
+        self._free_slots.append(slot)
+        self._active_slots = None
+        slots = self._slots_by_id[option.option_id]
+        slots.discard(slot)
+        if not slots:
+            del self._slots_by_id[option.option_id]
+        option._book, option._book_slot = None, None
+
+    def subscribe(self, option: Option) -> None:
+        """
+        Starts updating a leg in the book each bar
+        """
+        slot = option._book_slot
+        self._subscribed[slot] = option
+        self.subscribed[slot] = True
+
+    def unsubscribe(self, option: Option) -> None:
+        """
+        Stops updating a leg. The leg keeps its last values in the book until it is removed.
+        The rows of the leg stay in the joined update caches until the caches are joined again.
+        """
+        slot = option._book_slot
+        if self._subscribed.pop(slot, None) is not None:
+            self.subscribed[slot] = False
+
+    def sync_option_id(self, option_id) -> None:
+        """
+        Copies the values of the options with the option id to their rows. The portfolio calls this
+        when a trade transaction is completed, because the transaction events only have the option id.
+        """
+        for slot in self._slots_by_id.get(option_id, ()):
+            self.sync(self.options[slot])
+
+    def sync(self, option: Option) -> None:
+        """
+        Copies the values of an Option to its row, after the option is changed outside the book,
+        for example when a trade is opened or closed. An expired leg keeps its settlement price.
+        """
+        slot = option._book_slot
+        self.quantities[slot] = option.quantity
+        open_price = option.trade_open_info.price if option.trade_open_info is not None else option.price
+        self.open_prices[slot] = round_array([open_price], 2)[0]
+        if OptionStatus.EXPIRED not in option.status:
+            self._copy_quote(slot, option)
+
+    def _copy_quote(self, slot: int, option: Option) -> None:
+        self.spot_prices[slot] = option.spot_price
+        self.bids[slot] = option.bid
+        self.asks[slot] = option.ask
+        self.prices[slot] = round_array([option.price], 2)[0]
+        for name, values in self.greeks.items():
+            values[slot] = _to_float(getattr(option, name))
+
+    def mark(self, quote_datetime: datetime.datetime) -> None:
+        """
+        Moves every leg to the last quote at or before the quote datetime in one step, and copies the
+        new quote values to the Option objects.
+        """
+        self.quote_datetime = quote_datetime
+        if not len(self):
+            return
+        next_settlement = self.calendar.next_settlement
+        if next_settlement is not None and next_settlement <= quote_datetime:
+            self.settle(self.calendar.pop_due(quote_datetime), quote_datetime)
+        self._refresh_caches()
+        slots = self._cache_slots[self.subscribed[self._cache_slots]]
+        rows = np.empty(0, dtype=np.int64)
+        if len(slots):
+            rows = self._advance_cursors(slots, np.datetime64(quote_datetime, 'ns').astype(np.int64))
+            found = rows >= self._cache_starts[slots]
+            slots, rows = slots[found], rows[found]
+            self.spot_prices[slots] = self._columns['spot_price'][rows]
+            self.bids[slots] = self._columns['bid'][rows]
+            self.asks[slots] = self._columns['ask'][rows]
+            self.prices[slots] = self._columns['price'][rows]
+            for name, values in self.greeks.items():
+                values[slots] = self._columns[name][rows]
+
+        # copy the new values to the options
+        updated = dict(zip(slots.tolist(), rows.tolist()))
+        for slot, option in self._subscribed.items():
+            option.quote_datetime = quote_datetime
+            row = updated.get(slot)
+            if row is None:
+                continue
+            option._cursor = row - int(self._cache_starts[slot])
+            for name, values in option._update_columns:
+                setattr(option, name, values[option._cursor].item())
+
+    def update_leg(self, option: Option, quote_datetime: datetime.datetime) -> None:
+        """
+        Moves one leg to the quote datetime. This is used when Option.next_update is called for a leg in the book.
+        """
+        if quote_datetime == self.quote_datetime:
+            # the leg was already updated with the rest of the book
+            return
+        slot = option._book_slot
+        settlement = self.calendar.get_settlement(slot)
+        if settlement is not None and settlement <= quote_datetime:
+            self.calendar.remove(slot)
+            self.settle([slot], quote_datetime)
+            return
+        option.quote_datetime = quote_datetime
+        if not self.subscribed[slot]:
+            return
+        if option.update_cache is not option._cursor_cache:
+            option._load_update_columns()
+        if option._update_times is None:
+            return
+        i = option._advance_cursor(quote_datetime)
+        if i >= 0:
+            for name, values in option._update_columns:
+                setattr(option, name, values[i].item())
+        if not self._caches_changed and self._cache_ends[slot] > self._cache_starts[slot]:
+            self._cursors[slot] = self._cache_starts[slot] + i
+        self.sync(option)
+
+    def settle(self, slots: list[int], quote_datetime: datetime.datetime) -> None:
+        """
+        Settles expiring legs at their intrinsic value, computed for all the legs at once from the last
+        spot price before the expiration. The Option objects are then flagged as expired, which lets the
+        portfolio close the positions where every leg has expired.
+        """
+        if not len(slots):
+            return
+        slots = np.asarray(slots, dtype=np.int64)
+        self.prices[slots] = self._get_intrinsic_values(slots)
+        # an option_expired handler can close positions and remove other legs from the book
+        options = [(slot, self.options[slot]) for slot in slots.tolist()]
+        for slot, option in options:
+            if option is None or option._book is not self or option._book_slot != slot:
+                continue
+            self.unsubscribe(option)
+            option.quote_datetime = quote_datetime
+            if OptionStatus.EXPIRED not in option.status:
+                option.expire()
+
+    def _get_intrinsic_values(self, slots: np.ndarray) -> np.ndarray:
+        spot_prices = round_array(self.spot_prices[slots], 2)
+        strikes = round_array(self.strikes[slots], 2)
+        values = np.where(self.calls[slots], spot_prices - strikes, strikes - spot_prices)
+        return round_array(np.maximum(values, 0.0), 2)
+
+    @property
+    def current_value(self) -> Decimal:
+        """
+        The value of all the legs at the current price. This is the same value as adding the current_value of
+        each option with Decimal math.
+        """
+        slots = self._get_active_slots()
+        price_cents = np.rint(self.prices[slots] * 100).astype(np.int64)
+        # price * 100 * quantity is a whole number of dollars when the price is rounded to cents
+        return Decimal(int(np.dot(price_cents, self.quantities[slots])))
+
+    @property
+    def unrealized_profit_loss(self) -> Decimal:
+        """
+        The difference between the current value and the value at the open price of all the legs, before fees
+        """
+        slots = self._get_active_slots()
+        price_cents = np.rint(self.prices[slots] * 100).astype(np.int64)
+        open_price_cents = np.rint(self.open_prices[slots] * 100).astype(np.int64)
+        return Decimal(int(np.dot(price_cents - open_price_cents, self.quantities[slots])))
+
+    @property
+    def net_greeks(self) -> dict:
+        """
+        The greeks of all the legs multiplied by their quantity and the 100 share multiplier.
+        A greek is nan if it was not loaded for one of the legs.
+        """
+        slots = self._get_active_slots()
+        quantities = self.quantities[slots] * 100
+        return {name: float(np.dot(values[slots], quantities)) for name, values in self.greeks.items()}
+
+    def _get_active_slots(self) -> np.ndarray:
+        if self._active_slots is None:
+            self._active_slots = np.flatnonzero(self.active)
+        return self._active_slots
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in ['quantities', 'open_prices', 'spot_prices', 'bids', 'asks', 'prices', 'strikes', 'calls',
+                     'active', 'subscribed']:
+            values = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype=values.dtype)
+            grown[:len(values)] = values
+            setattr(self, name, grown)
+        for name, values in self.greeks.items():
+            grown = np.full(self.capacity, np.nan)
+            grown[:len(values)] = values
+            self.greeks[name] = grown
+
+    def _refresh_caches(self) -> None:
+        for slot, option in self._subscribed.items():
+            if option.update_cache is not self._caches[slot]:
+                self._caches[slot] = option.update_cache
+                self._caches_changed = True
+        if self._caches_changed:
+            self._join_caches()
+
+    def _join_caches(self) -> None:
+        """
+        Joins the update cache columns of all the legs into one array per column. The rows of each leg are
+        between its start and end positions, and the cursor of each leg is an index into the joined arrays.
+        """
+        slots, times, starts, ends, cursors = [], [], [], [], []
+        columns = {name: [] for name in QUOTE_COLUMNS + EXTENDED_COLUMNS}
+        position = 0
+        for slot, option in self._subscribed.items():
+            if option.update_cache is None:
+                continue
+            if option.update_cache is not option._cursor_cache:
+                option._load_update_columns()
+            leg_times = option._update_times
+            if leg_times is None or not len(leg_times):
+                continue
+            leg_columns = dict(option._update_columns)
+            slots.append(slot)
+            times.append(leg_times.astype('datetime64[ns]').astype(np.int64))
+            for name, values in columns.items():
+                # a column that is not in the cache keeps the current value of the option
+                values.append(leg_columns[name].astype(float) if name in leg_columns
+                              else np.full(len(leg_times), _to_float(getattr(option, name))))
+            starts.append(position)
+            cursors.append(position + option._cursor)
+            position += len(leg_times)
+            ends.append(position)
+
+        self._cache_slots = np.array(slots, dtype=np.int64)
+        self._cache_starts = np.zeros(len(self.options), dtype=np.int64)
+        self._cache_ends = np.zeros(len(self.options), dtype=np.int64)
+        self._cursors = np.zeros(len(self.options), dtype=np.int64)
+        self._cache_starts[slots] = starts
+        self._cache_ends[slots] = ends
+        self._cursors[slots] = cursors
+        self._times = np.concatenate(times) if times else np.empty(0, dtype=np.int64)
+        self._columns = {name: np.concatenate(values) for name, values in columns.items() if values}
+        self._caches_changed = False
+
+    def _advance_cursors(self, slots: np.ndarray, quote_time: int) -> np.ndarray:
+        """
+        Moves the cursor of each leg in slots to the last quote at or before the quote time. Most bars move every
+        cursor forward by one row. Legs that skip rows, or move backward, are searched.
+        """
+        times = self._times
+        starts, ends = self._cache_starts[slots], self._cache_ends[slots]
+        cursors = self._cursors[slots]
+        next_rows = cursors + 1
+        last_row = len(times) - 1
+        step = (next_rows < ends) & (times[np.minimum(next_rows, last_row)] <= quote_time)
+        search = step & (next_rows + 1 < ends) & (times[np.minimum(next_rows + 1, last_row)] <= quote_time)
+        search |= ~step & (cursors >= starts) & (times[np.clip(cursors, 0, last_row)] > quote_time)
+        cursors = np.where(step, next_rows, cursors)
+        for k in np.flatnonzero(search):
+            start, end = starts[k], ends[k]
+            cursors[k] = start + np.searchsorted(times[start:end], quote_time, side='right') - 1
+        self._cursors[slots] = cursors
+        return cursors
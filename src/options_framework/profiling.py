@@ -0,0 +1,272 @@
+import csv
+import functools
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from pandas import DataFrame
+
+from options_framework.config import settings
+from options_framework.data.data_loader import DataLoader
+from options_framework.option import Option
+from options_framework.option_chain import OptionChain
+from options_framework.option_portfolio import OptionPortfolio
+from options_framework.position_book import PositionBook
+from options_framework.spreads.option_combo import OptionCombination
+# the spread modules are imported so their classes are found as subclasses of OptionCombination
+from options_framework.spreads import butterfly, iron_condor, single, vertical
+
+SUMMARY_COLUMNS = ['phase', 'calls', 'items', 'total_seconds', 'mean_microseconds', 'max_microseconds']
+
+
+@dataclass(slots=True)
+class PhaseTiming:
+    calls: int = 0
+    items: int = 0
+    """The number of options, rows or legs the calls worked on, for the phases that count them"""
+    total_ns: int = 0
+    max_ns: int = 0
+
+
+def _count_chain_rows(args, kwargs) -> int:
+    option_chain = kwargs.get('option_chain', args[1] if len(args) > 1 else None)
+    return len(option_chain) if option_chain is not None else 0
+
+
+def _count_book_legs(args, kwargs) -> int:
+    return len(args[0].book)
+
+
+def _get_instrumented_methods() -> list[tuple[type, str, str, Callable | None]]:
+    """
+    The class, method name, phase name and item counter of each instrumented method.
+    Methods of the data loader and spread classes are instrumented on every subclass that defines them.
+    """
+    methods = [(OptionChain, 'on_option_chain_loaded', 'OptionChain.on_option_chain_loaded', _count_chain_rows),
+               (Option, 'next_update', 'Option.next_update', None),
+               (OptionPortfolio, 'next', 'OptionPortfolio.next', _count_book_legs),
+               (PositionBook, 'mark', 'PositionBook.mark', None),
+               (PositionBook, 'settle', 'PositionBook.settle', None)]
+    for cls in _get_subclasses(DataLoader):
+        for name in ['load_cache', 'get_option_chain', 'load_update_caches', 'on_options_opened']:
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, '__isabstractmethod__', False):
+                methods.append((cls, name, f'DataLoader.{name}', None))
+    for cls in _get_subclasses(OptionCombination):
+        for name, method in cls.__dict__.items():
+            if isinstance(method, classmethod) and name.startswith('get_'):
+                methods.append((cls, name, f'{cls.__name__}.{name}', None))
+    return methods
+
+
+def _get_subclasses(cls: type) -> list[type]:
+    subclasses = [cls]
+    for subclass in cls.__subclasses__():
+        subclasses += _get_subclasses(subclass)
+    return list(dict.fromkeys(subclasses))
+
+
+@dataclass(repr=False)
+class Tracer:
+    """
+    Records the start and duration of every instrumented call in a ring buffer, and exports them as a
+    Chrome trace-event JSON file that can be opened in chrome://tracing or the Perfetto UI.
+
+    Each call is one complete event, which holds both its begin and end time, so a full buffer never leaves a
+    begin event without its end. The buffer is a set of preallocated arrays with room for capacity events.
+    When it is full, the oldest events are overwritten, so the memory used by a trace does not grow with the
+    length of the run and the trace holds the latest events.
+    """
+    capacity: int = 1_000_000
+    phases: list = field(init=False, default_factory=list)
+    """The phase names. The buffer holds the position of the phase name of each event."""
+    recorded: int = field(init=False, default=0)
+    """The number of events recorded, including the events that were overwritten"""
+    _phase_ids: dict = field(init=False, default_factory=dict)
+    _phase_buffer: np.ndarray = field(init=False, repr=False)
+    _start_buffer: np.ndarray = field(init=False, repr=False)
+    _duration_buffer: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._phase_buffer = np.zeros(self.capacity, dtype=np.int32)
+        self._start_buffer = np.zeros(self.capacity, dtype=np.int64)
+        self._duration_buffer = np.zeros(self.capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return min(self.recorded, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """The number of events that were overwritten"""
+        return max(0, self.recorded - self.capacity)
+
+    def add(self, phase: str, start_ns: int, elapsed_ns: int) -> None:
+        phase_id = self._phase_ids.get(phase)
+        if phase_id is None:
+            phase_id = self._phase_ids[phase] = len(self.phases)
+            self.phases.append(phase)
+        i = self.recorded % self.capacity
+        self._phase_buffer[i] = phase_id
+        self._start_buffer[i] = start_ns
+        self._duration_buffer[i] = elapsed_ns
+        self.recorded += 1
+
+    def clear(self) -> None:
+        self.recorded = 0
+
+    def get_events(self) -> list[dict]:
+        """
+        The events in the buffer in the order they were recorded, in the Chrome trace-event format.
+        Times are in microseconds.
+        """
+        order = np.arange(self.recorded - len(self), self.recorded) % self.capacity
+        pid = os.getpid()
+        return [{'name': self.phases[phase_id], 'cat': self.phases[phase_id].split('.')[0], 'ph': 'X',
+                 'ts': start / 1e3, 'dur': duration / 1e3, 'pid': pid, 'tid': 0}
+                for phase_id, start, duration in zip(self._phase_buffer[order].tolist(),
+                                                     self._start_buffer[order].tolist(),
+                                                     self._duration_buffer[order].tolist())]
+
+    def export(self, path: str | Path) -> Path:
+        path = Path(path)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.get_events(), 'displayTimeUnit': 'ms',
+                       'otherData': {'recorded_events': self.recorded, 'dropped_events': self.dropped}}, f)
+        return path
+
+
+@dataclass(repr=False)
+class Profiler:
+    """
+    Timers and call counters around the hot paths of a run: loading cache windows and option chains, building
+    the option chain, updating options and the portfolio, and the spread constructors.
+
+    When the profiler is enabled, the instrumented methods are replaced on their classes with timed wrappers,
+    and the original methods are put back when it is disabled. Nothing is wrapped while the profiler is
+    disabled, so a run that does not profile has no extra cost. The times are inclusive, so a phase that calls
+    another instrumented phase includes its time.
+
+    When a tracer is set, every call is also added to the tracer, so the run can be seen as a timeline.
+
+    Each test manager creates its own profiler and enables it when the PROFILE or TRACE setting is true. Enable it
+    before the data loader and option chain are bound to each other, because the events keep the methods they
+    were bound to. The methods are replaced for the whole process, so only one profiler can be enabled at a time,
+    and enabling a profiler disables the one that was enabled before. The BacktestEngine disables the profiler
+    of the test manager at the end of a run, so later tests are not timed.
+    """
+    timings: dict = field(default_factory=dict)
+    enabled: bool = False
+    tracer: Tracer | None = None
+    _originals: list = field(default_factory=list)
+
+    def enable(self) -> None:
+        global _enabled_profiler
+        if self.enabled:
+            return
+        if _enabled_profiler is not None:
+            _enabled_profiler.disable()
+        for cls, name, phase, counter in _get_instrumented_methods():
+            original = cls.__dict__[name]
+            self._originals.append((cls, name, original))
+            if isinstance(original, classmethod):
+                setattr(cls, name, classmethod(self._wrap(original.__func__, phase, counter)))
+            else:
+                setattr(cls, name, self._wrap(original, phase, counter))
+        self.enabled = True
+        _enabled_profiler = self
+
+    def disable(self) -> None:
+        global _enabled_profiler
+        for cls, name, original in reversed(self._originals):
+            setattr(cls, name, original)
+        self._originals = []
+        self.enabled = False
+        if _enabled_profiler is self:
+            _enabled_profiler = None
+
+    def reset(self) -> None:
+        self.timings = {}
+
+    def wrap(self, func: Callable, phase: str) -> Callable:
+        """
+        Returns a timed wrapper for a function while the profiler is enabled, or the function itself.
+        The engine uses this for the strategy callbacks.
+        """
+        return self._wrap(func, phase, None) if self.enabled else func
+
+    def _wrap(self, func: Callable, phase: str, counter: Callable | None) -> Callable:
+        record = self.record
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(phase, start, time.perf_counter_ns() - start,
+                       counter(args, kwargs) if counter is not None else 0)
+        return timed
+
+    def record(self, phase: str, start_ns: int, elapsed_ns: int, items: int = 0) -> None:
+        """
+        Adds one call to the timing of a phase. This can also be called directly to time other parts of a run.
+        """
+        timing = self.timings.get(phase)
+        if timing is None:
+            timing = self.timings[phase] = PhaseTiming()
+        timing.calls += 1
+        timing.items += items
+        timing.total_ns += elapsed_ns
+        if elapsed_ns > timing.max_ns:
+            timing.max_ns = elapsed_ns
+        if self.tracer is not None:
+            self.tracer.add(phase, start_ns, elapsed_ns)
+
+    def get_summary(self) -> DataFrame:
+        """
+        One row per phase that was called, ordered by total time
+        """
+        rows = [(phase, t.calls, t.items, t.total_ns / 1e9, t.total_ns / t.calls / 1e3, t.max_ns / 1e3)
+                for phase, t in self.timings.items() if t.calls]
+        summary = DataFrame(rows, columns=SUMMARY_COLUMNS)
+        return summary.sort_values('total_seconds', ascending=False, kind='stable').reset_index(drop=True)
+
+    def export(self, path: str | Path) -> Path:
+        """
+        Writes the summary to a JSON file, or to a CSV file if the path ends with .csv
+        """
+        path = Path(path)
+        summary = self.get_summary()
+        if path.suffix.lower() == '.csv':
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(SUMMARY_COLUMNS)
+                writer.writerows(summary.itertuples(index=False))
+        else:
+            with open(path, 'w') as f:
+                json.dump({'phases': summary.to_dict(orient='records')}, f, indent=2)
+        return path
+
+    def write_output(self) -> list[Path]:
+        """
+        Exports the summary to the PROFILE_OUTPUT setting and the trace to the TRACE_OUTPUT setting, if the
+        profiler is enabled and the settings are set. The BacktestEngine calls this at the end of a run.
+        """
+        if not self.enabled:
+            return []
+        paths = []
+        output = settings.get('PROFILE_OUTPUT', None)
+        if output:
+            paths.append(self.export(output))
+        trace_output = settings.get('TRACE_OUTPUT', None)
+        if trace_output and self.tracer is not None:
+            paths.append(self.tracer.export(trace_output))
+        return paths
+
+
+_enabled_profiler: Profiler | None = None
+"""The profiler whose wrappers are on the instrumented methods"""
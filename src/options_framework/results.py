@@ -0,0 +1,19 @@
+from options_framework.spreads.option_combo import OptionCombination
+
+TRADE_RECORD_COLUMNS = ['trade_number', 'option_combination_type', 'option_position_type', 'quantity',
+                        'open_datetime', 'close_datetime', 'trade_value', 'profit_loss', 'fees']
+
+
+def get_trade_records(positions: list[OptionCombination]) -> list[tuple]:
+    """
+    One record per position, numbered in the order of the positions, with the values of TRADE_RECORD_COLUMNS.
+    The quantity and dates are those of the first leg.
+    """
+    records = []
+    for trade_number, position in enumerate(positions):
+        option = position.options[0]
+        records.append((trade_number, position.option_combination_type.name, position.option_position_type.name,
+                        option.trade_open_info.quantity, option.trade_open_info.date,
+                        option.trade_close_info.date if option.trade_close_info else None,
+                        float(position.trade_value), float(position.get_profit_loss()), float(position.get_fees())))
+    return records
@@ -1,7 +1,11 @@
 from dataclasses import dataclass, field
 import datetime
+
+import numpy as np
+
 from options_framework.utils.helpers import decimalize_0, decimalize_2
 from options_framework.option import Option
+from options_framework.option_chain import OptionChain
 from options_framework.option_types import OptionType, OptionCombinationType, OptionStatus, OptionPositionType
 from options_framework.spreads.option_combo import OptionCombination
 
@@ -9,35 +13,42 @@ from options_framework.spreads.option_combo import OptionCombination
 @dataclass(repr=False, slots=True)
 class Butterfly(OptionCombination):
 
+    @staticmethod
+    def _select_wing_options(option_chain: OptionChain | list[Option], expiration: datetime.date,
+                             option_type: OptionType, center_strike: int | float, lower_wing_width: int | float,
+                             upper_wing_width: int | float) -> list[Option] | None:
+        if not isinstance(option_chain, OptionChain):
+            options = option_chain
+            option_chain = OptionChain()
+            option_chain.on_option_chain_loaded(quote_datetime=options[0].quote_datetime if options else None,
+                                                option_chain=options)
+        expiration = datetime.date(expiration.year, expiration.month, expiration.day)
+        candidates = option_chain.get_indexes_by_strike(expiration=expiration, option_type=option_type)
+        strikes = option_chain.strikes[candidates]
+        center = np.searchsorted(strikes, center_strike, side='left')
+        if center == len(strikes):
+            return None
+        lower = max(np.searchsorted(strikes, strikes[center] - lower_wing_width, side='right') - 1, 0)
+        upper = min(np.searchsorted(strikes, strikes[center] + upper_wing_width, side='left'), len(strikes) - 1)
+        return [option_chain.get_option(candidates[i]) for i in (lower, center, upper)]
+
     @classmethod
-    def get_balanced_butterfly(cls, *, option_chain: list[Option], expiration: datetime.date, option_type: OptionType,
-                               center_strike: int | float, wing_width: int | float, quantity: int = 1):
+    def get_balanced_butterfly(cls, *, option_chain: OptionChain | list[Option], expiration: datetime.date,
+                               option_type: OptionType, center_strike: int | float, wing_width: int | float,
+                               quantity: int = 1):
 
-        expiration = datetime.date(expiration.year, expiration.month, expiration.day)
-        candidates = [o for o in option_chain if o.expiration == expiration and o.option_type == option_type]
-        center_option_candidates = [o for o in candidates if o.strike >= center_strike]
-        if not center_option_candidates:
+        position_options = cls._select_wing_options(option_chain, expiration, option_type, center_strike,
+                                                    wing_width, wing_width)
+        if position_options is None:
             raise ValueError("Butterfly position cannot be created with these values - no center wing options found")
-        center_option = center_option_candidates[0]
-        lower_wing_candidates = [o for o in candidates if o.strike <= (center_option.strike - wing_width)]
-        if not lower_wing_candidates:
-            lower_wing = candidates[0]
-        else:
-            lower_wing = lower_wing_candidates[-1]
-        upper_wing_candidates = [o for o in candidates if o.strike >= (center_option.strike + wing_width)]
-        if not upper_wing_candidates:
-            upper_wing = candidates[-1]
-        else:
-            upper_wing = upper_wing_candidates[0]
-        position_options = [lower_wing, center_option, upper_wing]
 
         butterfly = Butterfly(position_options, option_combination_type=OptionCombinationType.BUTTERFLY,
                               quantity=quantity)
         return butterfly
 
     @classmethod
-    def get_unbalanced_butterfly(cls, *, option_chain: list[Option], expiration: datetime.date, option_type: OptionType,
-                                 center_strike: int | float,  lower_wing_width: int | float,
+    def get_unbalanced_butterfly(cls, *, option_chain: OptionChain | list[Option], expiration: datetime.date,
+                                 option_type: OptionType, center_strike: int | float,  lower_wing_width: int | float,
                                  upper_wing_width: int | float, center_quantity_multiple: int = -3,
                                  lower_quantity_multiple: int = 2, upper_quantity_multiple: int = 1,
                                  quantity: int = 1):
@@ -45,28 +56,16 @@ class Butterfly(OptionCombination):
         if center_quantity_multiple + lower_quantity_multiple + upper_quantity_multiple != 0:
             raise ValueError("Option quantity multiples are unbalanced. This configuration will open naked options.")
 
-        expiration = datetime.date(expiration.year, expiration.month, expiration.day)
-        candidates = [o for o in option_chain if o.expiration == expiration and o.option_type == option_type]
-        center_option_candidates = [o for o in candidates if o.strike >= center_strike]
-        if not center_option_candidates:
+        position_options = cls._select_wing_options(option_chain, expiration, option_type, center_strike,
+                                                    lower_wing_width, upper_wing_width)
+        if position_options is None:
             ex = ValueError()
             ex.strerror = "Butterfly position cannot be created with these values - no center wing options found"
             raise ex
-        center_option = center_option_candidates[0]
+        lower_wing, center_option, upper_wing = position_options
         center_option.quantity = center_quantity_multiple * quantity
-        lower_wing_candidates = [o for o in candidates if o.strike <= (center_option.strike - lower_wing_width)]
-        if not lower_wing_candidates:
-            lower_wing = candidates[0]
-        else:
-            lower_wing = lower_wing_candidates[-1]
         lower_wing.quantity = lower_quantity_multiple * quantity
-        upper_wing_candidates = [o for o in candidates if o.strike >= (center_option.strike + upper_wing_width)]
-        if not upper_wing_candidates:
-            upper_wing = candidates[-1]
-        else:
-            upper_wing = upper_wing_candidates[0]
         upper_wing.quantity = upper_quantity_multiple * quantity
-        position_options = [lower_wing, center_option, upper_wing]
         user_defined = {'center_quantity_multiple': center_quantity_multiple,
                         'lower_quantity_multiple': lower_quantity_multiple,
                         'upper_quantity_multiple': upper_quantity_multiple}
@@ -110,6 +109,12 @@ class Butterfly(OptionCombination):
     def option_type(self) -> OptionType:
         return self.center_option.option_type
 
+    def update_quantity(self, quantity: int):
+        self.quantity = quantity
+        self.lower_option.quantity = quantity * self.lower_quantity_multiple
+        self.center_option.quantity = quantity * self.center_quantity_multiple
+        self.upper_option.quantity = quantity * self.upper_quantity_multiple
+
     def open_trade(self, *, quantity: int = 1, **kwargs: dict) -> None:
         self.lower_option.open_trade(quantity=quantity * self.lower_quantity_multiple)
         self.center_option.open_trade(quantity=quantity * self.center_quantity_multiple)
@@ -60,31 +60,28 @@ class IronCondor(OptionCombination):
             raise ValueError(message)
 
         # Find nearest matching expiration
-        try:
-            expiration = next(e for e in option_chain.expirations if e >= expiration)
-        except StopIteration:
+        expiration = option_chain.get_expiration(expiration)
+        if expiration is None:
             message = "No matching expiration was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
-        exp_strikes = option_chain.expiration_strikes[expiration].copy()
-        options = [o for o in option_chain.option_chain if o.expiration == expiration].copy()
         # Find strikes
-        try:
-            long_call_strike = next(s for s in exp_strikes if s >= long_call_strike)
-            short_call_strike = next(s for s in exp_strikes if s >= short_call_strike)
-
-            exp_strikes.sort(reverse=True)
-            long_put_strike = next(s for s in exp_strikes if s <= long_put_strike)
-            short_put_strike = next(s for s in exp_strikes if s <= short_put_strike)
-        except StopIteration:
+        long_call_strike = option_chain.get_strike_at_or_above(expiration=expiration, strike=long_call_strike)
+        short_call_strike = option_chain.get_strike_at_or_above(expiration=expiration, strike=short_call_strike)
+        long_put_strike = option_chain.get_strike_at_or_below(expiration=expiration, strike=long_put_strike)
+        short_put_strike = option_chain.get_strike_at_or_below(expiration=expiration, strike=short_put_strike)
+        if None in (long_call_strike, short_call_strike, long_put_strike, short_put_strike):
             raise ValueError("No matching strike was found in the option chain. Consider changing the selection filter.")
 
-        try:
-            long_call_option = next(o for o in options if o.option_type == OptionType.CALL and o.strike == long_call_strike)
-            short_call_option = next(o for o in options if o.option_type == OptionType.CALL and o.strike == short_call_strike)
-            long_put_option = next(o for o in options if o.option_type == OptionType.PUT and o.strike == long_put_strike)
-            short_put_option = next(o for o in option_chain.option_chain if o.option_type == OptionType.PUT and o.strike == short_put_strike)
-        except StopIteration:
+        long_call_option = option_chain.get_option_by_strike(expiration=expiration, option_type=OptionType.CALL,
+                                                             strike=long_call_strike)
+        short_call_option = option_chain.get_option_by_strike(expiration=expiration, option_type=OptionType.CALL,
+                                                              strike=short_call_strike)
+        long_put_option = option_chain.get_option_by_strike(expiration=expiration, option_type=OptionType.PUT,
+                                                            strike=long_put_strike)
+        short_put_option = option_chain.get_option_by_strike(expiration=expiration, option_type=OptionType.PUT,
+                                                             strike=short_put_strike)
+        if None in (long_call_option, short_call_option, long_put_option, short_put_option):
             raise ValueError("No options matching the requirements were found in the option chain. Consider changing the selection filter.")
 
         long_call_option.quantity, long_call_option.position_type = quantity, OptionPositionType.LONG
@@ -122,15 +119,11 @@ class IronCondor(OptionCombination):
         """
 
         # Find nearest matching expiration
-        try:
-            expiration = next(e for e in option_chain.expirations if e >= expiration)
-        except StopIteration:
+        expiration = option_chain.get_expiration(expiration)
+        if expiration is None:
             message = "No matching expiration was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
-        exp_strikes = option_chain.expiration_strikes[expiration].copy()
-        options = [o for o in option_chain.option_chain if o.expiration == expiration].copy()
-
         # Define strike targest
         long_call_strike, short_call_strike = (inner_call_strike, inner_call_strike + spread_width) \
             if option_position_type == OptionPositionType.LONG \
@@ -139,29 +132,26 @@ class IronCondor(OptionCombination):
             if option_position_type == OptionPositionType.LONG \
             else (inner_put_strike - spread_width, inner_put_strike)
 
-        try:
-            # Find call strikes
-            long_call_strike = next(s for s in exp_strikes if s >= long_call_strike)
-            short_call_strike = next(s for s in exp_strikes if s >= short_call_strike)
+        # Find call strikes
+        long_call_strike = option_chain.get_strike_at_or_above(expiration=expiration, strike=long_call_strike)
+        short_call_strike = option_chain.get_strike_at_or_above(expiration=expiration, strike=short_call_strike)
 
-            # Find put strikes
-            exp_strikes.sort(reverse=True)
-            long_put_strike = next(s for s in exp_strikes if s <= long_put_strike)
-            short_put_strike = next(s for s in exp_strikes if s <= short_put_strike)
-        except StopIteration:
+        # Find put strikes
+        long_put_strike = option_chain.get_strike_at_or_below(expiration=expiration, strike=long_put_strike)
+        short_put_strike = option_chain.get_strike_at_or_below(expiration=expiration, strike=short_put_strike)
+        if None in (long_call_strike, short_call_strike, long_put_strike, short_put_strike):
             message = "No strikes matching the requirements were found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
-        try:
-            long_call_option = next(
-                o for o in options if o.option_type == OptionType.CALL and o.strike == long_call_strike)
-            short_call_option = next(
-                o for o in options if o.option_type == OptionType.CALL and o.strike == short_call_strike)
-            long_put_option = next(
-                o for o in options if o.option_type == OptionType.PUT and o.strike == long_put_strike)
-            short_put_option = next(o for o in options if
-                                    o.option_type == OptionType.PUT and o.strike == short_put_strike)
-        except StopIteration:
+        long_call_option = option_chain.get_option_by_strike(expiration=expiration, option_type=OptionType.CALL,
+                                                             strike=long_call_strike)
+        short_call_option = option_chain.get_option_by_strike(expiration=expiration, option_type=OptionType.CALL,
+                                                              strike=short_call_strike)
+        long_put_option = option_chain.get_option_by_strike(expiration=expiration, option_type=OptionType.PUT,
+                                                            strike=long_put_strike)
+        short_put_option = option_chain.get_option_by_strike(expiration=expiration, option_type=OptionType.PUT,
+                                                             strike=short_put_strike)
+        if None in (long_call_option, short_call_option, long_put_option, short_put_option):
             raise ValueError(
                 "No options matching the requirements were found in the option chain. Consider changing the selection filter.")
 
@@ -201,50 +191,41 @@ class IronCondor(OptionCombination):
                 """
 
         # Find nearest matching expiration
-        try:
-            expiration = next(e for e in option_chain.expirations if e >= expiration)
-        except StopIteration:
+        expiration = option_chain.get_expiration(expiration)
+        if expiration is None:
             message = "No matching expiration was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
-        options = [o for o in option_chain.option_chain if o.expiration == expiration]
-        options.sort(key=lambda x: x.delta, reverse=True)
-
         # Find nearest long call matching delta
-        select_options = [o for o in options if o.option_type == OptionType.CALL
-                          and o.delta <= long_delta]
-        if not select_options:
+        long_call_option = option_chain.get_option_by_delta(expiration=expiration, option_type=OptionType.CALL,
+                                                            delta=long_delta)
+        if long_call_option is None:
             raise ValueError(
                 "No matching options were found for the long call delta value. Consider changing the selection filter.")
-        long_call_option = select_options[0]
         long_call_option.quantity, long_call_option.position_type = quantity, OptionPositionType.LONG
 
         # Find nearest short call matching delta
-        select_options = [o for o in options if o.option_type == OptionType.CALL
-                          and o.delta <= short_delta]
-        if not select_options:
+        short_call_option = option_chain.get_option_by_delta(expiration=expiration, option_type=OptionType.CALL,
+                                                             delta=short_delta)
+        if short_call_option is None:
             raise ValueError(
                 "No matching options were found for the short call delta value. Consider changing the selection filter.")
-        short_call_option = select_options[0]
         short_call_option.quantity, short_call_option.position_type = quantity * -1, OptionPositionType.SHORT
 
-        options.sort(key=lambda x: x.delta)
         # Find nearest long put matching delta
-        select_options = [o for o in options if o.option_type == OptionType.PUT
-                          and o.delta >= -long_delta]
-        if not select_options:
+        long_put_option = option_chain.get_option_by_delta(expiration=expiration, option_type=OptionType.PUT,
+                                                           delta=-long_delta)
+        if long_put_option is None:
             raise ValueError(
                 "No matching options were found for the long put delta value. Consider changing the selection filter.")
-        long_put_option = select_options[0]
         long_put_option.quantity, long_put_option.position_type = quantity, OptionPositionType.LONG
 
         # Find nearest short put matching delta
-        select_options = [o for o in options if o.option_type == OptionType.PUT
-                          and o.delta >= -short_delta]
-        if not select_options:
+        short_put_option = option_chain.get_option_by_delta(expiration=expiration, option_type=OptionType.PUT,
+                                                            delta=-short_delta)
+        if short_put_option is None:
             raise ValueError(
                 "No matching options were found for the short put delta value. Consider changing the selection filter.")
-        short_put_option = select_options[0]
         short_put_option.quantity, short_put_option.position_type = quantity * -1, OptionPositionType.SHORT
 
         spread_options = [long_call_option, short_call_option, long_put_option, short_put_option]
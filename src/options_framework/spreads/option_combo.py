@@ -6,6 +6,21 @@ from dataclasses import dataclass, field
 from ..option import Option
 from ..option_types import OptionCombinationType, OptionStatus, OptionPositionType
 
+_position_ids = itertools.count()
+
+
+def _next_position_id() -> int:
+    return next(_position_ids)
+
+
+def reserve_position_ids(next_id: int) -> None:
+    """
+    Makes sure new positions get an id of at least next_id, so they do not reuse the ids of positions
+    restored from a checkpoint
+    """
+    global _position_ids
+    _position_ids = itertools.count(max(next(_position_ids), next_id))
+
 
 @dataclass(repr=False, slots=True)
 class OptionCombination(ABC):
@@ -20,7 +35,7 @@ class OptionCombination(ABC):
     option_combination_type: OptionCombinationType = field(default=None)
     option_position_type: OptionPositionType = field(default=None)
     quantity: int = field(default=1)
-    position_id: int = field(init=False, default_factory=lambda counter=itertools.count(): next(counter))
+    position_id: int = field(init=False, default_factory=_next_position_id)
     user_defined: dict = field(default_factory=lambda: {})
 
     def __post_init__(self):
@@ -19,24 +19,21 @@ class Single(OptionCombination):
                    quantity: int = 1) -> OptionCombination:
 
         # Find nearest matching expiration
-        try:
-            expiration = next(e for e in option_chain.expirations if e >= expiration)
-        except StopIteration:
+        expiration = option_chain.get_expiration(expiration)
+        if expiration is None:
             message = "No matching expiration was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
         # Find nearest matching strike for this expiration
-        strikes = [s for s in option_chain.expiration_strikes[expiration]].copy()
-        try:
-            if option_type == OptionType.CALL:
-                strike = next(s for s in strikes if s >= strike)
-            else:
-                strikes.sort(reverse=True)
-                strike = next(s for s in strikes if s <= strike)
-
-            option = next(o for o in option_chain.option_chain if o.option_type == option_type
-                          and o.expiration == expiration and o.strike == strike)
-        except StopIteration:
+        if option_type == OptionType.CALL:
+            strike = option_chain.get_strike_at_or_above(expiration=expiration, strike=strike)
+        else:
+            strike = option_chain.get_strike_at_or_below(expiration=expiration, strike=strike)
+        if strike is None:
+            raise ValueError("No matching strike was found in the option chain. Consider changing the selection filter.")
+
+        option = option_chain.get_option_by_strike(expiration=expiration, option_type=option_type, strike=strike)
+        if option is None:
             raise ValueError("No matching strike was found in the option chain. Consider changing the selection filter.")
 
         if option.price == 0:
@@ -55,22 +52,14 @@ class Single(OptionCombination):
                             quantity: int = 1) -> OptionCombination:
 
         # Find nearest matching expiration
-        try:
-            expiration = next(e for e in option_chain.expirations if e >= expiration)
-        except StopIteration:
+        expiration = option_chain.get_expiration(expiration)
+        if expiration is None:
             message = "No matching expiration was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
         # Find option with the nearest delta
-        options = [o for o in option_chain.option_chain if o.option_type == option_type and o.expiration == expiration].copy()
-        try:
-            if option_type == OptionType.CALL:
-                options.sort(key=lambda x: x.delta, reverse=True)
-                option = next(o for o in options if o.delta <= delta)
-            else:
-                options.sort(key=lambda x: x.delta, reverse=False)
-                option = next(o for o in options if o.delta >= delta)
-        except StopIteration:
+        option = option_chain.get_option_by_delta(expiration=expiration, option_type=option_type, delta=delta)
+        if option is None:
             raise ValueError("No matching options were found for the delta value. Consider changing the selection filter.")
 
         if option.price == 0:
@@ -0,0 +1,289 @@
+import datetime
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from options_framework.option_chain import OptionChain
+from options_framework.option_types import OptionType, OptionPositionType, OptionCombinationType, FilterRange
+from options_framework.spreads.butterfly import Butterfly
+from options_framework.spreads.iron_condor import IronCondor
+from options_framework.spreads.vertical import Vertical
+from options_framework.utils.helpers import round_array
+
+GREEKS = ['delta', 'gamma', 'theta', 'vega']
+
+
+@dataclass
+class SpreadScreener:
+    """
+    Scores every vertical, iron condor or butterfly that can be built from one expiration of an option chain.
+    The candidates are built and scored with array operations over the chain, and returned as a DataFrame
+    with one row per candidate. The option columns hold the chain positions of the legs, so Option objects
+    and spreads are only created for the candidates that are selected with the get_* methods. Each spread
+    gets its own Option objects, because the selected spreads often share a contract and the leg quantities
+    are set on the options.
+
+    All values are for one spread. price is the net debit, so a credit is a negative price. max_profit and
+    max_loss include the 100 share multiplier, and the net greeks are multiplied by the leg quantities and
+    the multiplier, the same as OptionPortfolio.net_greeks.
+    """
+    option_chain: OptionChain
+
+    def screen_verticals(self, *, expiration: datetime.date, option_type: OptionType,
+                         option_position_type: OptionPositionType,
+                         min_width: int | float = None, max_width: int | float = None) -> DataFrame:
+        """
+        Scores all the verticals for the expiration and option type.
+        :param expiration: The desired expiration. If this is not found, the next greatest expiration will be used.
+        :param option_type: Put or call
+        :param option_position_type: Long (debit) or short (credit) verticals
+        :param min_width: The smallest distance between the strikes
+        :param max_width: The largest distance between the strikes
+        :return: DataFrame with the columns long_option, short_option, long_strike, short_strike, width, price,
+            max_profit, max_loss, risk_reward and the net greeks
+        """
+        expiration = self._get_expiration(expiration)
+        indexes, strikes, _ = self._get_strike_group(expiration, option_type)
+        lower, upper = np.triu_indices(len(indexes), k=1)
+        width = strikes[upper] - strikes[lower]
+        keep = width > 0
+        if min_width is not None:
+            keep &= width >= min_width
+        if max_width is not None:
+            keep &= width <= max_width
+        lower, upper, width = lower[keep], upper[keep], width[keep]
+
+        # a long call vertical buys the lower strike, and a long put vertical buys the higher strike
+        lower_is_long = (option_type == OptionType.CALL) == (option_position_type == OptionPositionType.LONG)
+        long_legs, short_legs = (lower, upper) if lower_is_long else (upper, lower)
+        legs = {'long_option': (indexes[long_legs], 1), 'short_option': (indexes[short_legs], -1)}
+        candidates = self._score_legs(legs)
+        candidates['long_strike'] = strikes[long_legs]
+        candidates['short_strike'] = strikes[short_legs]
+        candidates['width'] = width
+        self._set_risk(candidates, option_position_type, width)
+        return candidates
+
+    def screen_iron_condors(self, *, expiration: datetime.date, option_position_type: OptionPositionType,
+                            spread_widths: list[int | float], inner_call_delta: FilterRange = None,
+                            inner_put_delta: FilterRange = None) -> DataFrame:
+        """
+        Scores the iron condors for each combination of inner call strike, inner put strike and spread width.
+        The inner put strike must be below the inner call strike. Each wing uses the first strike at least the
+        spread width further from the money than the inner strike.
+        :param expiration: The desired expiration. If this is not found, the next greatest expiration will be used.
+        :param option_position_type: A short iron condor sells the inner strikes, and a long iron condor buys them
+        :param spread_widths: The spread widths to try
+        :param inner_call_delta: Optional delta range for the inner call
+        :param inner_put_delta: Optional delta range for the inner put. Put deltas are negative numbers.
+        :return: DataFrame with the columns long_call_option, short_call_option, long_put_option,
+            short_put_option, the strikes of the legs, call_width, put_width, price, max_profit, max_loss,
+            risk_reward and the net greeks
+        """
+        expiration = self._get_expiration(expiration)
+        call_indexes, call_strikes, call_deltas = self._get_strike_group(expiration, OptionType.CALL)
+        put_indexes, put_strikes, put_deltas = self._get_strike_group(expiration, OptionType.PUT)
+        inner_calls = self._in_range(call_deltas, inner_call_delta)
+        inner_puts = self._in_range(put_deltas, inner_put_delta)
+
+        frames = []
+        for spread_width in spread_widths:
+            call_wings = np.searchsorted(call_strikes, call_strikes[inner_calls] + spread_width, side='left')
+            calls = call_wings < len(call_strikes)
+            put_wings = np.searchsorted(put_strikes, put_strikes[inner_puts] - spread_width, side='right') - 1
+            puts = put_wings >= 0
+            call_inner, call_wing = inner_calls[calls], call_wings[calls]
+            put_inner, put_wing = inner_puts[puts], put_wings[puts]
+            call_pairs, put_pairs = np.meshgrid(np.arange(len(call_inner)), np.arange(len(put_inner)), indexing='ij')
+            call_pairs, put_pairs = call_pairs.ravel(), put_pairs.ravel()
+            valid = put_strikes[put_inner[put_pairs]] < call_strikes[call_inner[call_pairs]]
+            call_pairs, put_pairs = call_pairs[valid], put_pairs[valid]
+            frames.append(DataFrame({'call_inner': call_inner[call_pairs], 'call_wing': call_wing[call_pairs],
+                                     'put_inner': put_inner[put_pairs], 'put_wing': put_wing[put_pairs]}))
+        # different spread widths can select the same wing strikes
+        pairs = pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True) if frames else \
+            DataFrame({'call_inner': [], 'call_wing': [], 'put_inner': [], 'put_wing': []}, dtype=np.int64)
+        call_inner, call_wing, put_inner, put_wing = pairs.to_numpy(dtype=np.int64).T
+
+        if option_position_type == OptionPositionType.SHORT:
+            long_call, short_call, long_put, short_put = call_wing, call_inner, put_wing, put_inner
+        else:
+            long_call, short_call, long_put, short_put = call_inner, call_wing, put_inner, put_wing
+        legs = {'long_call_option': (call_indexes[long_call], 1), 'short_call_option': (call_indexes[short_call], -1),
+                'long_put_option': (put_indexes[long_put], 1), 'short_put_option': (put_indexes[short_put], -1)}
+        candidates = self._score_legs(legs)
+        candidates['long_call_strike'] = call_strikes[long_call]
+        candidates['short_call_strike'] = call_strikes[short_call]
+        candidates['long_put_strike'] = put_strikes[long_put]
+        candidates['short_put_strike'] = put_strikes[short_put]
+        call_width = call_strikes[call_wing] - call_strikes[call_inner]
+        put_width = put_strikes[put_inner] - put_strikes[put_wing]
+        candidates['call_width'] = call_width
+        candidates['put_width'] = put_width
+        # only one side can finish in the money, so the risk is set by the wider side
+        width = np.maximum(call_width, put_width)
+        self._set_risk(candidates, option_position_type, width)
+        return candidates
+
+    def screen_butterflies(self, *, expiration: datetime.date, option_type: OptionType,
+                           wing_widths: list[int | float]) -> DataFrame:
+        """
+        Scores the long butterflies (one lower wing, two short center options, one upper wing) for each center
+        strike and wing width. Each wing uses the first strike at least the wing width away from the center.
+        :param expiration: The desired expiration. If this is not found, the next greatest expiration will be used.
+        :param option_type: Put or call
+        :param wing_widths: The wing widths to try
+        :return: DataFrame with the columns lower_option, center_option, upper_option, the strikes of the legs,
+            lower_width, upper_width, price, max_profit, max_loss, risk_reward and the net greeks
+        """
+        expiration = self._get_expiration(expiration)
+        indexes, strikes, _ = self._get_strike_group(expiration, option_type)
+        centers = np.arange(len(indexes))
+        frames = []
+        for wing_width in wing_widths:
+            lower = np.searchsorted(strikes, strikes - wing_width, side='right') - 1
+            upper = np.searchsorted(strikes, strikes + wing_width, side='left')
+            valid = (lower >= 0) & (upper < len(strikes)) & (lower < centers) & (upper > centers)
+            frames.append(DataFrame({'lower': lower[valid], 'center': centers[valid], 'upper': upper[valid]}))
+        wings = pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True) if frames else \
+            DataFrame({'lower': [], 'center': [], 'upper': []}, dtype=np.int64)
+        lower, center, upper = wings.to_numpy(dtype=np.int64).T
+
+        legs = {'lower_option': (indexes[lower], 1), 'center_option': (indexes[center], -2),
+                'upper_option': (indexes[upper], 1)}
+        candidates = self._score_legs(legs)
+        candidates['lower_strike'] = strikes[lower]
+        candidates['center_strike'] = strikes[center]
+        candidates['upper_strike'] = strikes[upper]
+        lower_width, upper_width = strikes[center] - strikes[lower], strikes[upper] - strikes[center]
+        candidates['lower_width'] = lower_width
+        candidates['upper_width'] = upper_width
+
+        # A call butterfly has its largest value at the center strike, worth the lower width. Above the upper
+        # strike it is worth lower width - upper width, which is a loss when the upper wing is wider.
+        # Puts are the mirror image.
+        price = candidates['price'].to_numpy()
+        near_width, far_width = (lower_width, upper_width) if option_type == OptionType.CALL \
+            else (upper_width, lower_width)
+        candidates['max_profit'] = round_array((near_width - price) * 100, 2)
+        candidates['max_loss'] = round_array((price + np.maximum(far_width - near_width, 0)) * 100, 2)
+        self._set_risk_reward(candidates)
+        return candidates
+
+    @staticmethod
+    def top(candidates: DataFrame, k: int, key: str | Callable[[DataFrame], np.ndarray] = 'risk_reward',
+            ascending: bool = False) -> DataFrame:
+        """
+        Returns the k best candidates.
+        :param candidates: candidates returned by one of the screen methods
+        :param k: the number of candidates to return
+        :param key: the column to sort by, or a function that returns a score for each candidate row
+        :param ascending: sort the lowest scores first. Candidates without a score are last.
+        :return: the k best rows
+        """
+        scores = candidates[key].to_numpy() if isinstance(key, str) else np.asarray(key(candidates), dtype=float)
+        order = pd.Series(scores).sort_values(ascending=ascending, kind='stable', na_position='last').index
+        return candidates.iloc[order[:k]]
+
+    def get_verticals(self, candidates: DataFrame, quantity: int = 1) -> list[Vertical]:
+        verticals = []
+        for long_index, short_index in zip(candidates['long_option'].tolist(), candidates['short_option'].tolist()):
+            long_option = self.option_chain.create_option(long_index)
+            short_option = self.option_chain.create_option(short_index)
+            long_option.quantity = abs(quantity)
+            short_option.quantity = abs(quantity) * -1
+            option_type = long_option.option_type
+            lower_is_long = long_option.strike < short_option.strike
+            option_position_type = OptionPositionType.LONG if lower_is_long == (option_type == OptionType.CALL) \
+                else OptionPositionType.SHORT
+            verticals.append(Vertical(options=[long_option, short_option],
+                                      option_combination_type=OptionCombinationType.VERTICAL,
+                                      option_position_type=option_position_type, quantity=abs(quantity)))
+        return verticals
+
+    def get_iron_condors(self, candidates: DataFrame, quantity: int = 1) -> list[IronCondor]:
+        iron_condors = []
+        columns = ['long_call_option', 'short_call_option', 'long_put_option', 'short_put_option']
+        for indexes in candidates[columns].itertuples(index=False):
+            long_call, short_call, long_put, short_put = [self.option_chain.create_option(i) for i in indexes]
+            long_call.quantity, long_call.position_type = quantity, OptionPositionType.LONG
+            short_call.quantity, short_call.position_type = quantity * -1, OptionPositionType.SHORT
+            long_put.quantity, long_put.position_type = quantity, OptionPositionType.LONG
+            short_put.quantity, short_put.position_type = quantity * -1, OptionPositionType.SHORT
+            option_position_type = OptionPositionType.LONG if long_call.strike < short_call.strike \
+                else OptionPositionType.SHORT
+            iron_condors.append(IronCondor(options=[long_call, short_call, long_put, short_put],
+                                           option_combination_type=OptionCombinationType.IRON_CONDOR,
+                                           option_position_type=option_position_type, quantity=quantity))
+        return iron_condors
+
+    def get_butterflies(self, candidates: DataFrame, quantity: int = 1) -> list[Butterfly]:
+        butterflies = []
+        for indexes in candidates[['lower_option', 'center_option', 'upper_option']].itertuples(index=False):
+            options = [self.option_chain.create_option(i) for i in indexes]
+            butterflies.append(Butterfly(options, option_combination_type=OptionCombinationType.BUTTERFLY,
+                                         quantity=quantity))
+        return butterflies
+
+    def _get_expiration(self, expiration: datetime.date) -> datetime.date:
+        expiration = self.option_chain.get_expiration(expiration)
+        if expiration is None:
+            message = "No matching expiration was found in the option chain. Consider changing the selection filter."
+            raise ValueError(message)
+        return expiration
+
+    def _get_strike_group(self, expiration: datetime.date,
+                          option_type: OptionType) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the chain positions, strikes and deltas of the options for the expiration and type, by strike
+        """
+        indexes = self.option_chain.get_indexes_by_strike(expiration=expiration, option_type=option_type)
+        deltas = self.option_chain.extended_attributes.get('delta')
+        deltas = deltas[indexes] if deltas is not None else np.full(len(indexes), np.nan)
+        return indexes, self.option_chain.strikes[indexes], deltas
+
+    @staticmethod
+    def _in_range(values: np.ndarray, fltr_range: FilterRange | None) -> np.ndarray:
+        keep = np.ones(len(values), dtype=bool)
+        if fltr_range is not None and fltr_range.low is not None:
+            keep &= values >= fltr_range.low
+        if fltr_range is not None and fltr_range.high is not None:
+            keep &= values <= fltr_range.high
+        return np.flatnonzero(keep)
+
+    def _score_legs(self, legs: dict) -> DataFrame:
+        """
+        Adds up the price and greeks of the legs, weighted by the leg quantities.
+        :param legs: leg name: (chain positions, quantity multiple)
+        """
+        chain = self.option_chain
+        prices = round_array(chain.prices, 2)
+        candidates = DataFrame({name: indexes for name, (indexes, _) in legs.items()})
+        candidates['price'] = round_array(sum(prices[indexes] * quantity for indexes, quantity in legs.values()), 2)
+        for name in GREEKS:
+            values = chain.extended_attributes.get(name)
+            candidates[name] = sum(values[indexes] * quantity * 100 for indexes, quantity in legs.values()) \
+                if values is not None else np.nan
+        return candidates
+
+    def _set_risk(self, candidates: DataFrame, option_position_type: OptionPositionType, width: np.ndarray) -> None:
+        """
+        Sets max profit and loss for spreads that are worth between zero and the strike width at expiration
+        """
+        price = candidates['price'].to_numpy()
+        if option_position_type == OptionPositionType.LONG:
+            candidates['max_profit'] = round_array((width - price) * 100, 2)
+            candidates['max_loss'] = round_array(price * 100, 2)
+        else:
+            candidates['max_profit'] = round_array(price * -100, 2)
+            candidates['max_loss'] = round_array((width + price) * 100, 2)
+        self._set_risk_reward(candidates)
+
+    @staticmethod
+    def _set_risk_reward(candidates: DataFrame) -> None:
+        max_profit, max_loss = candidates['max_profit'].to_numpy(), candidates['max_loss'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            candidates['risk_reward'] = np.where(max_loss > 0, max_profit / max_loss, np.inf)
@@ -26,30 +26,30 @@ class Vertical(OptionCombination):
             raise ValueError("Long and short strikes cannot be the same")
 
             # Find nearest matching expiration
-            try:
-                expiration = next(e for e in option_chain.expirations if e >= expiration)
-            except StopIteration:
+            expiration = option_chain.get_expiration(expiration)
+            if expiration is None:
                 message = "No matching expiration was found in the option chain. Consider changing the selection filter."
                 raise ValueError(message)
 
-        expiration_strikes = option_chain.expiration_strikes[expiration].copy()
-        options = [o for o in option_chain.option_chain if o.option_type == option_type and o.expiration == expiration].copy()
-        try:
-            # Find nearest strikes
-            if option_type == OptionType.CALL:
-                long_strike = next(s for s in expiration_strikes if s >= long_strike)
-                short_strike = next(s for s in expiration_strikes if s >= short_strike)
-            else:
-                expiration_strikes.sort(reverse=True)
-                long_strike = next(s for s in expiration_strikes if s <= long_strike)
-                short_strike = next(s for s in expiration_strikes if s <= short_strike)
-        except StopIteration as ex:
+        # Find nearest strikes
+        if option_type == OptionType.CALL:
+            long_strike = option_chain.get_strike_at_or_above(expiration=expiration, strike=long_strike)
+            short_strike = option_chain.get_strike_at_or_above(expiration=expiration, strike=short_strike)
+        else:
+            long_strike = option_chain.get_strike_at_or_below(expiration=expiration, strike=long_strike)
+            short_strike = option_chain.get_strike_at_or_below(expiration=expiration, strike=short_strike)
+        if long_strike is None or short_strike is None:
             message = "No matching strike was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
-        long_option = next(o for o in options if o.strike == long_strike)
+        long_option = option_chain.get_option_by_strike(expiration=expiration, option_type=option_type,
+                                                        strike=long_strike)
+        short_option = option_chain.get_option_by_strike(expiration=expiration, option_type=option_type,
+                                                         strike=short_strike)
+        if long_option is None or short_option is None:
+            message = "No matching strike was found in the option chain. Consider changing the selection filter."
+            raise ValueError(message)
         long_option.quantity = quantity
-        short_option = next(o for o in options if o.strike == short_strike)
         short_option.quantity = quantity * -1
 
         vertical = Vertical(options=[long_option, short_option],
@@ -73,22 +73,17 @@ class Vertical(OptionCombination):
             raise ValueError("Long and short strikes cannot be the same")
 
         # Find nearest matching expiration
-        try:
-            expiration = next(e for e in option_chain.expirations if e >= expiration)
-        except StopIteration:
+        expiration = option_chain.get_expiration(expiration)
+        if expiration is None:
             message = "No matching expiration was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
-        options = [o for o in option_chain.option_chain if o.option_type == option_type and o.expiration == expiration].copy()
-        try:
-            if option_type == OptionType.CALL:
-                long_option = next(o for o in options if o.delta <= long_delta)
-                short_option = next(o for o in options if o.delta <= short_delta)
-            else:
-                options.sort(key=lambda x: x.delta, reverse=False)
-                long_option = next(o for o in options if o.delta >= -long_delta)
-                short_option = next(o for o in options if o.delta >= -short_delta)
-        except StopIteration:
+        sign = 1 if option_type == OptionType.CALL else -1
+        long_option = option_chain.get_option_by_delta(expiration=expiration, option_type=option_type,
+                                                       delta=long_delta * sign)
+        short_option = option_chain.get_option_by_delta(expiration=expiration, option_type=option_type,
+                                                        delta=short_delta * sign)
+        if long_option is None or short_option is None:
             message = "No matching delta value was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
@@ -123,31 +118,31 @@ class Vertical(OptionCombination):
                                                quantity: int = 1) -> OptionCombination:
 
         # Find nearest matching expiration
-        try:
-            expiration = next(e for e in option_chain.expirations if e >= expiration)
-        except StopIteration:
+        expiration = option_chain.get_expiration(expiration)
+        if expiration is None:
             message = "No matching expiration was found in the option chain. Consider changing the selection filter."
             raise ValueError(message)
 
-        options = [o for o in option_chain.option_chain if o.option_type == option_type and o.expiration == expiration].copy()
-        strikes = [s for s in option_chain.expiration_strikes[expiration]].copy()
-        try:
-            if option_type == OptionType.CALL:
-                option = next(o for o in options if o.delta <= delta)
-                target_strike = option.strike + spread_width
-                strike = next(s for s in strikes if s >= target_strike)
-
-            else:
-                options.sort(key=lambda x: x.delta, reverse=False)
-                option = next(o for o in options if o.delta >= -delta)
-                target_strike = option.strike - spread_width
-                strikes.sort(reverse=True)
-                strike = next(s for s in strikes if s <= target_strike)
-
-            next_option = next(o for o in options if o.strike == strike)
-
-        except StopIteration:
-            message = "Vertical could not be created with the delta value. Consider changing the selection filter."
+        message = "Vertical could not be created with the delta value. Consider changing the selection filter."
+        if option_type == OptionType.CALL:
+            option = option_chain.get_option_by_delta(expiration=expiration, option_type=option_type, delta=delta)
+            if option is None:
+                raise ValueError(message)
+            target_strike = option.strike + spread_width
+            strike = option_chain.get_strike_at_or_above(expiration=expiration, strike=target_strike)
+
+        else:
+            option = option_chain.get_option_by_delta(expiration=expiration, option_type=option_type, delta=-delta)
+            if option is None:
+                raise ValueError(message)
+            target_strike = option.strike - spread_width
+            strike = option_chain.get_strike_at_or_below(expiration=expiration, strike=target_strike)
+
+        if strike is None:
+            raise ValueError(message)
+
+        next_option = option_chain.get_option_by_strike(expiration=expiration, option_type=option_type, strike=strike)
+        if next_option is None:
             raise ValueError(message)
 
         long_option = option if option_position_type == OptionPositionType.LONG else next_option
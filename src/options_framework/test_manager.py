@@ -1,13 +1,20 @@
 import datetime
 from dataclasses import dataclass, field
+from pathlib import Path
 
+from options_framework.checkpoint import Checkpoint, CloseValuesLog, find_latest_checkpoint, get_checkpoint_path, \
+    remove_old_checkpoints, CLOSE_VALUES_FILE
+from options_framework.clock import SkippingClock
+from options_framework.config import settings
 from options_framework.data.data_loader import DataLoader
+from options_framework.memory_report import MemoryMonitor
 
 from options_framework.data.sql_data_loader import SQLServerDataLoader
 from options_framework.option_chain import OptionChain
 from options_framework.option_portfolio import OptionPortfolio
 
 from options_framework.option_types import SelectFilter
+from options_framework.profiling import Profiler, Tracer
 
 
 @dataclass(repr=False)
@@ -17,23 +24,153 @@ class OptionTestManager:
     select_filter: SelectFilter
     starting_cash: float
     extended_option_attributes: list = field(default_factory=lambda: [])
+    data_loader: DataLoader = field(default=None)
+    """An existing data loader for the same test period, for example one shared by the runs of a parameter sweep.
+    It is rewound to the start of the test. If not set, a data loader is created from the settings."""
+    checkpoint_dir: str | Path = field(default=None)
+    """Folder for the checkpoints of the test. If not set, the CHECKPOINT_DIR setting is used."""
+    checkpoint_interval: int = field(default=None)
+    """Saves a checkpoint every time this many bars have run. If not set, the CHECKPOINT_INTERVAL setting is used.
+    No checkpoints are saved automatically if neither is set."""
+    user_state: dict = field(default_factory=lambda: {})
+    """Values the strategy keeps between bars. They are saved with each checkpoint and restored on resume."""
     option_chain: OptionChain = field(init=False, default_factory=lambda: OptionChain())
-    data_loader: DataLoader = field(init=False, default=None)
     portfolio: OptionPortfolio = field(init=False, default=None)
     expirations: list = field(init=False, default_factory=lambda: [])
+    memory_monitor: MemoryMonitor | None = field(init=False, default=None)
+    """Samples the memory of the test when the MEMORY_SAMPLE_INTERVAL or MEMORY_TRACE_ALLOCATIONS setting is set"""
+    profiler: Profiler | None = field(init=False, default=None)
+    """Times the hot paths of the test when the PROFILE or TRACE setting is true"""
+    resumed_datetime: datetime.datetime | None = field(init=False, default=None)
+    """When the test was resumed from a checkpoint, the quote datetime of the last bar before the checkpoint.
+    The bars up to this quote datetime must not be run again."""
+    _checkpoint_bars: int = field(init=False, default=0)
+    _close_values_log: CloseValuesLog | None = field(init=False, default=None)
 
     def __post_init__(self):
         self.portfolio = OptionPortfolio(self.starting_cash)
         # if settings.DATA_LOADER_TYPE == "FILE_DATA_LOADER":
         #     self.data_loader = FileDataLoader(start=self.start_datetime, end=self.end_datetime,
         #                                       select_filter=self.select_filter, fields_list=self.fields_list)
-        # elif settings.DATA_LOADER_TYPE == "SQL_DATA_LOADER":
-        self.data_loader = SQLServerDataLoader(start=self.start_datetime, end=self.end_datetime,
-                                               select_filter=self.select_filter,
-                                               extended_option_attributes=self.extended_option_attributes)
+        if self.data_loader is not None:
+            self.data_loader.rewind()
+        elif settings.DATA_LOADER_TYPE == "PARQUET_DATA_LOADER":
+            # pyarrow is an optional dependency, so the parquet loader is only imported when it is used
+            from options_framework.data.parquet_data_loader import ParquetDataLoader
+            self.data_loader = ParquetDataLoader(start=self.start_datetime, end=self.end_datetime,
+                                                 select_filter=self.select_filter,
+                                                 extended_option_attributes=self.extended_option_attributes)
+        elif settings.DATA_LOADER_TYPE == "SYNTHETIC_DATA_LOADER":
+            from options_framework.data.synthetic_data_loader import SyntheticDataLoader
+            self.data_loader = SyntheticDataLoader(start=self.start_datetime, end=self.end_datetime,
+                                                   select_filter=self.select_filter,
+                                                   extended_option_attributes=self.extended_option_attributes)
+        else:
+            self.data_loader = SQLServerDataLoader(start=self.start_datetime, end=self.end_datetime,
+                                                   select_filter=self.select_filter,
+                                                   extended_option_attributes=self.extended_option_attributes)
+        if settings.get('PROFILE', False) or settings.get('TRACE', False):
+            tracer = Tracer(capacity=settings.get('TRACE_BUFFER_SIZE', 1_000_000)) if settings.get('TRACE', False) \
+                else None
+            self.profiler = Profiler(tracer=tracer)
+            # the loader class is imported by now, and the methods must be wrapped before the events are bound
+            self.profiler.enable()
         self.data_loader.bind(option_chain_loaded=self.option_chain.on_option_chain_loaded)
-        self.portfolio.bind(new_position_opened=self.data_loader.on_options_opened)
+        self.portfolio.bind(new_position_opened=self.data_loader.on_options_opened,
+                            pre_next=self.data_loader.load_update_caches)
         self.expirations = self.data_loader.get_expirations()
+        sample_interval = settings.get('MEMORY_SAMPLE_INTERVAL', None)
+        trace_allocations = settings.get('MEMORY_TRACE_ALLOCATIONS', False)
+        if sample_interval or trace_allocations or settings.get('MEMORY_OUTPUT', None):
+            self.memory_monitor = MemoryMonitor(self, sample_interval=sample_interval,
+                                                trace_allocations=trace_allocations)
+        if self.checkpoint_dir is None:
+            self.checkpoint_dir = settings.get('CHECKPOINT_DIR', None)
+        if self.checkpoint_interval is None:
+            self.checkpoint_interval = settings.get('CHECKPOINT_INTERVAL', None)
+        if self.checkpoint_interval:
+            if self.checkpoint_dir is None:
+                raise ValueError('A checkpoint_dir is needed to save checkpoints')
+            # The checkpoint is saved before the next bar is run, after the strategy has handled the last bar
+            self.portfolio.bind(pre_next=self._on_pre_next)
 
     def get_current_option_chain(self, quote_datetime: datetime.datetime):
         self.data_loader.next_option_chain(quote_datetime=quote_datetime)
+
+    def get_memory_report(self) -> dict[str, int]:
+        """
+        The bytes used by the cache windows, update caches, position book, option chain, positions and
+        close values of the test, and the total
+        """
+        monitor = self.memory_monitor if self.memory_monitor is not None else MemoryMonitor(self)
+        return monitor.get_report()
+
+    def save_checkpoint(self) -> Path | None:
+        """
+        Saves the state of the test after the last bar that was run to the checkpoint folder. Only the latest
+        checkpoints are kept, as many as the CHECKPOINT_KEEP setting, 2 by default.
+
+        :return: the path of the checkpoint, or None if no bars have run
+        """
+        if not self.portfolio.close_values:
+            return None
+        if self._close_values_log is None:
+            self._close_values_log = CloseValuesLog(Path(self.checkpoint_dir) / CLOSE_VALUES_FILE)
+        checkpoint = Checkpoint.capture(self)
+        path = checkpoint.save(get_checkpoint_path(self.checkpoint_dir, checkpoint.quote_datetime),
+                               close_values_log=self._close_values_log)
+        self._checkpoint_bars = len(self.portfolio.close_values)
+        remove_old_checkpoints(self.checkpoint_dir, keep=settings.get('CHECKPOINT_KEEP', 2))
+        return path
+
+    def resume(self, path: str | Path = None) -> Checkpoint | None:
+        """
+        Restores the state of the test from a checkpoint, so the test continues after the last bar before the
+        checkpoint instead of starting over. This must be called before any bars are run.
+
+        :param path: the checkpoint file. If not set, the latest checkpoint in the checkpoint folder is used.
+        :return: the checkpoint, or None if there is no checkpoint to resume from
+        """
+        if path is None:
+            path = find_latest_checkpoint(self.checkpoint_dir) if self.checkpoint_dir is not None else None
+            if path is None:
+                return None
+        checkpoint = Checkpoint.load(path)
+        checkpoint.restore(self)
+        # the next checkpoints in the same folder append to the close values of this one
+        log = checkpoint.close_values_log
+        in_folder = self.checkpoint_dir is not None and log.path.parent.resolve() == Path(self.checkpoint_dir).resolve()
+        self._close_values_log = log if in_folder else None
+        self.resumed_datetime = checkpoint.quote_datetime
+        self._checkpoint_bars = len(self.portfolio.close_values)
+        return checkpoint
+
+    def _on_pre_next(self, quote_datetime: datetime.datetime, *args) -> None:
+        if len(self.portfolio.close_values) - self._checkpoint_bars >= self.checkpoint_interval:
+            self.save_checkpoint()
+
+    def get_skipping_clock(self, timestamps, entry_times: list[datetime.time],
+                           recheck_interval: datetime.timedelta | None = None, prices=None) -> SkippingClock:
+        """
+        Creates a clock that skips the bars where the strategy has nothing to do. The data loader is switched to
+        fetch the option chain only for the quote datetimes that are visited, instead of loading cache windows.
+
+        :param timestamps: the bar timestamps, in nanoseconds since the epoch
+        :param entry_times: times of day the strategy can open positions. Bars are skipped until the next
+            entry time while no positions are open.
+        :param recheck_interval: how often to visit a bar while positions are open. Every bar is visited if None.
+        :param prices: underlying price of each bar, for strategies that declare price bounds
+        """
+        self.data_loader.load_visited_only = True
+        return SkippingClock(timestamps=timestamps, entry_times=entry_times, recheck_interval=recheck_interval,
+                             prices=prices)
+
+    def detach(self) -> None:
+        """
+        Unbinds the option chain and portfolio from the data loader, so the loader can be used by another test manager,
+        and disables the profiler of the test
+        """
+        self.data_loader.unbind(self.option_chain)
+        self.portfolio.unbind(self.data_loader)
+        if self.profiler is not None:
+            self.profiler.disable()
@@ -0,0 +1,69 @@
+import math
+from decimal import Decimal
+
+import numpy as np
+
+from options_framework.config import settings
+from options_framework.option_types import NumericMode
+from options_framework.utils.helpers import round_array
+
+_numeric_mode = NumericMode(settings.get('NUMERIC_MODE', NumericMode.DECIMAL))
+
+
+def get_numeric_mode() -> NumericMode:
+    return _numeric_mode
+
+
+def set_numeric_mode(mode: NumericMode | str) -> None:
+    """
+    Changes the numeric mode. The mode is read from the NUMERIC_MODE setting when the framework is imported,
+    and is kept here so the hot paths do not look up the setting on every call.
+    """
+    global _numeric_mode
+    _numeric_mode = NumericMode(mode)
+
+
+def cents_enabled() -> bool:
+    return _numeric_mode == NumericMode.CENTS
+
+
+def to_cents(value: int | float | Decimal) -> int:
+    """
+    Converts a value to a whole number of cents. The result is the same as int(decimalize_2(value) * 100),
+    without creating a Decimal unless the value is within rounding error of half a cent.
+    :param value: the value to convert
+    :return: the value rounded to cents, as a number of cents
+    """
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, Decimal):
+        return int(value.quantize(Decimal('1.00')).scaleb(2))
+    scaled = value * 100
+    cents = round(scaled)
+    if abs(scaled - math.floor(scaled) - 0.5) <= 1e-6 + 8 * math.ulp(scaled):
+        # round the exact value of the float, like Decimal does
+        cents = int(Decimal(value).quantize(Decimal('1.00')).scaleb(2))
+    return cents
+
+
+def to_quantity(value: int | float | Decimal) -> int:
+    """
+    The same as int(decimalize_0(value))
+    """
+    if isinstance(value, int):
+        return value
+    return int(Decimal(value).quantize(Decimal('1')))
+
+
+def cents_to_float(cents: int) -> float:
+    """
+    Converts a number of cents to dollars. The result is the same as float() of the Decimal value.
+    """
+    return cents / 100
+
+
+def cents_array(values: np.ndarray) -> np.ndarray:
+    """
+    Converts an array of values to whole numbers of cents, rounded the same way as to_cents
+    """
+    return np.rint(round_array(values, 2) * 100).astype(np.int64)
@@ -1,5 +1,7 @@
 from decimal import Context, Decimal, getcontext
 
+import numpy as np
+
 
 def decimalize_0(value: int | float | Decimal) -> Decimal:
     """
@@ -34,6 +36,28 @@ def decimalize_4(value: float | Decimal) -> Decimal:
     quantize_val = dec_val.quantize(Decimal('1.0000'))
     return quantize_val
 
+def round_array(values: np.ndarray, places: int = 2) -> np.ndarray:
+    """
+    Rounds an array of floating point numbers to a number of decimal places. Each value is the same as
+    float(Decimal(value).quantize(...)), the same result as the decimalize functions, without creating
+    a Decimal for every value.
+    :param values: the floating point numbers to round
+    :param places: the number of decimal places
+    :return: array of rounded floating point numbers
+    """
+    values = np.asarray(values, dtype=float)
+    scale = 10 ** places
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+    # Values within rounding error of a half can round either way in floating point, so these
+    # are rounded with Decimal, which uses the exact value of the float
+    fraction = np.abs(scaled - np.floor(scaled) - 0.5)
+    ties = np.flatnonzero(fraction < 1e-6)
+    quantize_val = Decimal(1).scaleb(-places)
+    for i in ties:
+        rounded[i] = float(Decimal(float(values[i])).quantize(quantize_val))
+    return rounded
+
 def distinct(iterable: list) -> list:
     """
     Returns a list of distinct items from a given iterable
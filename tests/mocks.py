@@ -3,6 +3,7 @@ import pandas as pd
 from pathlib import Path
 
 from options_framework.data.data_loader import DataLoader
+from options_framework.option_chain import OptionChain
 from options_framework.config import settings
 from pydispatch import Dispatcher
 from test_data.spx_test_options import *
@@ -21,12 +22,11 @@ class MockPortfolio(Dispatcher):
         self.emit('next', quote_datetime)
 
 
-#@dataclass
-class MockSPXOptionChain:
-    quote_datetime: datetime.datetime = datetime.datetime(2016, 3, 1, 9, 31)
-    option_chain: list = t1_options
-    expirations: list = expirations
-    expiration_strikes: dict = expiration_strikes
+class MockSPXOptionChain(OptionChain):
+
+    def __init__(self):
+        super().__init__()
+        self.on_option_chain_loaded(quote_datetime=datetime.datetime(2016, 3, 1, 9, 31), option_chain=t1_options)
 
 class MockSPXDataLoader(DataLoader):
 
@@ -48,8 +48,22 @@ class MockSPXDataLoader(DataLoader):
     def get_expirations(self):
         pass
 
+    def get_quote_datetimes(self):
+        return pd.DatetimeIndex(self.datetimes_list, name='quote_datetime')
+
+    def fetch_option_chain(self, quote_datetime: datetime.datetime):
+        return self.get_option_chain(quote_datetime)
+
     def on_options_opened(self, portfolio, options: list[Option]) -> None:
         for option in options:
             data_file_name = Path(settings.TEST_DATA_DIR, f'option_{option.option_id}.csv')
             cache = pd.read_csv(data_file_name.absolute(), parse_dates=True, index_col='quote_datetime')
             option.update_cache = cache
+
+    def fetch_update_caches(self, options: list[Option], start: datetime.datetime, end: datetime.datetime) -> dict:
+        caches = {}
+        for option in options:
+            data_file_name = Path(settings.TEST_DATA_DIR, f'option_{option.option_id}.csv')
+            caches[option.option_id] = pd.read_csv(data_file_name.absolute(), parse_dates=True,
+                                                   index_col='quote_datetime')
+        return caches
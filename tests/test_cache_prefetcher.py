@@ -0,0 +1,56 @@
+import threading
+
+from options_framework.data.cache_prefetcher import CachePrefetcher
+
+
+def test_cache_prefetcher_fetches_synchronously_when_disabled():
+    fetched = []
+    prefetcher = CachePrefetcher(fetch=lambda key: fetched.append(key) or key * 10)
+
+    prefetcher.prefetch(2)
+    assert fetched == []
+    assert prefetcher.get(1) == 10
+    assert fetched == [1]
+    assert prefetcher.stats.windows_loaded == 1
+    assert prefetcher.stats.prefetch_hits == 0
+    assert prefetcher.stats.waits == 1
+
+
+def test_cache_prefetcher_uses_prefetched_window():
+    prefetcher = CachePrefetcher(fetch=lambda key: key * 10, enabled=True)
+
+    prefetcher.prefetch(2)
+    prefetcher._future.result()
+    assert prefetcher.get_prefetched() == 20
+    assert prefetcher.get(2) == 20
+    assert prefetcher.get_prefetched() is None
+    assert prefetcher.stats.prefetch_hits == 1
+    assert prefetcher.stats.waits == 0
+    prefetcher.shutdown()
+
+
+def test_cache_prefetcher_waits_for_pending_window():
+    release = threading.Event()
+
+    def fetch(key):
+        release.wait(5)
+        return key * 10
+
+    prefetcher = CachePrefetcher(fetch=fetch, enabled=True)
+    prefetcher.prefetch(2)
+    threading.Timer(0.05, release.set).start()
+    assert prefetcher.get(2) == 20
+    assert prefetcher.stats.prefetch_hits == 0
+    assert prefetcher.stats.waits == 1
+    assert prefetcher.stats.wait_seconds > 0
+    prefetcher.shutdown()
+
+
+def test_cache_prefetcher_discards_window_for_other_key():
+    prefetcher = CachePrefetcher(fetch=lambda key: key * 10, enabled=True)
+
+    prefetcher.prefetch(2)
+    assert prefetcher.get(3) == 30
+    assert prefetcher.stats.prefetch_hits == 0
+    assert prefetcher.stats.waits == 1
+    prefetcher.shutdown()
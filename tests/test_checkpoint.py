@@ -0,0 +1,159 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from options_framework.checkpoint import Checkpoint, find_latest_checkpoint, CLOSE_VALUES_FILE
+from options_framework.engine import BacktestEngine
+from options_framework.option_types import SelectFilter
+from options_framework.test_manager import OptionTestManager
+
+pytest.importorskip("pyarrow")
+from options_framework.data.parquet_data_loader import ParquetDataLoader
+from test_parameter_sweep import parquet_dataset, extended_attributes, start_date, end_date
+from test_engine import BuyCallStrategy, RecheckBuyCallStrategy
+
+
+def get_test_manager(dataset_root, **kwargs):
+    data_loader = ParquetDataLoader(start=start_date, end=end_date, select_filter=SelectFilter(symbol='SPXW'),
+                                    extended_option_attributes=extended_attributes, dataset_root=dataset_root)
+    return OptionTestManager(start_datetime=start_date, end_datetime=end_date, select_filter=SelectFilter(symbol='SPXW'),
+                             starting_cash=100_000.0, extended_option_attributes=extended_attributes,
+                             data_loader=data_loader, **kwargs)
+
+
+@pytest.fixture
+def checkpoint_dir(tmp_path_factory):
+    # the dataset is written to tmp_path, so the checkpoints go to another folder
+    return tmp_path_factory.mktemp('checkpoints')
+
+
+class InterruptedStrategy(BuyCallStrategy):
+    def __init__(self, stop_index):
+        super().__init__()
+        self.stop_index = stop_index
+
+    def on_bar(self, bar):
+        super().on_bar(bar)
+        if bar.index == self.stop_index:
+            self.engine.stop()
+
+
+def test_checkpoint_round_trips_portfolio(parquet_dataset, tmp_path):
+    test_manager = get_test_manager(parquet_dataset)
+    test_manager.user_state['entries'] = 1
+    BacktestEngine(test_manager=test_manager, strategy=InterruptedStrategy(stop_index=99)).run()
+    portfolio = test_manager.portfolio
+    position = next(iter(portfolio.positions.values()))
+    option = position.options[0]
+
+    path = Checkpoint.capture(test_manager).save(tmp_path / 'test.ckpt')
+    checkpoint = Checkpoint.load(path)
+
+    assert checkpoint.quote_datetime == start_date + datetime.timedelta(minutes=99)
+    assert checkpoint.cash == portfolio.cash
+    assert checkpoint.close_values == portfolio.close_values
+    assert checkpoint.user_state == {'entries': 1}
+    assert checkpoint.loader_state == {'window_key': start_date.date()}
+    restored_position = checkpoint.positions[0]
+    assert type(restored_position) is type(position)
+    assert restored_position.position_id == position.position_id
+    assert restored_position.option is restored_position.options[0]
+    restored_option = restored_position.option
+    assert restored_option == option
+    for name in ['quote_datetime', 'price', 'delta', 'status', 'quantity', 'trade_open_info', 'position_type']:
+        assert getattr(restored_option, name) == getattr(option, name)
+    assert restored_option.update_cache is None
+    cursor = np.datetime64(option._update_times[option._cursor], 'ns').astype(np.int64)
+    assert checkpoint.leg_cursors == {(position.position_id, 0): cursor}
+
+
+def test_resumed_run_matches_uninterrupted_run(parquet_dataset, checkpoint_dir):
+    expected_manager = get_test_manager(parquet_dataset)
+    expected_strategy = BuyCallStrategy()
+    BacktestEngine(test_manager=expected_manager, strategy=expected_strategy).run()
+
+    interrupted_manager = get_test_manager(parquet_dataset, checkpoint_dir=checkpoint_dir, checkpoint_interval=100)
+    BacktestEngine(test_manager=interrupted_manager, strategy=InterruptedStrategy(stop_index=450)).run()
+    assert len(list(checkpoint_dir.glob('*.ckpt'))) == 2
+    assert find_latest_checkpoint(checkpoint_dir).name == 'checkpoint_20160301_161000.ckpt'
+
+    test_manager = get_test_manager(parquet_dataset, checkpoint_dir=checkpoint_dir, checkpoint_interval=100)
+    checkpoint = test_manager.resume()
+    strategy = BuyCallStrategy()
+    portfolio = BacktestEngine(test_manager=test_manager, strategy=strategy).run()
+
+    # the run continues with the bar after the checkpoint, and the position is not opened again
+    assert strategy.bars[0][2] == checkpoint.quote_datetime + datetime.timedelta(minutes=1)
+    assert strategy.chains == []
+    assert portfolio.close_values == expected_manager.portfolio.close_values
+    assert portfolio.cash == expected_manager.portfolio.cash
+    assert len(strategy.expired) == 1
+    closed_position = next(iter(portfolio.closed_positions.values()))
+    expected_position = next(iter(expected_manager.portfolio.closed_positions.values()))
+    assert closed_position.option.trade_close_info == expected_position.option.trade_close_info
+
+
+def test_resumed_run_skipping_idle_bars(parquet_dataset, checkpoint_dir):
+    class InterruptedRecheckStrategy(RecheckBuyCallStrategy):
+        def on_bar(self, bar):
+            super().on_bar(bar)
+            if len(self.bars) == 20:
+                self.engine.stop()
+
+    expected_strategy = RecheckBuyCallStrategy()
+    expected_portfolio = BacktestEngine(test_manager=get_test_manager(parquet_dataset), strategy=expected_strategy,
+                                        skip_idle_bars=True).run()
+
+    interrupted_manager = get_test_manager(parquet_dataset, checkpoint_dir=checkpoint_dir, checkpoint_interval=5)
+    BacktestEngine(test_manager=interrupted_manager, strategy=InterruptedRecheckStrategy(), skip_idle_bars=True).run()
+
+    test_manager = get_test_manager(parquet_dataset, checkpoint_dir=checkpoint_dir)
+    test_manager.resume()
+    strategy = RecheckBuyCallStrategy()
+    portfolio = BacktestEngine(test_manager=test_manager, strategy=strategy, skip_idle_bars=True).run()
+
+    assert [b[2] for b in strategy.bars] == [b[2] for b in expected_strategy.bars[15:]]
+    assert portfolio.close_values == expected_portfolio.close_values
+    assert portfolio.cash == expected_portfolio.cash
+
+
+def test_checkpoints_append_only_new_close_values(parquet_dataset, checkpoint_dir):
+    test_manager = get_test_manager(parquet_dataset, checkpoint_dir=checkpoint_dir, checkpoint_interval=100)
+    BacktestEngine(test_manager=test_manager, strategy=InterruptedStrategy(stop_index=450)).run()
+
+    checkpoint = Checkpoint.load(find_latest_checkpoint(checkpoint_dir))
+
+    log = checkpoint.close_values_log
+    assert log.path == checkpoint_dir / CLOSE_VALUES_FILE
+    # one chunk of 100 close values for each checkpoint, one after the other in the file
+    assert log.rows == 400
+    assert len(log.chunks) == 4
+    assert all(offset == previous_offset + previous_length
+               for (previous_offset, previous_length), (offset, _) in zip(log.chunks, log.chunks[1:]))
+    assert log.path.stat().st_size == sum(length for _, length in log.chunks)
+    assert checkpoint.close_values == test_manager.portfolio.close_values[:400]
+
+
+def test_resume_without_checkpoint(parquet_dataset, checkpoint_dir):
+    test_manager = get_test_manager(parquet_dataset, checkpoint_dir=checkpoint_dir)
+
+    assert test_manager.resume() is None
+    assert test_manager.resumed_datetime is None
+
+
+def test_new_positions_do_not_reuse_restored_ids(parquet_dataset, checkpoint_dir):
+    test_manager = get_test_manager(parquet_dataset, checkpoint_dir=checkpoint_dir)
+    BacktestEngine(test_manager=test_manager, strategy=InterruptedStrategy(stop_index=10)).run()
+    test_manager.save_checkpoint()
+    position_id = next(iter(test_manager.portfolio.positions))
+
+    resumed_manager = get_test_manager(parquet_dataset, checkpoint_dir=checkpoint_dir)
+    resumed_manager.resume()
+    resumed_manager.get_current_option_chain(start_date + datetime.timedelta(minutes=11))
+    strategy = BuyCallStrategy()
+    strategy.engine = BacktestEngine(test_manager=resumed_manager, strategy=strategy)
+    strategy.on_chain(resumed_manager.option_chain)
+
+    assert len(resumed_manager.portfolio.positions) == 2
+    assert position_id in resumed_manager.portfolio.positions
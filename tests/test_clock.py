@@ -0,0 +1,64 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from options_framework.clock import SkippingClock
+
+quote_datetimes = pd.DatetimeIndex(np.concatenate(
+    [pd.date_range(f'2016-03-0{day} 09:31', periods=390, freq='min') for day in [1, 2, 3]])).as_unit('ns')
+timestamps = quote_datetimes.asi8
+entry_times = [datetime.time(10, 0), datetime.time(14, 0)]
+
+
+def get_index(value: str) -> int:
+    return quote_datetimes.get_loc(pd.Timestamp(value))
+
+
+def test_skipping_clock_jumps_to_entry_times_when_flat():
+    clock = SkippingClock(timestamps=timestamps, entry_times=entry_times)
+
+    assert clock.get_first_index() == get_index('2016-03-01 10:00')
+    assert clock.get_next_index(get_index('2016-03-01 10:00'), positions_open=False) \
+        == get_index('2016-03-01 14:00')
+    assert clock.get_next_index(get_index('2016-03-01 14:00'), positions_open=False) \
+        == get_index('2016-03-02 10:00')
+    assert clock.get_next_index(get_index('2016-03-03 14:00'), positions_open=False) == len(clock)
+
+
+def test_skipping_clock_visits_every_bar_when_positions_are_open():
+    clock = SkippingClock(timestamps=timestamps, entry_times=entry_times)
+    index = get_index('2016-03-01 10:00')
+
+    assert clock.get_next_index(index, positions_open=True) == index + 1
+
+
+def test_skipping_clock_rechecks_open_positions_at_interval():
+    clock = SkippingClock(timestamps=timestamps, entry_times=entry_times, recheck_interval=datetime.timedelta(hours=1))
+
+    assert clock.get_next_index(get_index('2016-03-01 10:00'), positions_open=True) \
+        == get_index('2016-03-01 11:00')
+    # the next entry time comes before the recheck
+    assert clock.get_next_index(get_index('2016-03-01 13:30'), positions_open=True) \
+        == get_index('2016-03-01 14:00')
+    # the recheck after the last bar of the day is the first bar of the next day
+    assert clock.get_next_index(get_index('2016-03-01 15:45'), positions_open=True) \
+        == get_index('2016-03-02 09:31')
+    # the settlement comes before the recheck. The last bar before the settlement is visited first.
+    settlement = datetime.datetime(2016, 3, 1, 14, 15)
+    assert clock.get_next_index(get_index('2016-03-01 14:00'), positions_open=True, next_settlement=settlement) \
+        == get_index('2016-03-01 14:14')
+    assert clock.get_next_index(get_index('2016-03-01 14:14'), positions_open=True, next_settlement=settlement) \
+        == get_index('2016-03-01 14:15')
+
+
+def test_skipping_clock_stops_when_price_leaves_bounds():
+    prices = np.full(len(timestamps), 100.0)
+    prices[get_index('2016-03-01 10:20')] = 90.0
+    clock = SkippingClock(timestamps=timestamps, entry_times=entry_times, prices=prices,
+                          recheck_interval=datetime.timedelta(hours=1))
+
+    assert clock.get_next_index(get_index('2016-03-01 10:00'), positions_open=True, price_bounds=(95, 105)) \
+        == get_index('2016-03-01 10:20')
+    assert clock.get_next_index(get_index('2016-03-01 10:20'), positions_open=True, price_bounds=(95, 105)) \
+        == get_index('2016-03-01 11:20')
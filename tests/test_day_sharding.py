@@ -0,0 +1,111 @@
+import datetime
+import functools
+
+import pandas as pd
+import pytest
+
+from options_framework.day_sharding import DayShardedRun
+from options_framework.engine import BacktestEngine, Strategy
+from options_framework.option_types import OptionType, SelectFilter, OptionPositionType
+from options_framework.spreads.single import Single
+
+pytest.importorskip("pyarrow")
+from options_framework.data.parquet_data_loader import ParquetDataLoader
+from test_parameter_sweep import parquet_dataset, extended_attributes, start_date, end_date
+from test_engine import BuyCallStrategy, get_test_manager
+
+
+class DayTradeStrategy(Strategy):
+    """
+    Buys a call at the first bar of each day and sells it an hour later
+    """
+    def __init__(self):
+        self.position = None
+        self.open_index = None
+
+    def on_bar(self, bar):
+        if bar.new_day:
+            self.engine.load_option_chain()
+        elif self.position is not None and bar.index - self.open_index == 60:
+            self.engine.portfolio.close_position(self.position)
+            self.position = None
+
+    def on_chain(self, option_chain):
+        self.position = Single.get_single(option_chain=option_chain, expiration=datetime.date(2016, 3, 2),
+                                          option_type=OptionType.CALL, option_position_type=OptionPositionType.LONG,
+                                          strike=1940)
+        self.engine.portfolio.open_position(self.position, quantity=1)
+        self.open_index = self.engine.bar.index
+
+
+def run_day_trades(test_manager):
+    BacktestEngine(test_manager=test_manager, strategy=DayTradeStrategy()).run()
+
+
+def run_overnight_trade(test_manager):
+    BacktestEngine(test_manager=test_manager, strategy=BuyCallStrategy()).run()
+
+
+def units_per_50k(cash):
+    return int(cash // 50_000)
+
+
+def get_sharded_run(dataset_root, run_test=run_day_trades, **kwargs):
+    return DayShardedRun(run_test=run_test, start_datetime=start_date, end_datetime=end_date,
+                         select_filter=SelectFilter(symbol='SPXW'), starting_cash=100_000.0,
+                         extended_option_attributes=extended_attributes,
+                         data_loader_factory=functools.partial(ParquetDataLoader, dataset_root=dataset_root), **kwargs)
+
+
+def test_day_shards_match_sequential_run(parquet_dataset):
+    test_manager = get_test_manager(parquet_dataset)
+    run_day_trades(test_manager)
+    portfolio = test_manager.portfolio
+
+    results = get_sharded_run(parquet_dataset, processes=1).run()
+
+    assert list(results.shards['first_date']) == [datetime.date(2016, 3, 1), datetime.date(2016, 3, 2)]
+    assert list(results.shards['trades']) == [1, 1]
+    assert results.ending_value == portfolio.portfolio_value
+    expected_curve = pd.Series([v[1] for v in portfolio.close_values], index=[v[0] for v in portfolio.close_values])
+    assert list(results.equity_curve.index) == list(expected_curve.index)
+    assert results.equity_curve.to_numpy() == pytest.approx(expected_curve.to_numpy())
+    expected_profit_loss = [float(p.get_profit_loss()) for p in portfolio.closed_positions.values()]
+    assert list(results.trades['profit_loss']) == pytest.approx(expected_profit_loss)
+    assert list(results.trades['trade_number']) == [0, 1]
+
+
+def test_day_shards_chain_position_sizing(parquet_dataset):
+    unit_results = get_sharded_run(parquet_dataset, processes=1).run()
+
+    results = get_sharded_run(parquet_dataset, processes=1, position_sizer=units_per_50k).run()
+
+    first_units = 2
+    second_units = units_per_50k(100_000.0 + unit_results.shards.loc[0, 'profit_loss'] * first_units)
+    assert list(results.shards['units']) == [first_units, second_units]
+    assert results.shards.loc[1, 'starting_cash'] == results.shards.loc[0, 'ending_cash']
+    assert list(results.trades['quantity']) == [first_units, second_units]
+    assert list(results.shards['profit_loss']) == pytest.approx(
+        [unit_results.shards.loc[0, 'profit_loss'] * first_units,
+         unit_results.shards.loc[1, 'profit_loss'] * second_units])
+
+
+def test_day_shards_do_not_depend_on_processes(parquet_dataset):
+    expected_results = get_sharded_run(parquet_dataset, processes=1, position_sizer=units_per_50k).run()
+
+    results = get_sharded_run(parquet_dataset, processes=2, position_sizer=units_per_50k).run()
+
+    pd.testing.assert_frame_equal(results.shards, expected_results.shards)
+    pd.testing.assert_frame_equal(results.trades, expected_results.trades)
+    pd.testing.assert_series_equal(results.equity_curve, expected_results.equity_curve)
+
+
+def test_day_shards_reject_overnight_positions(parquet_dataset):
+    with pytest.raises(ValueError, match='still open'):
+        get_sharded_run(parquet_dataset, run_test=run_overnight_trade, processes=1).run()
+
+
+def test_day_shards_group_days(parquet_dataset):
+    sharded_run = get_sharded_run(parquet_dataset, days_per_shard=2)
+
+    assert sharded_run.get_shards() == [(0, start_date, end_date)]
@@ -0,0 +1,155 @@
+import datetime
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from options_framework.engine import BacktestEngine, Strategy
+from options_framework.option_types import OptionType, SelectFilter, OptionPositionType
+from options_framework.spreads.single import Single
+from options_framework.test_manager import OptionTestManager
+
+pytest.importorskip("pyarrow")
+from options_framework.data.parquet_data_loader import ParquetDataLoader
+from test_parameter_sweep import parquet_dataset, extended_attributes, start_date, end_date
+
+
+class BuyCallStrategy(Strategy):
+    def __init__(self):
+        self.bars = []
+        self.chains = []
+        self.expired = []
+
+    def on_bar(self, bar):
+        self.bars.append((bar.index, bar.timestamp, bar.quote_datetime, bar.new_day, bar.close))
+        if bar.index == 0:
+            self.engine.load_option_chain()
+
+    def on_chain(self, option_chain):
+        self.chains.append(option_chain.quote_datetime)
+        single = Single.get_single(option_chain=option_chain, expiration=datetime.date(2016, 3, 2),
+                                   option_type=OptionType.CALL, option_position_type=OptionPositionType.LONG,
+                                   strike=1940)
+        self.engine.portfolio.open_position(single, quantity=1)
+
+    def on_expiry(self, position):
+        self.expired.append(position)
+
+
+def get_test_manager(dataset_root):
+    data_loader = ParquetDataLoader(start=start_date, end=end_date, select_filter=SelectFilter(symbol='SPXW'),
+                                    extended_option_attributes=extended_attributes, dataset_root=dataset_root)
+    return OptionTestManager(start_datetime=start_date, end_datetime=end_date, select_filter=SelectFilter(symbol='SPXW'),
+                             starting_cash=100_000.0, extended_option_attributes=extended_attributes,
+                             data_loader=data_loader)
+
+
+def test_engine_runs_strategy_callbacks(parquet_dataset):
+    test_manager = get_test_manager(parquet_dataset)
+    strategy = BuyCallStrategy()
+    engine = BacktestEngine(test_manager=test_manager, strategy=strategy)
+
+    portfolio = engine.run()
+
+    quote_datetimes = test_manager.data_loader.get_quote_datetimes()
+    assert engine.clock.dtype == np.int64
+    assert [b[2] for b in strategy.bars] == list(quote_datetimes.to_pydatetime())
+    assert [b[1] for b in strategy.bars] == list(quote_datetimes.as_unit('ns').asi8)
+    assert [b[2].date() for b in strategy.bars if b[3]] == [datetime.date(2016, 3, 1), datetime.date(2016, 3, 2)]
+    assert strategy.chains == [start_date]
+    assert len(strategy.expired) == 1
+    assert len(portfolio.positions) == 0
+
+
+def test_engine_matches_manual_loop(parquet_dataset):
+    engine = BacktestEngine(test_manager=get_test_manager(parquet_dataset), strategy=BuyCallStrategy())
+    engine.run()
+
+    test_manager = get_test_manager(parquet_dataset)
+    quote_datetimes = test_manager.data_loader.get_quote_datetimes().to_pydatetime()
+    for i, quote_datetime in enumerate(quote_datetimes):
+        test_manager.portfolio.next(quote_datetime)
+        if i == 0:
+            test_manager.get_current_option_chain(quote_datetime)
+            single = Single.get_single(option_chain=test_manager.option_chain, expiration=datetime.date(2016, 3, 2),
+                                       option_type=OptionType.CALL, option_position_type=OptionPositionType.LONG,
+                                       strike=1940)
+            test_manager.portfolio.open_position(single, quantity=1)
+
+    assert engine.portfolio.close_values == test_manager.portfolio.close_values
+    assert engine.portfolio.cash == test_manager.portfolio.cash
+
+
+def test_engine_uses_price_data_clock(parquet_dataset):
+    quote_datetimes = pd.date_range(start_date, periods=30, freq='min')
+    price_data = pd.DataFrame({'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': np.arange(30, dtype=float)},
+                              index=quote_datetimes)
+    strategy = BuyCallStrategy()
+    engine = BacktestEngine(test_manager=get_test_manager(parquet_dataset), strategy=strategy,
+                            price_data=price_data)
+
+    engine.run()
+
+    assert [b[4] for b in strategy.bars] == list(range(30))
+    assert engine.bar.high == 2.0
+
+
+def test_engine_stops_early(parquet_dataset):
+    class StopStrategy(Strategy):
+        def on_bar(self, bar):
+            if bar.index == 9:
+                self.engine.stop()
+
+    engine = BacktestEngine(test_manager=get_test_manager(parquet_dataset), strategy=StopStrategy())
+    portfolio = engine.run()
+
+    assert len(portfolio.close_values) == 10
+
+
+class RecheckBuyCallStrategy(BuyCallStrategy):
+    entry_times = [datetime.time(9, 31)]
+    recheck_interval = datetime.timedelta(minutes=30)
+
+
+def test_engine_skips_idle_bars(parquet_dataset):
+    test_manager = get_test_manager(parquet_dataset)
+    strategy = RecheckBuyCallStrategy()
+    engine = BacktestEngine(test_manager=test_manager, strategy=strategy, skip_idle_bars=True)
+
+    portfolio = engine.run()
+
+    day_1 = [start_date + datetime.timedelta(minutes=30 * i) for i in range(14)]
+    day_2 = [d + datetime.timedelta(days=1) for d in day_1] \
+        + [datetime.datetime(2016, 3, 2, 16, 14), datetime.datetime(2016, 3, 2, 16, 15)]
+    assert [b[2] for b in strategy.bars] == day_1 + day_2
+    assert [b[2] for b in strategy.bars if b[3]] == [day_1[0], day_2[0]]
+    assert len(strategy.expired) == 1
+    # the option chain was fetched for the bar it was needed, without loading a cache window
+    assert test_manager.data_loader.load_visited_only
+    assert test_manager.data_loader.data_cache is None
+
+    expected_engine = BacktestEngine(test_manager=get_test_manager(parquet_dataset), strategy=BuyCallStrategy())
+    expected_portfolio = expected_engine.run()
+    assert portfolio.cash == expected_portfolio.cash
+
+
+def test_engine_skips_idle_bars_within_price_bounds(parquet_dataset):
+    class BoundsStrategy(BuyCallStrategy):
+        entry_times = [datetime.time(9, 31)]
+
+        def get_price_bounds(self):
+            return 5.0, 20.0
+
+    quote_datetimes = pd.date_range(start_date, periods=60, freq='min')
+    closes = np.full(60, 10.0)
+    closes[[25, 40]] = 30.0
+    price_data = pd.DataFrame({'close': closes}, index=quote_datetimes)
+    strategy = BoundsStrategy()
+    engine = BacktestEngine(test_manager=get_test_manager(parquet_dataset), strategy=strategy,
+                            price_data=price_data, skip_idle_bars=True)
+
+    engine.run()
+
+    # the last bar is the last bar before the settlement of the option
+    assert [b[0] for b in strategy.bars] == [0, 25, 40, 59]
@@ -0,0 +1,38 @@
+import datetime
+
+from options_framework.expiration_calendar import ExpirationCalendar, get_settlement_datetime
+
+first_expiration = get_settlement_datetime(datetime.date(2016, 3, 2))
+second_expiration = get_settlement_datetime(datetime.date(2016, 3, 4))
+
+
+def test_settlement_is_at_end_of_expiration_date():
+    assert first_expiration == datetime.datetime(2016, 3, 2, 16, 15)
+
+
+def test_calendar_pops_due_buckets_in_order():
+    calendar = ExpirationCalendar()
+    calendar.add(0, second_expiration)
+    calendar.add(1, first_expiration)
+    calendar.add(2, first_expiration)
+
+    assert calendar.next_settlement == first_expiration
+    assert calendar.pop_due(datetime.datetime(2016, 3, 2, 16, 14)) == []
+    assert calendar.pop_due(first_expiration) == [1, 2]
+    assert calendar.next_settlement == second_expiration
+    assert calendar.pop_due(datetime.datetime(2016, 3, 7, 9, 31)) == [0]
+    assert calendar.next_settlement is None
+    assert len(calendar) == 0
+
+
+def test_calendar_remove_moves_next_settlement():
+    calendar = ExpirationCalendar()
+    calendar.add(0, first_expiration)
+    calendar.add(1, second_expiration)
+
+    calendar.remove(0)
+
+    assert calendar.next_settlement == second_expiration
+    assert calendar.get_settlement(0) is None
+    calendar.add(2, first_expiration)
+    assert calendar.pop_due(second_expiration) == [2, 1]
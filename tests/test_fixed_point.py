@@ -0,0 +1,72 @@
+import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from options_framework.config import settings
+from options_framework.option import Option
+from options_framework.option_types import NumericMode, OptionType
+from options_framework.utils.fixed_point import (cents_array, get_numeric_mode, set_numeric_mode, to_cents,
+                                                 to_quantity)
+from options_framework.utils.helpers import decimalize_0, decimalize_2
+
+
+@pytest.fixture
+def incur_fees_true():
+    original_setting = settings.INCUR_FEES
+    settings.INCUR_FEES = True
+    yield
+    settings.INCUR_FEES = original_setting
+
+
+@pytest.fixture
+def restore_numeric_mode():
+    original_mode = get_numeric_mode()
+    yield
+    set_numeric_mode(original_mode)
+
+
+def get_values() -> np.ndarray:
+    rng = np.random.default_rng(11)
+    values = np.concatenate([rng.uniform(0, 50, 50_000).round(3), rng.uniform(-1_000, 100_000, 50_000),
+                             np.arange(0, 10, 0.005), [0.125, 2.675, 1.005, 0.015, -0.125, 1e9 + 0.005]])
+    return values
+
+
+def test_to_cents_matches_decimalize_2():
+    for value in get_values().tolist():
+        assert to_cents(value) == int(decimalize_2(value) * 100)
+    assert to_cents(Decimal('1.005')) == int(decimalize_2(Decimal('1.005')) * 100)
+    assert to_cents(3) == 300
+
+
+def test_cents_array_matches_to_cents():
+    values = get_values()[:-1]
+    assert cents_array(values).tolist() == [to_cents(value) for value in values.tolist()]
+
+
+def test_to_quantity_matches_decimalize_0():
+    for value in [1, -3, 2.5, 3.5, -2.5, 7.49]:
+        assert to_quantity(value) == int(decimalize_0(value))
+
+
+def test_option_values_are_the_same_in_cents_mode(incur_fees_true, restore_numeric_mode):
+    quote_datetime = datetime.datetime(2016, 3, 1, 9, 31)
+    results = {}
+    for mode in NumericMode:
+        set_numeric_mode(mode)
+        rng = np.random.default_rng(7)
+        values = []
+        for open_price, price, quantity in zip(rng.uniform(0.05, 40, 200).round(3), rng.uniform(0.05, 40, 200),
+                                               rng.integers(1, 20, 200) * rng.choice([-1, 1], 200)):
+            option = Option(option_id=1, symbol='SPXW', strike=1950, expiration=datetime.date(2016, 3, 4),
+                            option_type=OptionType.CALL, quote_datetime=quote_datetime, spot_price=1950.0,
+                            bid=open_price, ask=open_price, price=open_price)
+            trade_open_info = option.open_trade(quantity=int(quantity))
+            option.price = price
+            values.append((trade_open_info, option.total_fees, option.current_value, option.trade_value,
+                           option.get_unrealized_profit_loss()))
+        results[mode] = values
+
+    assert results[NumericMode.CENTS] == results[NumericMode.DECIMAL]
@@ -0,0 +1,93 @@
+import json
+import tracemalloc
+
+import pytest
+
+from options_framework.config import settings
+from options_framework.engine import BacktestEngine
+from options_framework.memory_report import HOLDERS, MemoryMonitor, get_size
+
+pytest.importorskip("pyarrow")
+from test_parameter_sweep import parquet_dataset
+from test_engine import BuyCallStrategy, get_test_manager
+from test_checkpoint import InterruptedStrategy
+
+
+@pytest.fixture
+def memory_settings():
+    settings.MEMORY_SAMPLE_INTERVAL = 100
+    settings.MEMORY_TRACE_ALLOCATIONS = True
+
+    yield
+    settings.MEMORY_SAMPLE_INTERVAL = None
+    settings.MEMORY_TRACE_ALLOCATIONS = False
+
+
+def test_memory_report_attributes_holders(parquet_dataset):
+    test_manager = get_test_manager(parquet_dataset)
+    BacktestEngine(test_manager=test_manager, strategy=InterruptedStrategy(stop_index=99)).run()
+    option = next(iter(test_manager.portfolio.positions.values())).options[0]
+
+    report = test_manager.get_memory_report()
+
+    assert list(report) == HOLDERS + ['total']
+    assert report['data_cache'] == test_manager.data_loader.data_cache.memory_usage(deep=True).sum()
+    assert report['update_caches'] == option.update_cache.memory_usage(deep=True).sum()
+    assert report['close_values'] > 100 * 8
+    assert report['open_positions'] > 0
+    assert report['closed_positions'] < 100
+    assert report['option_chain'] > 0
+    assert report['total'] == sum(report[holder] for holder in HOLDERS)
+
+
+def test_memory_monitor_samples_run(parquet_dataset, memory_settings):
+    test_manager = get_test_manager(parquet_dataset)
+    monitor = test_manager.memory_monitor
+    BacktestEngine(test_manager=test_manager, strategy=BuyCallStrategy()).run()
+
+    samples = monitor.get_samples()
+    assert len(samples) == len(test_manager.portfolio.close_values) // 100
+    assert samples['quote_datetime'].iloc[0] == test_manager.portfolio.close_values[99][0]
+    assert monitor.high_water_marks['update_caches'] == samples['update_caches'].max()
+    assert monitor.high_water_marks['total'] >= samples['total'].max()
+    summary = monitor.get_summary(top=3)
+    assert len(summary) == 3
+    assert list(summary['high_water_bytes']) == sorted(summary['high_water_bytes'], reverse=True)
+    assert set(monitor.snapshots) == {'start', 'end'}
+    assert all(isinstance(line, str) for line in monitor.get_snapshot_diff('start', 'end', limit=5))
+    assert not tracemalloc.is_tracing()
+
+
+def test_run_writes_memory_output(parquet_dataset, memory_settings, tmp_path):
+    settings.MEMORY_OUTPUT = str(tmp_path / 'memory.json')
+    settings.MEMORY_SUMMARY_TOP = 3
+    try:
+        test_manager = get_test_manager(parquet_dataset)
+        BacktestEngine(test_manager=test_manager, strategy=BuyCallStrategy()).run()
+    finally:
+        settings.MEMORY_OUTPUT = None
+        settings.MEMORY_SUMMARY_TOP = None
+
+    with open(tmp_path / 'memory.json') as f:
+        output = json.load(f)
+    assert [list(row) for row in output['holders']] == [['holder', 'bytes', 'high_water_bytes']] * 3
+    assert output['holders'][0]['high_water_bytes'] >= output['holders'][-1]['high_water_bytes']
+    assert len(output['allocation_changes']) > 0
+
+
+def test_get_size_counts_shared_objects_once():
+    values = list(range(1000, 1100))
+    holder = {'first': values, 'second': values}
+
+    assert get_size(holder) < 2 * get_size(values)
+    seen = set()
+    first = get_size(values, seen)
+    assert get_size(values, seen) == 0
+    assert first > 0
+
+
+def test_monitor_is_not_created_without_settings(parquet_dataset):
+    test_manager = get_test_manager(parquet_dataset)
+
+    assert test_manager.memory_monitor is None
+    assert isinstance(MemoryMonitor(test_manager).get_report()['total'], int)
@@ -174,6 +174,45 @@ def test_update_sets_correct_values(option_id, test_expiration, test_quote_date,
     assert test_option.implied_volatility == updates[0]['implied_volatility']
 
 
+def test_update_uses_last_quote_when_quote_datetime_is_missing(get_test_call_option,
+                                                                get_test_call_option_update_values_1,
+                                                                get_test_call_option_update_values_2):
+    test_option = get_test_call_option
+    quote_date_1, spot_price_1, bid_1, ask_1, price_1 = get_test_call_option_update_values_1
+    test_option.update_cache = create_update_cache([get_test_call_option_update_values_1,
+                                                    get_test_call_option_update_values_2])
+
+    # no quote for this minute, so the values from the quote before it are used
+    missing_quote_date = quote_date_1 + datetime.timedelta(minutes=1)
+    test_option.next_update(missing_quote_date)
+
+    assert test_option.quote_datetime == missing_quote_date
+    assert test_option.spot_price == spot_price_1
+    assert test_option.bid == bid_1
+    assert test_option.ask == ask_1
+    assert test_option.price == price_1
+
+
+def test_update_skips_quotes_and_reloads_replaced_cache(get_test_call_option, get_test_call_option_update_values_1,
+                                                        get_test_call_option_update_values_2,
+                                                        get_test_call_option_update_values_3):
+    test_option = get_test_call_option
+    test_option.update_cache = create_update_cache([get_test_call_option_update_values_1,
+                                                    get_test_call_option_update_values_2,
+                                                    get_test_call_option_update_values_3])
+
+    test_option.next_update(get_test_call_option_update_values_3[0])
+    assert test_option.price == get_test_call_option_update_values_3[4]
+
+    test_option.next_update(get_test_call_option_update_values_1[0])
+    assert test_option.price == get_test_call_option_update_values_1[4]
+
+    quote_date, spot_price, bid, ask, _ = get_test_call_option_update_values_2
+    test_option.update_cache = create_update_cache([[quote_date, spot_price, bid, ask, 4.444]])
+    test_option.next_update(quote_date)
+    assert test_option.price == 4.44
+
+
 def test_update_sets_expiration_status_if_quote_date_is_greater_than_expiration(get_test_put_option):
     bad_quote_date = datetime.datetime.strptime("2021-07-17 09:45:00.000000", "%Y-%m-%d %H:%M:%S.%f")
     test_option = get_test_put_option
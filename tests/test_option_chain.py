@@ -1,5 +1,6 @@
 import datetime
 
+import pandas as pd
 import pytest
 
 from options_framework.option_chain import OptionChain
@@ -28,3 +29,97 @@ def test_load_option_chain_from_db(db_data_loader):
 
     assert len(option_chain.option_chain) == 2403
 
+
+@pytest.fixture
+def spx_chain_data_frame():
+    from test_data.spx_test_options import t1_options
+    rows = [{'option_id': o.option_id, 'symbol': o.symbol, 'expiration': pd.Timestamp(o.expiration),
+             'strike': o.strike, 'option_type': o.option_type.value, 'spot_price': o.spot_price, 'bid': o.bid,
+             'ask': o.ask, 'price': o.price, 'delta': o.delta} for o in t1_options]
+    return pd.DataFrame(rows)
+
+def test_option_chain_loads_arrays_from_data_frame(spx_chain_data_frame):
+    quote_datetime = datetime.datetime(2016, 3, 1, 9, 31)
+    option_chain = OptionChain()
+    option_chain.on_option_chain_loaded(quote_datetime=quote_datetime, option_chain=spx_chain_data_frame)
+
+    assert len(option_chain) == len(spx_chain_data_frame)
+    assert option_chain.expirations == [datetime.date(2016, 3, 2), datetime.date(2016, 3, 4)]
+    assert option_chain.expiration_strikes[datetime.date(2016, 3, 2)][0] == 1900.0
+    assert list(option_chain.extended_attributes.keys()) == ['delta']
+    # no options are created until they are requested
+    assert len(option_chain._options) == 0
+
+def test_option_chain_creates_requested_options_only(spx_chain_data_frame):
+    quote_datetime = datetime.datetime(2016, 3, 1, 9, 31)
+    option_chain = OptionChain()
+    option_chain.on_option_chain_loaded(quote_datetime=quote_datetime, option_chain=spx_chain_data_frame)
+
+    option = option_chain.get_option_by_id(395674)
+    assert option.option_type == OptionType.PUT
+    assert option.expiration == datetime.date(2016, 3, 2)
+    assert option.strike == 1900.0
+    assert option.quote_datetime == quote_datetime
+    assert option.delta == -0.0473
+    assert option.gamma is None
+    assert len(option_chain._options) == 1
+    assert option_chain.get_option_by_id(395674) is option
+
+def test_option_chain_get_option_by_delta(spx_chain_data_frame):
+    quote_datetime = datetime.datetime(2016, 3, 1, 9, 31)
+    option_chain = OptionChain()
+    option_chain.on_option_chain_loaded(quote_datetime=quote_datetime, option_chain=spx_chain_data_frame)
+    expiration = datetime.date(2016, 3, 2)
+
+    call = option_chain.get_option_by_delta(expiration=expiration, option_type=OptionType.CALL, delta=0.30)
+    put = option_chain.get_option_by_delta(expiration=expiration, option_type=OptionType.PUT, delta=-0.30)
+    call_deltas = [o.delta for o in option_chain.option_chain
+                   if o.option_type == OptionType.CALL and o.expiration == expiration and o.delta <= 0.30]
+    put_deltas = [o.delta for o in option_chain.option_chain
+                  if o.option_type == OptionType.PUT and o.expiration == expiration and o.delta >= -0.30]
+
+    assert call.delta == max(call_deltas)
+    assert put.delta == min(put_deltas)
+
+def test_option_chain_indexes_match_chain_scans(spx_chain_data_frame):
+    quote_datetime = datetime.datetime(2016, 3, 1, 9, 31)
+    option_chain = OptionChain()
+    shuffled = spx_chain_data_frame.sample(frac=1, random_state=3).reset_index(drop=True)
+    option_chain.on_option_chain_loaded(quote_datetime=quote_datetime, option_chain=shuffled)
+    options = option_chain.option_chain
+
+    assert option_chain.expirations == sorted({o.expiration for o in options})
+    for expiration in option_chain.expirations:
+        strikes = sorted({o.strike for o in options if o.expiration == expiration})
+        assert option_chain.expiration_strikes[expiration] == strikes
+        for target in [strikes[0] - 5, strikes[0], strikes[len(strikes) // 2] + 0.5, strikes[-1], strikes[-1] + 5]:
+            above = [s for s in strikes if s >= target]
+            below = [s for s in strikes if s <= target]
+            assert option_chain.get_strike_at_or_above(expiration=expiration, strike=target) == \
+                   (above[0] if above else None)
+            assert option_chain.get_strike_at_or_below(expiration=expiration, strike=target) == \
+                   (below[-1] if below else None)
+
+        for option_type in OptionType:
+            leg_options = [o for o in options if o.expiration == expiration and o.option_type == option_type]
+            indexes = option_chain.get_indexes_by_strike(expiration=expiration, option_type=option_type)
+            assert [option_chain.get_option(i) for i in indexes] == sorted(leg_options, key=lambda o: o.strike)
+            for option in leg_options:
+                assert option_chain.get_option_by_id(option.option_id) is option
+                assert option_chain.get_option_by_strike(expiration=expiration, option_type=option_type,
+                                                         strike=option.strike) is option
+            for delta in [-0.9, -0.5, -0.3, -0.05, 0.05, 0.3, 0.5, 0.9]:
+                if option_type == OptionType.CALL:
+                    matches = [o for o in leg_options if o.delta <= delta]
+                    expected = max(matches, key=lambda o: o.delta) if matches else None
+                else:
+                    matches = [o for o in leg_options if o.delta >= delta]
+                    expected = min(matches, key=lambda o: o.delta) if matches else None
+                option = option_chain.get_option_by_delta(expiration=expiration, option_type=option_type, delta=delta)
+                assert option is expected
+
+    assert option_chain.get_expiration(datetime.date(2016, 3, 3)) == datetime.date(2016, 3, 4)
+    assert option_chain.get_expiration(datetime.date(2016, 3, 5)) is None
+    assert option_chain.get_option_by_id(-1) is None
+    assert option_chain.get_option_by_strike(expiration=datetime.date(2016, 3, 2), option_type=OptionType.CALL,
+                                             strike=1900.5) is None
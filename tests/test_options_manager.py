@@ -35,12 +35,12 @@ def test_manager_portfolio_open_triggers_option_updates_load():
                                option_position_type= OptionPositionType.LONG, strike=1910)
     assert single.option.update_cache is None
     portfolio.open_position(option_position=single, quantity=1)
-    assert len(single.option.update_cache) > 0
     assert single.option.quote_datetime == start_date
     next_quote = datetime.datetime(2016, 3, 1, 9, 32)
 
-    # advance to the next quote
+    # advance to the next quote. The update caches for the options opened in the last bar are loaded first
     portfolio.next(next_quote)
+    assert len(single.option.update_cache) > 0
     assert single.option.quote_datetime == next_quote
 
 
@@ -0,0 +1,99 @@
+import datetime
+import functools
+import os
+
+import pandas as pd
+import pytest
+
+from options_framework.config import settings
+from options_framework.option_types import OptionType, SelectFilter, OptionPositionType
+from options_framework.parameter_sweep import ParameterSweep
+from options_framework.spreads.single import Single
+from test_data.spx_test_options import t1_options, t2_options
+
+pytest.importorskip("pyarrow")
+from options_framework.data.parquet_data_loader import ParquetDataLoader, write_parquet_dataset
+
+extended_attributes = ['delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest', 'implied_volatility']
+option_fields = ['quote_datetime', 'option_id', 'symbol', 'strike', 'expiration', 'option_type', 'spot_price',
+                 'bid', 'ask', 'price'] + extended_attributes
+start_date = datetime.datetime(2016, 3, 1, 9, 31)
+end_date = datetime.datetime(2016, 3, 2, 16, 15)
+
+
+@pytest.fixture
+def parquet_dataset(tmp_path):
+    original_value = settings.DATA_FORMAT_SETTINGS
+    settings.DATA_FORMAT_SETTINGS = 'parquet_settings.toml'
+
+    chain_quotes = pd.DataFrame([{f: getattr(o, f) for f in option_fields} for o in t1_options + t2_options])
+    chain_quotes['option_type'] = [o.option_type.value for o in t1_options + t2_options]
+    update_quotes = [pd.read_csv(os.path.join(settings.TEST_DATA_DIR, f'option_{option_id}.csv'))
+                     for option_id in [353522, 391447, 422794]]
+    update_quotes = pd.concat(update_quotes)
+    update_quotes['quote_datetime'] = pd.to_datetime(update_quotes['quote_datetime'])
+    update_quotes = update_quotes[update_quotes['quote_datetime'] > datetime.datetime(2016, 3, 1, 9, 32)]
+    write_parquet_dataset(pd.concat([chain_quotes, update_quotes]), tmp_path)
+
+    yield tmp_path
+    settings.DATA_FORMAT_SETTINGS = original_value
+
+
+def buy_call(test_manager, strike, hold_minutes):
+    test_manager.get_current_option_chain(start_date)
+    portfolio = test_manager.portfolio
+    single = Single.get_single(option_chain=test_manager.option_chain, expiration=datetime.date(2016, 3, 2),
+                               option_type=OptionType.CALL, option_position_type=OptionPositionType.LONG,
+                               strike=strike)
+    portfolio.open_position(single, quantity=1)
+    for quote_datetime in pd.date_range(start_date, periods=hold_minutes + 1, freq='min')[1:]:
+        portfolio.next(quote_datetime.to_pydatetime())
+    portfolio.close_position(single)
+
+
+def get_sweep(dataset_root, processes):
+    return ParameterSweep(run_test=buy_call, parameter_grid={'strike': [1940, 1970], 'hold_minutes': [30, 120]},
+                          start_datetime=start_date, end_datetime=end_date, select_filter=SelectFilter(symbol='SPXW'),
+                          starting_cash=100_000.0, extended_option_attributes=extended_attributes,
+                          processes=processes,
+                          data_loader_factory=functools.partial(ParquetDataLoader, dataset_root=dataset_root))
+
+
+def test_parameter_sweep_collects_results_in_run_order(parquet_dataset):
+    results = get_sweep(parquet_dataset, processes=1).run()
+
+    assert list(results.runs['run_id']) == [0, 1, 2, 3]
+    assert list(results.runs['strike']) == [1940, 1940, 1970, 1970]
+    assert list(results.runs['hold_minutes']) == [30, 120, 30, 120]
+    assert list(results.equity_curves.groupby('run_id').size()) == [30, 120, 30, 120]
+    assert list(results.trades['run_id']) == [0, 1, 2, 3]
+    assert list(results.trades['trade_number']) == [0, 0, 0, 0]
+    trades = results.get_trades(1)
+    assert trades.loc[0, 'close_datetime'] == start_date + datetime.timedelta(minutes=120)
+    assert list(results.runs['profit_loss']) == pytest.approx(list(results.trades['profit_loss']))
+    equity_curve = results.get_equity_curve(3)
+    assert equity_curve.index[-1] == start_date + datetime.timedelta(minutes=120)
+
+
+def test_parameter_sweep_loads_data_once_per_worker(parquet_dataset, monkeypatch):
+    fetches = []
+    fetch_cache = ParquetDataLoader._fetch_cache
+    fetch_update_caches = ParquetDataLoader.fetch_update_caches
+    monkeypatch.setattr(ParquetDataLoader, '_fetch_cache',
+                        lambda self, *args: fetches.append('chain') or fetch_cache(self, *args))
+    monkeypatch.setattr(ParquetDataLoader, 'fetch_update_caches',
+                        lambda self, *args: fetches.append('update') or fetch_update_caches(self, *args))
+
+    get_sweep(parquet_dataset, processes=1).run()
+
+    # one option chain window, and one update cache for each of the two strikes
+    assert fetches == ['chain', 'update', 'update']
+
+
+def test_parameter_sweep_results_do_not_depend_on_processes(parquet_dataset):
+    serial_results = get_sweep(parquet_dataset, processes=1).run()
+    parallel_results = get_sweep(parquet_dataset, processes=2).run()
+
+    pd.testing.assert_frame_equal(serial_results.runs, parallel_results.runs)
+    pd.testing.assert_frame_equal(serial_results.equity_curves, parallel_results.equity_curves)
+    pd.testing.assert_frame_equal(serial_results.trades, parallel_results.trades)
@@ -0,0 +1,221 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+from options_framework.config import settings
+from options_framework.option_chain import OptionChain
+from options_framework.option_types import OptionType, SelectFilter, FilterRange
+from test_data.spx_test_options import t1_options, t2_options
+
+pytest.importorskip("pyarrow")
+from options_framework.data.parquet_data_loader import ParquetDataLoader, write_parquet_dataset
+from options_framework.data.synthetic_data_loader import SyntheticDataLoader, SyntheticMarket
+
+extended_attributes = ['delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest', 'implied_volatility']
+option_fields = ['quote_datetime', 'option_id', 'symbol', 'strike', 'expiration', 'option_type', 'spot_price',
+                 'bid', 'ask', 'price'] + extended_attributes
+
+
+@pytest.fixture
+def parquet_dataset(tmp_path):
+    original_value_1 = settings.DATA_FORMAT_SETTINGS
+    original_value_2 = settings.DATA_LOADER_TYPE
+    settings.DATA_FORMAT_SETTINGS = 'parquet_settings.toml'
+    settings.DATA_LOADER_TYPE = 'PARQUET_DATA_LOADER'
+
+    chain_quotes = pd.DataFrame([{f: getattr(o, f) for f in option_fields} for o in t1_options + t2_options])
+    chain_quotes['option_type'] = [o.option_type.value for o in t1_options + t2_options]
+    update_quotes = [pd.read_csv(os.path.join(settings.TEST_DATA_DIR, f'option_{option_id}.csv'))
+                     for option_id in [353522, 391447, 422794]]
+    update_quotes = pd.concat(update_quotes)
+    update_quotes['quote_datetime'] = pd.to_datetime(update_quotes['quote_datetime'])
+    update_quotes = update_quotes[update_quotes['quote_datetime'] > datetime.datetime(2016, 3, 1, 9, 32)]
+    write_parquet_dataset(pd.concat([chain_quotes, update_quotes]), tmp_path)
+
+    yield tmp_path
+    settings.DATA_FORMAT_SETTINGS = original_value_1
+    settings.DATA_LOADER_TYPE = original_value_2
+
+
+def get_loader(dataset_root, select_filter, extended_option_attributes=None,
+               end_date=datetime.datetime(2016, 3, 2, 16, 15)):
+    start_date = datetime.datetime(2016, 3, 1, 9, 31)
+    return ParquetDataLoader(start=start_date, end=end_date, select_filter=select_filter,
+                             extended_option_attributes=extended_option_attributes, dataset_root=dataset_root)
+
+
+def test_parquet_loader_emits_option_chain(parquet_dataset):
+    loader = get_loader(parquet_dataset, SelectFilter(symbol='SPXW'), extended_attributes)
+    option_chain = OptionChain()
+    loader.bind(option_chain_loaded=option_chain.on_option_chain_loaded)
+    quote_datetime = datetime.datetime(2016, 3, 1, 9, 31)
+
+    loader.next_option_chain(quote_datetime)
+
+    assert len(option_chain) == len(t1_options)
+    assert option_chain.quote_datetime == quote_datetime
+    assert option_chain.expirations == [datetime.date(2016, 3, 2), datetime.date(2016, 3, 4)]
+    option = option_chain.get_option_by_id(t1_options[0].option_id)
+    assert option.price == t1_options[0].price
+    assert option.delta == t1_options[0].delta
+
+    loader.next_option_chain(datetime.datetime(2016, 3, 1, 9, 32))
+    assert len(option_chain) == len(t2_options)
+
+
+def test_parquet_loader_reads_only_extended_attribute_columns(parquet_dataset):
+    loader = get_loader(parquet_dataset, SelectFilter(symbol='SPXW'), ['delta'])
+    loader.load_cache(datetime.datetime(2016, 3, 1, 9, 31))
+
+    assert 'delta' in loader.data_cache.columns
+    assert 'gamma' not in loader.data_cache.columns
+    assert 'implied_volatility' not in loader.data_cache.columns
+
+
+def test_parquet_loader_applies_select_filter(parquet_dataset):
+    select_filter = SelectFilter(symbol='SPXW', option_type=OptionType.PUT,
+                                 expiration_dte=FilterRange(low=2, high=5),
+                                 strike_offset=FilterRange(low=20, high=20),
+                                 delta_range=FilterRange(low=-0.6, high=-0.1))
+    loader = get_loader(parquet_dataset, select_filter, ['delta'])
+    loader.load_cache(datetime.datetime(2016, 3, 1, 9, 31))
+    df = loader._get_cached_quotes(datetime.datetime(2016, 3, 1, 9, 31))
+
+    expected = [o for o in t1_options if o.option_type == OptionType.PUT
+                and o.expiration == datetime.date(2016, 3, 4)
+                and o.spot_price - 20 <= o.strike <= o.spot_price + 20
+                and -0.6 <= o.delta <= -0.1]
+    assert len(df) == len(expected)
+    assert set(df['option_id']) == {o.option_id for o in expected}
+    assert loader.get_expirations() == [datetime.date(2016, 3, 4)]
+
+
+def test_parquet_loader_loads_update_cache_for_opened_options(parquet_dataset, monkeypatch):
+    loader = get_loader(parquet_dataset, SelectFilter(symbol='SPXW'), extended_attributes)
+    option_chain = OptionChain()
+    loader.bind(option_chain_loaded=option_chain.on_option_chain_loaded)
+    quote_datetime = datetime.datetime(2016, 3, 1, 9, 31)
+    loader.next_option_chain(quote_datetime)
+    options = [option_chain.get_option_by_id(option_id) for option_id in [353522, 391447, 422794]]
+    for option in options:
+        option.open_trade(quantity=1)
+    fetches = []
+    fetch_update_caches = loader.fetch_update_caches
+    monkeypatch.setattr(loader, 'fetch_update_caches', lambda *args: fetches.append(args) or fetch_update_caches(*args))
+
+    # two positions opened in the same bar are loaded with one query
+    loader.on_options_opened(None, options[:1])
+    loader.on_options_opened(None, options[1:])
+    assert all(option.update_cache is None for option in options)
+    loader.load_update_caches(datetime.datetime(2016, 3, 1, 9, 32))
+
+    assert len(fetches) == 1
+    for option in options:
+        expected = pd.read_csv(os.path.join(settings.TEST_DATA_DIR, f'option_{option.option_id}.csv'))
+        assert len(option.update_cache) == len(expected)
+        assert (option.update_cache['option_id'] == option.option_id).all()
+        assert option.update_cache.index.is_monotonic_increasing
+
+
+def test_parquet_loader_reuses_loaded_update_cache(parquet_dataset, monkeypatch):
+    loader = get_loader(parquet_dataset, SelectFilter(symbol='SPXW'))
+    option_chain = OptionChain()
+    loader.bind(option_chain_loaded=option_chain.on_option_chain_loaded)
+    loader.next_option_chain(datetime.datetime(2016, 3, 1, 9, 31))
+    option = option_chain.get_option_by_id(353522)
+    option.open_trade(quantity=1)
+    loader.on_options_opened(None, [option])
+    loader.load_update_caches()
+
+    loader.next_option_chain(datetime.datetime(2016, 3, 1, 9, 32))
+    same_option = option_chain.get_option_by_id(353522)
+    same_option.open_trade(quantity=1)
+    monkeypatch.setattr(loader, 'fetch_update_caches', lambda *args: pytest.fail('update cache was fetched again'))
+    loader.on_options_opened(None, [same_option])
+    loader.load_update_caches()
+
+    assert same_option is not option
+    assert same_option.update_cache is option.update_cache
+
+
+def open_option(loader, option_id):
+    option_chain = OptionChain()
+    loader.bind(option_chain_loaded=option_chain.on_option_chain_loaded)
+    loader.next_option_chain(datetime.datetime(2016, 3, 1, 9, 31))
+    option = option_chain.get_option_by_id(option_id)
+    option.open_trade(quantity=1)
+    loader.on_options_opened(None, [option])
+    loader.load_update_caches()
+    return option
+
+
+def test_parquet_loader_update_cache_ends_at_end_of_test(parquet_dataset):
+    end_date = datetime.datetime(2016, 3, 1, 16, 15)
+    loader = get_loader(parquet_dataset, SelectFilter(symbol='SPXW'), end_date=end_date)
+    option = open_option(loader, 422794)
+
+    assert option.update_cache.index[0] == datetime.datetime(2016, 3, 1, 9, 31)
+    assert option.update_cache.index[-1] == end_date
+
+
+def test_parquet_loader_loads_update_cache_in_windows(parquet_dataset):
+    loader = get_loader(parquet_dataset, SelectFilter(symbol='SPXW'))
+    loader.update_cache_pager.window_days = 1
+    option = open_option(loader, 353522)
+
+    first_window = option.update_cache
+    assert first_window.index[-1] == datetime.datetime(2016, 3, 2, 9, 31)
+    loader.load_update_caches(datetime.datetime(2016, 3, 2, 9, 31))
+    assert option.update_cache is first_window
+
+    loader.load_update_caches(datetime.datetime(2016, 3, 2, 9, 32))
+    assert option.update_cache.index[0] == datetime.datetime(2016, 3, 2, 9, 32)
+    assert option.update_cache.index[-1] == datetime.datetime(2016, 3, 2, 16, 15)
+    # the last window reaches the expiration, so there are no more windows to load
+    loader.load_update_caches(datetime.datetime(2016, 3, 2, 9, 33))
+    assert loader.update_cache_pager.options == []
+
+
+def test_parquet_loader_prefetches_next_window(parquet_dataset):
+    loader = get_loader(parquet_dataset, SelectFilter(symbol='SPXW'))
+    loader.cache_prefetcher.enabled = True
+    original_buffer_days = settings.PARQUET_DATA_LOADER_SETTINGS.buffer_days
+    settings.PARQUET_DATA_LOADER_SETTINGS.buffer_days = 1
+    try:
+        assert loader.quote_dates == [datetime.date(2016, 3, 1), datetime.date(2016, 3, 2)]
+        loader.next_option_chain(datetime.datetime(2016, 3, 1, 9, 31))
+        assert loader.last_loaded_date == datetime.datetime.combine(datetime.date(2016, 3, 1), datetime.time.max)
+        loader.cache_prefetcher._future.result()
+
+        loader.next_option_chain(datetime.datetime(2016, 3, 2, 9, 31))
+        assert loader.data_cache.index[0].date() == datetime.date(2016, 3, 2)
+        assert loader.cache_stats.windows_loaded == 2
+        assert loader.cache_stats.prefetch_hits == 1
+        assert loader.cache_stats.waits == 1
+    finally:
+        settings.PARQUET_DATA_LOADER_SETTINGS.buffer_days = original_buffer_days
+        loader.cache_prefetcher.shutdown()
+
+
+def test_parquet_and_synthetic_loaders_select_the_same_expirations(parquet_dataset):
+    market = SyntheticMarket(start=datetime.date(2016, 3, 1), end=datetime.date(2016, 3, 2),
+                             strikes_per_expiration=4, expirations=3)
+    dataset_root = parquet_dataset / 'synthetic'
+    write_parquet_dataset(pd.concat([market.get_quotes(0), market.get_quotes(1)]), dataset_root)
+    end_date = datetime.datetime(2016, 3, 2, 16, 15)
+
+    # a high of 0 days keeps only the options expiring on the quote date
+    for expiration_dte in [FilterRange(high=0), FilterRange(low=1, high=1), FilterRange(low=1)]:
+        select_filter = SelectFilter(symbol='SPXW', expiration_dte=expiration_dte)
+        parquet_loader = get_loader(dataset_root, select_filter, end_date=end_date)
+        synthetic_loader = SyntheticDataLoader(start=datetime.datetime(2016, 3, 1, 9, 31), end=end_date,
+                                               select_filter=select_filter, market=market)
+
+        assert parquet_loader.get_expirations() == synthetic_loader.get_expirations()
+        for quote_datetime in [datetime.datetime(2016, 3, 1, 9, 31), datetime.datetime(2016, 3, 2, 16, 15)]:
+            parquet_chain = parquet_loader.fetch_option_chain(quote_datetime)
+            synthetic_chain = synthetic_loader.fetch_option_chain(quote_datetime)
+            assert len(parquet_chain) > 0
+            assert sorted(parquet_chain['option_id']) == sorted(synthetic_chain['option_id'])
@@ -137,3 +137,23 @@ def test_expired_position_closes_position(incur_fees_false, test_position_1, get
 
 
 
+
+
+def test_portfolio_emits_pre_next_before_options_are_updated(test_quote_date):
+    class EventListener:
+        def __init__(self):
+            self.events = []
+
+        def on_pre_next(self, quote_datetime):
+            self.events.append(('pre_next', quote_datetime))
+
+        def on_next(self, quote_datetime):
+            self.events.append(('next', quote_datetime))
+
+    pf = OptionPortfolio(100_000.0)
+    listener = EventListener()
+    pf.bind(pre_next=listener.on_pre_next, next=listener.on_next)
+
+    pf.next(test_quote_date)
+
+    assert listener.events == [('pre_next', test_quote_date), ('next', test_quote_date)]
@@ -0,0 +1,183 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+from options_framework.config import settings
+from options_framework.option_chain import OptionChain
+from options_framework.option_portfolio import OptionPortfolio
+from options_framework.option_types import OptionCombinationType, OptionPositionType, OptionStatus
+from options_framework.position_book import PositionBook
+from options_framework.spreads.single import Single
+from options_framework.utils.helpers import decimalize_2
+from test_data.spx_test_options import t1_options
+
+option_ids = [353522, 391447, 422794]
+quantities = [2, -3, 1]
+extended_attributes = ['delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest', 'implied_volatility']
+
+
+@pytest.fixture
+def incur_fees_false():
+    original_setting = settings.INCUR_FEES
+    settings.INCUR_FEES = False
+    yield
+    settings.INCUR_FEES = original_setting
+
+
+def get_options() -> list:
+    rows = [{'option_id': o.option_id, 'symbol': o.symbol, 'expiration': pd.Timestamp(o.expiration),
+             'strike': o.strike, 'option_type': o.option_type.value, 'spot_price': o.spot_price, 'bid': o.bid,
+             'ask': o.ask, 'price': o.price} | {name: getattr(o, name) for name in extended_attributes}
+            for o in t1_options]
+    option_chain = OptionChain()
+    option_chain.on_option_chain_loaded(quote_datetime=datetime.datetime(2016, 3, 1, 9, 31),
+                                        option_chain=pd.DataFrame(rows))
+    options = [option_chain.get_option_by_id(option_id) for option_id in option_ids]
+    for option in options:
+        data_file_name = os.path.join(settings.TEST_DATA_DIR, f'option_{option.option_id}.csv')
+        option.update_cache = pd.read_csv(data_file_name, parse_dates=True, index_col='quote_datetime')
+    return options
+
+
+@pytest.fixture
+def portfolio_and_reference_options(incur_fees_false):
+    portfolio = OptionPortfolio(100_000.0)
+    for option, quantity in zip(get_options(), quantities):
+        # Single.open_trade sets the position type from the quantity
+        portfolio.open_position(Single([option], OptionCombinationType.SINGLE, OptionPositionType.LONG),
+                                quantity=quantity)
+
+    # the same options, updated one at a time without a position book
+    reference_options = get_options()
+    for option, quantity in zip(reference_options, quantities):
+        option.open_trade(quantity=quantity)
+    return portfolio, reference_options
+
+
+def test_position_book_updates_match_option_updates(portfolio_and_reference_options):
+    portfolio, reference_options = portfolio_and_reference_options
+    quote_datetimes = reference_options[0].update_cache.index
+    # use every bar for the first hour, then skip bars so some quotes are missed
+    quote_datetimes = list(quote_datetimes[1:60]) + list(quote_datetimes[60:390:7])
+
+    for quote_datetime in quote_datetimes:
+        portfolio.next(quote_datetime)
+        for reference_option in reference_options:
+            reference_option.next_update(quote_datetime)
+
+        options = [o for position in portfolio.positions.values() for o in position.options]
+        for option, reference_option in zip(options, reference_options):
+            assert option.quote_datetime == reference_option.quote_datetime
+            assert option.spot_price == reference_option.spot_price
+            assert option.bid == reference_option.bid
+            assert option.ask == reference_option.ask
+            assert option.price == reference_option.price
+            assert option.delta == reference_option.delta
+        expected_value = decimalize_2(sum(o.current_value for o in reference_options)) + decimalize_2(portfolio.cash)
+        assert portfolio.portfolio_value == float(expected_value)
+        expected_pnl = sum(o.get_unrealized_profit_loss() for o in reference_options)
+        assert portfolio.unrealized_profit_loss == expected_pnl
+
+
+def test_position_book_net_greeks(portfolio_and_reference_options):
+    portfolio, reference_options = portfolio_and_reference_options
+    portfolio.next(datetime.datetime(2016, 3, 1, 10, 0))
+
+    net_greeks = portfolio.net_greeks
+    for name in ['delta', 'gamma', 'theta', 'vega', 'rho']:
+        options = [o for position in portfolio.positions.values() for o in position.options]
+        expected = sum(getattr(o, name) * o.quantity * 100 for o in options)
+        assert net_greeks[name] == pytest.approx(expected)
+
+
+def test_position_book_removes_closed_positions(portfolio_and_reference_options):
+    portfolio, _ = portfolio_and_reference_options
+    portfolio.next(datetime.datetime(2016, 3, 1, 10, 0))
+    position = list(portfolio.positions.values())[0]
+
+    portfolio.close_position(position, quantity=position.quantity)
+
+    assert len(portfolio.book) == len(option_ids) - 1
+    assert position.option._book is None
+    options = [o for position in portfolio.positions.values() for o in position.options]
+    expected_value = decimalize_2(sum(o.current_value for o in options)) + decimalize_2(portfolio.cash)
+    assert portfolio.portfolio_value == float(expected_value)
+
+
+def test_position_book_expires_options(portfolio_and_reference_options):
+    portfolio, _ = portfolio_and_reference_options
+    options = [o for position in portfolio.positions.values() for o in position.options]
+
+    portfolio.next(datetime.datetime(2016, 3, 2, 16, 15))
+
+    assert all(OptionStatus.EXPIRED in o.status for o in options)
+    assert len(portfolio.positions) == 0
+    assert len(portfolio.book) == 0
+    assert portfolio.portfolio_value == portfolio.cash
+
+
+def test_position_book_subscribes_each_leg_once(portfolio_and_reference_options):
+    portfolio, _ = portfolio_and_reference_options
+
+    assert portfolio.book.subscribed_count == len(option_ids)
+    position = list(portfolio.positions.values())[0]
+    portfolio.close_position(position, quantity=position.quantity)
+    assert portfolio.book.subscribed_count == len(option_ids) - 1
+
+
+def test_position_book_unsubscribes_expired_legs():
+    book = PositionBook()
+    options = get_options()
+    for option in options:
+        book.add(option)
+
+    book.mark(datetime.datetime(2016, 3, 2, 16, 15))
+
+    assert all(OptionStatus.EXPIRED in o.status for o in options)
+    assert len(book) == len(options)
+    assert book.subscribed_count == 0
+
+
+def test_portfolio_indexes_positions_by_option_id(portfolio_and_reference_options):
+    portfolio, _ = portfolio_and_reference_options
+    positions = list(portfolio.positions.values())
+
+    assert portfolio.option_positions == {o.option_id: {p.position_id: None} for p in positions for o in p.options}
+    portfolio.close_position(positions[0], quantity=positions[0].quantity)
+    assert positions[0].option.option_id not in portfolio.option_positions
+    assert len(portfolio.option_positions) == len(option_ids) - 1
+
+
+def test_portfolio_expires_positions_with_the_same_option(incur_fees_false):
+    portfolio = OptionPortfolio(100_000.0)
+    first_option, second_option = get_options()[0], get_options()[0]
+    for option in [first_option, second_option]:
+        portfolio.open_position(Single([option], OptionCombinationType.SINGLE, OptionPositionType.LONG), quantity=1)
+    assert len(portfolio.option_positions[first_option.option_id]) == 2
+
+    portfolio.next(datetime.datetime(2016, 3, 2, 16, 15))
+
+    assert len(portfolio.positions) == 0
+    assert len(portfolio.closed_positions) == 2
+    assert portfolio.option_positions == {}
+
+
+def test_position_book_settles_expiring_legs_at_intrinsic_value():
+    book = PositionBook()
+    options = get_options()
+    for option, quantity in zip(options, quantities):
+        option.open_trade(quantity=quantity)
+        book.add(option)
+    settlement = datetime.datetime(2016, 3, 2, 16, 15)
+    assert book.calendar.next_settlement == settlement
+
+    book.mark(datetime.datetime(2016, 3, 2, 16, 14))
+    assert not any(OptionStatus.EXPIRED in o.status for o in options)
+    book.mark(settlement)
+
+    assert all(OptionStatus.EXPIRED in o.status for o in options)
+    assert book.calendar.next_settlement is None
+    expected_value = sum(decimalize_2(o.get_closing_price()) * o.quantity * 100 for o in options)
+    assert book.current_value == expected_value
@@ -0,0 +1,98 @@
+import csv
+import json
+
+import pytest
+
+from options_framework.config import settings
+from options_framework.engine import BacktestEngine
+from options_framework.option import Option
+from options_framework.profiling import SUMMARY_COLUMNS
+from options_framework.spreads.single import Single
+
+pytest.importorskip("pyarrow")
+from options_framework.data.parquet_data_loader import ParquetDataLoader
+from test_parameter_sweep import parquet_dataset
+from test_engine import BuyCallStrategy, get_test_manager
+
+
+@pytest.fixture
+def profile_output(tmp_path_factory):
+    output = tmp_path_factory.mktemp('profile') / 'profile.json'
+    settings.PROFILE = True
+    settings.PROFILE_OUTPUT = str(output)
+
+    yield output
+    settings.PROFILE = False
+    settings.PROFILE_OUTPUT = None
+
+
+def test_profiler_times_hot_paths(parquet_dataset, profile_output):
+    test_manager = get_test_manager(parquet_dataset)
+    BacktestEngine(test_manager=test_manager, strategy=BuyCallStrategy()).run()
+
+    summary = test_manager.profiler.get_summary().set_index('phase')
+    bars = len(test_manager.portfolio.close_values)
+    assert summary.loc['OptionPortfolio.next', 'calls'] == bars
+    assert summary.loc['DataLoader.load_cache', 'calls'] == 1
+    assert summary.loc['DataLoader.get_option_chain', 'calls'] == 1
+    assert summary.loc['OptionChain.on_option_chain_loaded', 'calls'] == 1
+    assert summary.loc['OptionChain.on_option_chain_loaded', 'items'] == 80
+    assert summary.loc['Single.get_single', 'calls'] == 1
+    assert (summary['total_seconds'] > 0).all()
+    # the engine wrote the summary at the end of the run
+    with open(profile_output) as f:
+        phases = json.load(f)['phases']
+    assert {p['phase'] for p in phases} == set(summary.index)
+
+
+def test_profiler_exports_csv(parquet_dataset, profile_output):
+    test_manager = get_test_manager(parquet_dataset)
+    BacktestEngine(test_manager=test_manager, strategy=BuyCallStrategy()).run()
+    path = profile_output.with_suffix('.csv')
+
+    test_manager.profiler.export(path)
+
+    with open(path) as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == SUMMARY_COLUMNS
+    assert len(rows) == len(test_manager.profiler.get_summary()) + 1
+
+
+def test_disabled_profiler_restores_methods(parquet_dataset, profile_output):
+    next_update, get_single = Option.next_update, Single.__dict__['get_single']
+    load_cache = ParquetDataLoader.load_cache
+    test_manager = get_test_manager(parquet_dataset)
+    assert Option.next_update is not next_update
+    assert ParquetDataLoader.load_cache is not load_cache
+
+    test_manager.detach()
+
+    assert Option.next_update is next_update
+    assert Single.__dict__['get_single'] is get_single
+    assert ParquetDataLoader.load_cache is load_cache
+
+
+def test_run_does_not_leave_methods_timed(parquet_dataset, profile_output):
+    next_update = Option.next_update
+    profiled_manager = get_test_manager(parquet_dataset)
+    BacktestEngine(test_manager=profiled_manager, strategy=BuyCallStrategy()).run()
+    calls = profiled_manager.profiler.timings['OptionPortfolio.next'].calls
+    assert Option.next_update is next_update
+
+    settings.PROFILE = False
+    test_manager = get_test_manager(parquet_dataset)
+    BacktestEngine(test_manager=test_manager, strategy=BuyCallStrategy()).run()
+
+    assert test_manager.profiler is None
+    assert profiled_manager.profiler.timings['OptionPortfolio.next'].calls == calls
+
+
+def test_enabling_a_profiler_disables_the_previous_one(parquet_dataset, profile_output):
+    next_update = Option.next_update
+    first_manager = get_test_manager(parquet_dataset)
+    second_manager = get_test_manager(parquet_dataset)
+
+    assert not first_manager.profiler.enabled
+    assert second_manager.profiler.enabled
+    second_manager.detach()
+    assert Option.next_update is next_update
@@ -0,0 +1,95 @@
+import datetime
+import json
+
+import pytest
+from sqlalchemy import create_engine
+
+from options_framework.config import settings
+from options_framework.data.query_telemetry import QueryTelemetry, format_query, SUMMARY_COLUMNS
+
+QUOTES_QUERY = "select quote_datetime, bid from quotes where symbol = '{symbol}' and quote_datetime >= '{start_date}'"
+
+
+@pytest.fixture
+def sql_engine():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.exec_driver_sql('create table quotes (symbol text, quote_datetime text, bid real)')
+        conn.exec_driver_sql("insert into quotes values ('SPXW', '2016-03-01 09:31:00', 1.5), "
+                             "('SPXW', '2016-03-01 09:32:00', 1.75), ('SPX', '2016-03-01 09:31:00', 2.0)")
+    yield engine
+    engine.dispose()
+
+
+def test_format_query_puts_in_params():
+    query = format_query(QUOTES_QUERY, {'symbol': 'SPXW', 'start_date': datetime.datetime(2016, 3, 1, 9, 31)})
+
+    assert query.endswith("symbol = 'SPXW' and quote_datetime >= '2016-03-01 09:31:00'")
+
+
+def test_query_telemetry_records_queries(sql_engine):
+    telemetry = QueryTelemetry(slow_query_seconds=0)
+    params = {'symbol': 'SPXW', 'start_date': datetime.datetime(2016, 3, 1, 9, 31)}
+    with sql_engine.connect() as conn:
+        df = telemetry.read_sql(conn, 'quotes', QUOTES_QUERY, params, index_col='quote_datetime')
+        telemetry.read_sql(conn, 'quotes', QUOTES_QUERY, params | {'symbol': 'SPX'})
+
+    assert list(df['bid']) == [1.5, 1.75]
+    assert df.index[0] == datetime.datetime(2016, 3, 1, 9, 31)
+    first = telemetry.slow_queries[0]
+    assert (first.query_name, first.template, first.params, first.rows) == ('quotes', QUOTES_QUERY, params, 2)
+    assert first.bytes == df.memory_usage(deep=True, index=True).sum()
+    assert first.fetch_seconds > 0 and first.convert_seconds > 0
+    summary = telemetry.get_summary()
+    assert list(summary.columns) == SUMMARY_COLUMNS
+    assert summary.loc[0, 'queries'] == 2
+    assert summary.loc[0, 'rows'] == 3
+    assert summary.loc[0, 'slow_queries'] == 2
+    assert len(telemetry.get_slow_queries()) == 2
+
+
+def test_slow_queries_are_logged(sql_engine, tmp_path):
+    log = tmp_path / 'slow_queries.jsonl'
+    telemetry = QueryTelemetry(slow_query_seconds=0, slow_query_log=log)
+    with sql_engine.connect() as conn:
+        telemetry.read_sql(conn, 'quotes', QUOTES_QUERY, {'symbol': 'SPXW', 'start_date': '2016-03-01'})
+
+    with open(log) as f:
+        entries = [json.loads(line) for line in f]
+    assert len(entries) == 1
+    assert entries[0]['query_name'] == 'quotes'
+    assert entries[0]['rows'] == 2
+    assert entries[0]['query'] == format_query(QUOTES_QUERY, {'symbol': 'SPXW', 'start_date': '2016-03-01'})
+    assert telemetry.get_summary().loc[0, 'slow_queries'] == 1
+
+
+def test_query_telemetry_keeps_totals_and_latest_slow_queries(sql_engine):
+    telemetry = QueryTelemetry(slow_query_seconds=0, max_slow_queries=2)
+    with sql_engine.connect() as conn:
+        for symbol in ['SPXW', 'SPX', 'VIX']:
+            telemetry.read_sql(conn, 'quotes', QUOTES_QUERY, {'symbol': symbol, 'start_date': '2016-03-01'})
+
+    assert [q.params['symbol'] for q in telemetry.slow_queries] == ['SPX', 'VIX']
+    summary = telemetry.get_summary()
+    assert summary.loc[0, 'queries'] == 3
+    assert summary.loc[0, 'rows'] == 3
+    assert summary.loc[0, 'slow_queries'] == 3
+    telemetry.clear()
+    assert telemetry.get_summary().empty
+    assert len(telemetry.slow_queries) == 0
+
+
+def test_query_summary_output(sql_engine, tmp_path):
+    telemetry = QueryTelemetry()
+    assert telemetry.write_output() is None
+    with sql_engine.connect() as conn:
+        telemetry.read_sql(conn, 'quotes', QUOTES_QUERY, {'symbol': 'SPXW', 'start_date': '2016-03-01'})
+    settings.QUERY_SUMMARY_OUTPUT = str(tmp_path / 'queries.json')
+    try:
+        path = telemetry.write_output()
+    finally:
+        settings.QUERY_SUMMARY_OUTPUT = None
+
+    with open(path) as f:
+        queries = json.load(f)['queries']
+    assert [q['query_name'] for q in queries] == ['quotes']
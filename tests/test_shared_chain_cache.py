@@ -0,0 +1,120 @@
+import datetime
+import functools
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from options_framework.data.shared_chain_cache import SharedChainCache
+from options_framework.option_chain import OptionChain
+from options_framework.option_types import SelectFilter
+from test_data.spx_test_options import t1_options
+
+pytest.importorskip("pyarrow")
+from options_framework.data.parquet_data_loader import ParquetDataLoader
+from test_parameter_sweep import parquet_dataset, get_sweep, extended_attributes, start_date, end_date
+
+option_fields = ['quote_datetime', 'option_id', 'symbol', 'strike', 'expiration', 'option_type', 'spot_price',
+                 'bid', 'ask', 'price'] + extended_attributes
+
+
+@pytest.fixture
+def chain_window():
+    df = pd.DataFrame([{f: getattr(o, f) for f in option_fields} for o in t1_options])
+    df['option_type'] = [o.option_type.value for o in t1_options]
+    df['expiration'] = pd.to_datetime(df['expiration'])
+    return df.set_index('quote_datetime')
+
+
+def segment_exists(name: str) -> bool:
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+
+def test_shared_chain_cache_round_trips_window(chain_window):
+    cache = SharedChainCache()
+    df = cache.get('window', lambda: chain_window)
+
+    pd.testing.assert_frame_equal(df, chain_window, check_dtype=False, check_categorical=False)
+    expected_chain, shared_chain = OptionChain(), OptionChain()
+    expected_chain.on_option_chain_loaded(quote_datetime=start_date, option_chain=chain_window)
+    shared_chain.on_option_chain_loaded(quote_datetime=start_date, option_chain=df)
+    for o in t1_options[:20]:
+        assert shared_chain.get_option_by_id(o.option_id) == expected_chain.get_option_by_id(o.option_id)
+    cache.close()
+
+
+def test_shared_chain_cache_attaches_published_window(chain_window):
+    # two caches with the same prefix and lock stand in for two worker processes
+    first_cache = SharedChainCache()
+    second_cache = SharedChainCache(prefix=first_cache.prefix, _lock=first_cache._lock)
+    fetches = []
+    fetch = lambda: fetches.append(1) or chain_window
+
+    first_df = first_cache.get('window', fetch)
+    second_df = second_cache.get('window', fetch)
+
+    assert len(fetches) == 1
+    pd.testing.assert_frame_equal(first_df, second_df)
+    name = first_cache.get_name('window')
+    first_cache.release('window')
+    assert segment_exists(name)
+    second_cache.release('window')
+    assert not segment_exists(name)
+    # the data attached before the segment was removed can still be used
+    assert second_df['strike'].to_numpy().sum() == chain_window['strike'].sum()
+
+
+def test_shared_chain_cache_counts_uses_in_one_process(chain_window):
+    cache = SharedChainCache()
+    cache.get('window', lambda: chain_window)
+    cache.get('window', lambda: chain_window)
+    name = cache.get_name('window')
+
+    cache.release('window')
+    assert segment_exists(name)
+    cache.release('window')
+    assert not segment_exists(name)
+    assert len(cache) == 0
+
+
+def test_loaders_share_cache_windows(parquet_dataset, monkeypatch):
+    fetches = []
+    fetch_cache = ParquetDataLoader._fetch_cache
+    monkeypatch.setattr(ParquetDataLoader, '_fetch_cache', lambda self, *args: fetches.append(1) or fetch_cache(self, *args))
+    first_cache = SharedChainCache()
+    loaders = []
+    for cache in [first_cache, SharedChainCache(prefix=first_cache.prefix, _lock=first_cache._lock)]:
+        loader = ParquetDataLoader(start=start_date, end=end_date, select_filter=SelectFilter(symbol='SPXW'),
+                                   extended_option_attributes=extended_attributes, dataset_root=parquet_dataset)
+        loader.share_cache(cache)
+        loader.load_cache(start_date)
+        loaders.append(loader)
+
+    assert len(fetches) == 1
+    pd.testing.assert_frame_equal(loaders[0].data_cache, loaders[1].data_cache)
+    name = first_cache.get_name(loaders[0].shared_windows.get_key(loaders[0].data_cache_key))
+    for loader in loaders:
+        assert segment_exists(name)
+        loader.close()
+    assert not segment_exists(name)
+
+
+def test_parameter_sweep_with_shared_chain_cache(parquet_dataset):
+    expected_results = get_sweep(parquet_dataset, processes=1).run()
+    sweep = get_sweep(parquet_dataset, processes=2)
+    sweep.shared_chain_cache = SharedChainCache()
+
+    results = sweep.run()
+
+    pd.testing.assert_frame_equal(results.runs, expected_results.runs)
+    pd.testing.assert_frame_equal(results.trades, expected_results.trades)
+    key = ('ParquetDataLoader', str(start_date), str(end_date), repr(SelectFilter(symbol='SPXW')),
+           tuple(extended_attributes), str(start_date.date()))
+    # the workers released the window when they exited
+    assert not segment_exists(sweep.shared_chain_cache.get_name(key))
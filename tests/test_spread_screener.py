@@ -0,0 +1,120 @@
+import datetime
+import itertools
+
+import pandas as pd
+import pytest
+
+from options_framework.option_chain import OptionChain
+from options_framework.option_types import OptionType, OptionPositionType, FilterRange
+from options_framework.spreads.butterfly import Butterfly
+from options_framework.spreads.iron_condor import IronCondor
+from options_framework.spreads.spread_screener import SpreadScreener
+from options_framework.utils.helpers import decimalize_2
+from test_data.spx_test_options import t1_options
+
+expiration = datetime.date(2016, 3, 2)
+
+
+@pytest.fixture
+def option_chain():
+    rows = [{'option_id': o.option_id, 'symbol': o.symbol, 'expiration': pd.Timestamp(o.expiration),
+             'strike': o.strike, 'option_type': o.option_type.value, 'spot_price': o.spot_price, 'bid': o.bid,
+             'ask': o.ask, 'price': o.price, 'delta': o.delta, 'gamma': o.gamma, 'theta': o.theta, 'vega': o.vega}
+            for o in t1_options]
+    option_chain = OptionChain()
+    option_chain.on_option_chain_loaded(quote_datetime=datetime.datetime(2016, 3, 1, 9, 31),
+                                        option_chain=pd.DataFrame(rows))
+    return option_chain
+
+
+@pytest.mark.parametrize("option_type, option_position_type", list(itertools.product(OptionType, OptionPositionType)))
+def test_screen_verticals_scores_every_pair(option_chain, option_type, option_position_type):
+    screener = SpreadScreener(option_chain)
+    candidates = screener.screen_verticals(expiration=expiration, option_type=option_type,
+                                           option_position_type=option_position_type, max_width=25)
+
+    options = [o for o in option_chain.option_chain if o.expiration == expiration and o.option_type == option_type]
+    pairs = [(a, b) for a, b in itertools.combinations(options, 2) if 0 < abs(a.strike - b.strike) <= 25]
+    assert len(candidates) == len(pairs)
+
+    for row, vertical in zip(candidates.itertuples(), screener.get_verticals(candidates)):
+        assert vertical.option_position_type == option_position_type
+        assert vertical.long_option.strike == row.long_strike
+        assert vertical.short_option.strike == row.short_strike
+        assert row.width == abs(row.long_strike - row.short_strike)
+        assert row.price == vertical.price
+        assert row.delta == pytest.approx((vertical.long_option.delta - vertical.short_option.delta) * 100)
+        if option_position_type == OptionPositionType.LONG:
+            assert row.max_profit == vertical.max_profit
+            assert row.max_loss == float(decimalize_2(vertical.price) * 100)
+        else:
+            assert row.max_profit == float(decimalize_2(-vertical.price) * 100)
+            assert row.max_loss == float((decimalize_2(row.width) + decimalize_2(vertical.price)) * 100)
+
+
+def test_screen_iron_condors_matches_spread_constructor(option_chain):
+    screener = SpreadScreener(option_chain)
+    candidates = screener.screen_iron_condors(expiration=expiration, option_position_type=OptionPositionType.SHORT,
+                                              spread_widths=[5, 10], inner_call_delta=FilterRange(low=0.1, high=0.4),
+                                              inner_put_delta=FilterRange(low=-0.4, high=-0.1))
+
+    assert len(candidates) > 0
+    assert (candidates['short_put_strike'] < candidates['short_call_strike']).all()
+    assert set(candidates['call_width']) <= {5.0, 10.0}
+    best = SpreadScreener.top(candidates, 1, key=lambda df: -df['max_loss'])
+    iron_condor = screener.get_iron_condors(best)[0]
+    row = best.iloc[0]
+    expected = IronCondor.get_iron_condor_by_strike_and_width(
+        option_chain=option_chain, expiration=expiration, option_position_type=OptionPositionType.SHORT,
+        inner_call_strike=row['short_call_strike'], inner_put_strike=row['short_put_strike'],
+        spread_width=row['call_width'])
+    assert iron_condor.options == expected.options
+    credit = sum(decimalize_2(o.price) * (1 if o.quantity < 0 else -1) for o in iron_condor.options)
+    assert row['price'] == float(-credit)
+    assert row['max_profit'] == float(credit * 100)
+    assert row['max_loss'] == candidates['max_loss'].min()
+
+
+def test_screen_butterflies_matches_spread_constructor(option_chain):
+    screener = SpreadScreener(option_chain)
+    candidates = screener.screen_butterflies(expiration=expiration, option_type=OptionType.CALL,
+                                             wing_widths=[5, 10, 15])
+    best = SpreadScreener.top(candidates, 3, key='risk_reward')
+
+    assert len(best) == 3
+    assert best['risk_reward'].is_monotonic_decreasing
+    for row, butterfly in zip(best.itertuples(), screener.get_butterflies(best)):
+        expected = Butterfly.get_balanced_butterfly(option_chain=option_chain, expiration=expiration,
+                                                    option_type=OptionType.CALL, center_strike=row.center_strike,
+                                                    wing_width=row.lower_width)
+        assert butterfly.options == expected.options
+        price = sum(decimalize_2(o.price) * m for o, m in zip(butterfly.options, [1, -2, 1]))
+        assert row.price == float(price)
+        assert row.max_loss == float(price * 100)
+        assert row.max_profit == float((decimalize_2(row.lower_width) - price) * 100)
+
+
+def test_screener_raises_for_missing_expiration(option_chain):
+    screener = SpreadScreener(option_chain)
+    with pytest.raises(ValueError):
+        screener.screen_verticals(expiration=datetime.date(2016, 3, 5), option_type=OptionType.CALL,
+                                  option_position_type=OptionPositionType.LONG)
+
+
+def test_screened_spreads_do_not_share_legs(option_chain):
+    screener = SpreadScreener(option_chain)
+    candidates = screener.screen_verticals(expiration=expiration, option_type=OptionType.CALL,
+                                           option_position_type=OptionPositionType.LONG, max_width=5)
+    # the short strike of the first vertical is the long strike of the second
+    first = candidates.iloc[0]
+    second = candidates[candidates['long_strike'] == first['short_strike']].iloc[0]
+    shared = option_chain.get_option(first['short_option'])
+
+    first_vertical, second_vertical = screener.get_verticals(pd.DataFrame([first, second]), quantity=2)
+
+    assert first_vertical.short_option == second_vertical.long_option
+    assert first_vertical.short_option is not second_vertical.long_option
+    assert first_vertical.short_option.quantity == -2
+    assert second_vertical.long_option.quantity == 2
+    assert shared.quantity == 0
+    assert all(o is not shared for o in first_vertical.options + second_vertical.options)
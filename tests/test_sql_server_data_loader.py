@@ -72,7 +72,7 @@ def test_load_with_custom_option_attribute_selection(set_settings):
     sql_loader.bind(option_chain_loaded=on_data_loaded)
     sql_loader.get_option_chain(quote_datetime=start_date)
 
-    option = options[0]
+    option = options.iloc[0]
 
     assert option.delta is not None
 
@@ -292,3 +292,18 @@ def test_load_data_with_all_range_filters(set_settings):
     sql_loader.get_option_chain(quote_datetime=start_date) #, symbol='SPXW', filters=fltr)
 
     assert len(options) == 15
+
+
+def test_expiration_dte_is_counted_from_quote_date(set_settings):
+    _, _, select_filter = set_settings
+    select_filter.expiration_dte = FilterRange(high=0)
+    settings.load_file(settings.DATA_FORMAT_SETTINGS)
+    # the query is built without connecting to the database
+    sql_loader = SQLServerDataLoader.__new__(SQLServerDataLoader)
+    sql_loader.select_filter = select_filter
+    sql_loader.extended_option_attributes = []
+
+    query = sql_loader._build_query_template()
+
+    assert ' and expiration <= DATEADD(day, 0, CAST(quote_datetime AS date))' in query
+    assert 'expiration >=' not in query
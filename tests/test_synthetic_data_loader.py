@@ -0,0 +1,135 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from options_framework.config import settings
+from options_framework.data.synthetic_data_loader import SyntheticDataLoader, SyntheticMarket, black_scholes
+from options_framework.engine import BacktestEngine, Strategy
+from options_framework.option_types import OptionType, SelectFilter, OptionPositionType, FilterRange
+from options_framework.spreads.single import Single
+from options_framework.test_manager import OptionTestManager
+
+extended_attributes = ['delta', 'gamma', 'theta', 'vega', 'rho', 'open_interest', 'implied_volatility']
+start_date = datetime.datetime(2016, 3, 1, 9, 31)
+end_date = datetime.datetime(2016, 3, 2, 16, 15)
+
+
+def get_market(**kwargs):
+    return SyntheticMarket(start=start_date.date(), end=end_date.date(), strikes_per_expiration=10, expirations=3,
+                           **kwargs)
+
+
+def get_loader(select_filter=None, **kwargs):
+    return SyntheticDataLoader(start=start_date, end=end_date, select_filter=select_filter or SelectFilter('SPXW'),
+                               extended_option_attributes=extended_attributes, market=get_market(), **kwargs)
+
+
+class BuyAtTheMoneyCallStrategy(Strategy):
+    def __init__(self):
+        self.position = None
+
+    def on_bar(self, bar):
+        if bar.index == 0:
+            self.engine.load_option_chain()
+
+    def on_chain(self, option_chain):
+        self.position = Single.get_single(option_chain=option_chain, expiration=datetime.date(2016, 3, 2),
+                                          option_type=OptionType.CALL, option_position_type=OptionPositionType.LONG,
+                                          strike=2000)
+        self.engine.portfolio.open_position(self.position, quantity=1)
+
+
+def test_black_scholes_put_call_parity_and_greeks():
+    spot, strike, years, volatility, rate = 2000.0, np.array([1950.0, 2000.0, 2050.0]), 30 / 365, 0.2, 0.01
+    calls = black_scholes(spot, strike, years, volatility, rate, True)
+    puts = black_scholes(spot, strike, years, volatility, rate, False)
+
+    assert calls['price'] - puts['price'] == pytest.approx(spot - strike * np.exp(-rate * years), abs=1e-3)
+    assert calls['delta'] - puts['delta'] == pytest.approx(np.ones(3), abs=1e-6)
+    bumped = black_scholes(spot + 0.01, strike, years, volatility, rate, True)
+    assert (bumped['price'] - calls['price']) / 0.01 == pytest.approx(calls['delta'], abs=1e-3)
+    assert calls['gamma'] == pytest.approx(puts['gamma'])
+    expired = black_scholes(spot, strike, 0.0, volatility, rate, True)
+    assert list(expired['price']) == [50.0, 0.0, 0.0]
+    assert list(expired['delta']) == [1.0, 0.0, 0.0]
+
+
+def test_synthetic_market_is_deterministic():
+    market = get_market()
+    quotes = market.get_quotes(0)
+
+    pd.testing.assert_frame_equal(quotes, get_market().get_quotes(0))
+    assert not get_market(seed=1).get_quotes(0)['spot_price'].equals(quotes['spot_price'])
+    assert len(quotes) == market.minutes_per_day * market.contracts_per_day
+    assert quotes['quote_datetime'].iloc[0] == start_date
+    assert quotes['quote_datetime'].iloc[-1] == datetime.datetime(2016, 3, 1, 16, 15)
+    assert quotes['spot_price'].iloc[0] == 2000.0
+    assert (quotes['bid'] <= quotes['price']).all() and (quotes['ask'] > quotes['price']).all()
+
+
+def test_synthetic_option_ids_are_stable_across_days():
+    market = get_market()
+    first_day = market.get_quotes(0).drop_duplicates('option_id').set_index('option_id')
+    second_day = market.get_quotes(1).drop_duplicates('option_id').set_index('option_id')
+
+    common = first_day.index.intersection(second_day.index)
+    # the expiration of the first day is gone and one more is listed
+    assert len(common) == 2 * market.contracts_per_day // 3
+    assert (first_day.loc[common, ['strike', 'expiration', 'option_type']]
+            == second_day.loc[common, ['strike', 'expiration', 'option_type']]).all().all()
+    contracts = market.get_contracts(list(common))
+    assert list(contracts['strike']) == list(first_day.loc[common, 'strike'])
+
+
+def test_synthetic_loader_applies_select_filter():
+    select_filter = SelectFilter('SPXW', option_type=OptionType.PUT, expiration_dte=FilterRange(high=1),
+                                 delta_range=FilterRange(low=-0.6, high=-0.4))
+    data_loader = get_loader(select_filter)
+    data_loader.load_cache(start_date)
+
+    chain = data_loader._get_cached_quotes(start_date)
+
+    assert len(chain) > 0
+    assert (chain['option_type'] == OptionType.PUT.value).all()
+    assert set(chain['expiration'].dt.date) <= {datetime.date(2016, 3, 1), datetime.date(2016, 3, 2)}
+    assert chain['delta'].between(-0.6, -0.4).all()
+    pd.testing.assert_frame_equal(data_loader.fetch_option_chain(start_date), chain)
+    assert data_loader.get_expirations() == [datetime.date(2016, 3, 1), datetime.date(2016, 3, 2),
+                                             datetime.date(2016, 3, 3)]
+
+
+def test_synthetic_loader_runs_backtest():
+    data_loader = get_loader()
+    test_manager = OptionTestManager(start_datetime=start_date, end_datetime=end_date,
+                                     select_filter=SelectFilter('SPXW'), starting_cash=100_000.0,
+                                     extended_option_attributes=extended_attributes, data_loader=data_loader)
+
+    BacktestEngine(test_manager=test_manager, strategy=BuyAtTheMoneyCallStrategy()).run()
+
+    portfolio = test_manager.portfolio
+    assert len(portfolio.close_values) == 2 * 405
+    assert len(portfolio.positions) == 0
+    position = next(iter(portfolio.closed_positions.values()))
+    option = position.options[0]
+    # the option settled at its intrinsic value at the expiration
+    spot = data_loader.market.spot_prices[1, -1]
+    assert option.price == pytest.approx(max(round(spot, 2) - option.strike, 0), abs=0.01)
+    assert option.strike == 2000
+
+
+def test_test_manager_creates_synthetic_loader():
+    original_values = settings.DATA_FORMAT_SETTINGS, settings.DATA_LOADER_TYPE
+    settings.DATA_FORMAT_SETTINGS = 'synthetic_settings.toml'
+    settings.DATA_LOADER_TYPE = 'SYNTHETIC_DATA_LOADER'
+    try:
+        test_manager = OptionTestManager(start_datetime=start_date, end_datetime=end_date,
+                                         select_filter=SelectFilter('SPXW'), starting_cash=100_000.0)
+    finally:
+        settings.DATA_FORMAT_SETTINGS, settings.DATA_LOADER_TYPE = original_values
+
+    data_loader = test_manager.data_loader
+    assert isinstance(data_loader, SyntheticDataLoader)
+    assert data_loader.market.strikes_per_expiration == settings.SYNTHETIC_DATA_LOADER_SETTINGS.strikes_per_expiration
+    assert len(data_loader.get_quote_datetimes()) == 2 * 405
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from options_framework.config import settings
+from options_framework.engine import BacktestEngine
+from options_framework.profiling import Tracer
+
+pytest.importorskip("pyarrow")
+from test_parameter_sweep import parquet_dataset
+from test_engine import BuyCallStrategy, get_test_manager
+
+
+@pytest.fixture
+def trace_output(tmp_path_factory):
+    output = tmp_path_factory.mktemp('trace') / 'trace.json'
+    settings.TRACE = True
+    settings.TRACE_OUTPUT = str(output)
+
+    yield output
+    settings.TRACE = False
+    settings.TRACE_OUTPUT = None
+
+
+def test_trace_export_has_run_phases(parquet_dataset, trace_output):
+    test_manager = get_test_manager(parquet_dataset)
+    BacktestEngine(test_manager=test_manager, strategy=BuyCallStrategy()).run()
+
+    with open(trace_output) as f:
+        trace = json.load(f)
+    events = trace['traceEvents']
+    names = {e['name'] for e in events}
+    bars = len(test_manager.portfolio.close_values)
+    assert {'DataLoader.load_cache', 'DataLoader.get_option_chain', 'OptionChain.on_option_chain_loaded',
+            'OptionPortfolio.next', 'Strategy.on_bar', 'Strategy.on_chain'} <= names
+    assert sum(e['name'] == 'Strategy.on_bar' for e in events) == bars
+    assert all(e['ph'] == 'X' and e['dur'] >= 0 for e in events)
+    chain_event = next(e for e in events if e['name'] == 'Strategy.on_chain')
+    assert chain_event['cat'] == 'Strategy'
+    assert trace['otherData']['dropped_events'] == 0
+
+
+def test_tracer_keeps_latest_events():
+    tracer = Tracer(capacity=4)
+    for i in range(6):
+        tracer.add('even' if i % 2 == 0 else 'odd', i * 1000, 500)
+
+    events = tracer.get_events()
+
+    assert len(tracer) == 4
+    assert tracer.dropped == 2
+    assert [e['ts'] for e in events] == [2.0, 3.0, 4.0, 5.0]
+    assert [e['name'] for e in events] == ['even', 'odd', 'even', 'odd']
+    assert all(e['dur'] == 0.5 for e in events)
+
+
+def test_trace_buffer_size_setting(parquet_dataset, trace_output):
+    settings.TRACE_BUFFER_SIZE = 100
+    try:
+        test_manager = get_test_manager(parquet_dataset)
+        BacktestEngine(test_manager=test_manager, strategy=BuyCallStrategy()).run()
+    finally:
+        settings.TRACE_BUFFER_SIZE = 1_000_000
+
+    with open(trace_output) as f:
+        trace = json.load(f)
+    assert len(trace['traceEvents']) == 100
+    assert trace['otherData']['dropped_events'] == trace['otherData']['recorded_events'] - 100
+    assert trace['traceEvents'][-1]['name'] == 'Strategy.on_bar'